@@ -1,17 +1,194 @@
 import { NextResponse } from 'next/server'
-import { supabase, initializeDatabase, initializeSpanishData } from '../../../lib/supabase.js'
+import { supabase, initializeDatabase, initializeSpanishData, databaseStatus } from '../../../lib/supabase.js'
 import { createDatabaseTables } from '../../../lib/database-setup.js'
-import { v4 as uuidv4 } from 'uuid'
+import { getStats } from '../../../lib/stats.js'
+import { TTLCache, computeETag, encodedETag, etagMatches } from '../../../lib/cache.js'
+import { searchDogListings } from '../../../lib/search.js'
+import { getNearParams, nearbyDogListings } from '../../../lib/geo.js'
+import { MAX_BATCH_SIZE, validateDogListing, validateMessage, buildDogListing, buildMessage } from '../../../lib/records.js'
+import { getSelect, DOG_LISTING_SELECTION, MESSAGE_SELECTION } from '../../../lib/fields.js'
+import { compressBody, compress, negotiateEncoding } from '../../../lib/compression.js'
+import { getPageParams, decodeCursor, applyCursor, buildPage } from '../../../lib/pagination.js'
+import { exportRows, getExportChunkSize } from '../../../lib/export.js'
+import { rateLimiters, takeTokens, oversizedCheck, clientIp, clientAddressStats } from '../../../lib/rate-limit.js'
+import { instrument, measure, markUnmatched, renderMetrics } from '../../../lib/metrics.js'
+import { listingCache, listingCacheKey, listingFilters, listingGeneration, cacheListingResponse, invalidateListings } from '../../../lib/listing-cache.js'
+
+// Sort keys (all descending) used for keyset pagination
+const DOG_LISTING_SORT_KEYS = ['isUrgent', 'createdAt', 'id']
+const MESSAGE_SORT_KEYS = ['createdAt', 'id']
+
+// Provinces and cities only change when /setup seeds them, so keep them in process memory
+const REFERENCE_CACHE_TTL_SECONDS = 300
+const referenceCache = new TTLCache(REFERENCE_CACHE_TTL_SECONDS * 1000)
+const REFERENCE_CACHE_CONTROL = `public, max-age=${REFERENCE_CACHE_TTL_SECONDS}, must-revalidate`
+
+// Listing responses change with every write, so clients must revalidate (cheap 304s)
+const LISTING_CACHE_CONTROL = 'no-cache'
+
+// Error response for a failed nearbyDogListings call, or null when it succeeded
+function nearbyErrorResponse(result) {
+  if (result.invalidCursor) {
+    return NextResponse.json({ error: 'Invalid cursor' }, { status: 400 })
+  }
+  if (result.unknownCity) {
+    return NextResponse.json({ error: 'Unknown city for near' }, { status: 400 })
+  }
+  if (result.error) {
+    console.error('Error fetching nearby dog listings:', result.error)
+    return NextResponse.json({ error: 'Failed to fetch nearby dog listings' }, { status: 500 })
+  }
+  return null
+}
 
 // Helper function to handle CORS
 function handleCORS(response) {
   response.headers.set('Access-Control-Allow-Origin', process.env.CORS_ORIGINS || '*')
   response.headers.set('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-  response.headers.set('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+  response.headers.set('Access-Control-Allow-Headers', 'Content-Type, Authorization, If-None-Match')
+  response.headers.set('Access-Control-Expose-Headers', 'ETag, X-Cache, Retry-After, Server-Timing')
   response.headers.set('Access-Control-Allow-Credentials', 'true')
   return response
 }
 
+// Serialized JSON body compressed with br/gzip according to the request's Accept-Encoding
+function compressedResponse(request, json, init = {}) {
+  const { body, encoding } = measure('encode', () => compressBody(json, request.headers.get('accept-encoding')))
+  const headers = { 'Content-Type': 'application/json', 'Vary': 'Accept-Encoding', ...init.headers }
+  if (encoding) headers['Content-Encoding'] = encoding
+  return new NextResponse(body, { status: init.status || 200, headers })
+}
+
+function compressedJSON(request, payload, init = {}) {
+  return compressedResponse(request, measure('encode', () => JSON.stringify(payload)), init)
+}
+
+// Body of a cache entry in the given content-coding. Compressed variants are made once and
+// kept on the entry (and counted against the listing cache's byte bound), so cache hits
+// do not recompress.
+function cachedVariant(entry, encoding) {
+  if (!encoding) return entry.body
+  entry.variants = entry.variants || {}
+  if (!entry.variants[encoding]) {
+    entry.variants[encoding] = measure('encode', () => compress(Buffer.from(entry.body), encoding))
+    listingCache.grow(entry, entry.variants[encoding].length)
+  }
+  return entry.variants[encoding]
+}
+
+// Serve a cached JSON body, answering 304 when the client already holds the same ETag.
+// Each content-coding has its own ETag.
+function cachedJSON(request, entry, cacheControl, extraHeaders = {}) {
+  entry.bodyBytes = entry.bodyBytes ?? Buffer.byteLength(entry.body)
+  const encoding = negotiateEncoding(entry.bodyBytes, request.headers.get('accept-encoding'))
+  const etag = encodedETag(entry.etag, encoding)
+  const headers = { 'ETag': etag, 'Cache-Control': cacheControl, 'Vary': 'Accept-Encoding', ...extraHeaders }
+  if (etagMatches(request.headers.get('if-none-match'), etag)) {
+    return handleCORS(new NextResponse(null, { status: 304, headers }))
+  }
+  headers['Content-Type'] = 'application/json'
+  if (encoding) headers['Content-Encoding'] = encoding
+  return handleCORS(new NextResponse(cachedVariant(entry, encoding), { status: 200, headers }))
+}
+
+// Load reference data through the TTL cache; failed loads are not cached
+async function getReferenceData(key, load) {
+  const cached = referenceCache.get(key)
+  if (cached) return cached
+
+  const { data, error } = await load()
+  if (error) return { error }
+
+  const body = JSON.stringify(data || [])
+  return referenceCache.set(key, { body, etag: computeETag(body) })
+}
+
+// 429 with the number of seconds after which the same request would be accepted
+function tooManyRequests(retryAfter) {
+  return NextResponse.json(
+    { error: 'Too many requests', retryAfterSeconds: retryAfter },
+    { status: 429, headers: { 'Retry-After': String(retryAfter) } }
+  )
+}
+
+// Rate-limit checks for creating listings and messages from this client.
+// Per-IP checks are left out when the client address cannot be trusted.
+function perIpCheck(request, limiter, count) {
+  const ip = clientIp(request)
+  return ip ? [[limiter, ip, count]] : []
+}
+
+function dogRateChecks(request, count = 1) {
+  return perIpCheck(request, rateLimiters.dogsPerIp, count)
+}
+
+function messageRateChecks(request, messages) {
+  const perListing = new Map()
+  messages.forEach(message => perListing.set(message.listing_id, (perListing.get(message.listing_id) || 0) + 1))
+  return [
+    ...perIpCheck(request, rateLimiters.messagesPerIp, messages.length),
+    ...[...perListing].map(([listingId, count]) => [rateLimiters.messagesPerListing, listingId, count])
+  ]
+}
+
+// Validate an array of records, insert the valid ones with a single statement and
+// report a per-item result (in request order) for both valid and rejected items.
+// rateChecks(records) returns the rate-limit checks charged for the valid records.
+async function handleBatchInsert(request, table, validateRecord, buildRecord, { rateChecks, onInserted } = {}) {
+  const body = await request.json()
+  const items = Array.isArray(body) ? body : body?.items
+
+  if (!Array.isArray(items) || items.length === 0) {
+    return NextResponse.json({ error: 'Expected a non-empty array of items' }, { status: 400 })
+  }
+  if (items.length > MAX_BATCH_SIZE) {
+    return NextResponse.json({ error: `Batch too large: at most ${MAX_BATCH_SIZE} items` }, { status: 400 })
+  }
+
+  const results = items.map((item, index) => {
+    const error = validateRecord(item)
+    return error ? { index, success: false, error } : { index, success: true, record: buildRecord(item) }
+  })
+  const valid = results.filter(result => result.success)
+
+  if (valid.length > 0 && rateChecks) {
+    const checks = rateChecks(valid.map(result => result.record))
+    // Batching must not stretch a limit: a batch larger than a burst is never admitted
+    const oversized = oversizedCheck(checks)
+    if (oversized) {
+      const [limiter] = oversized
+      return NextResponse.json(
+        { error: `Batch exceeds the rate limit of ${limiter.capacity} ${limiter.unit}` },
+        { status: 400 })
+    }
+    const retryAfter = takeTokens(checks)
+    if (retryAfter > 0) return tooManyRequests(retryAfter)
+  }
+
+  if (valid.length > 0) {
+    const { error } = await supabase
+      .from(table)
+      .insert(valid.map(result => result.record))
+
+    if (error) {
+      console.error(`Error batch inserting into ${table}:`, error)
+      valid.forEach(result => {
+        result.success = false
+        result.error = 'Insert failed'
+      })
+    } else if (onInserted) {
+      onInserted(valid.map(result => result.record))
+    }
+  }
+
+  const response = results.map(({ index, success, error, record }) =>
+    success ? { index, success, id: record.id } : { index, success, error })
+  const inserted = response.filter(result => result.success).length
+  const status = inserted > 0 ? 200 : (valid.length > 0 ? 500 : 400)
+
+  return NextResponse.json({ inserted, failed: items.length - inserted, results: response }, { status })
+}
+
 // OPTIONS handler for CORS
 export async function OPTIONS() {
   return handleCORS(new NextResponse(null, { status: 200 }))
@@ -24,8 +201,29 @@ async function handleRoute(request, { params }) {
   const method = request.method
 
   try {
-    // Initialize database on first request
-    await initializeDatabase()
+    // Health check reports warmup state without waiting on it
+    if (route === '/health' && method === 'GET') {
+      const status = databaseStatus.state === 'ready' ? 'ok' : 'degraded'
+      return handleCORS(NextResponse.json({
+        status,
+        uptimeSeconds: Math.round(process.uptime()),
+        database: databaseStatus,
+        responseCache: listingCache.stats(),
+        rateLimits: Object.fromEntries(Object.entries(rateLimiters).map(([name, limiter]) => [name, limiter.stats()])),
+        clientAddress: clientAddressStats()
+      }))
+    }
+
+    // Prometheus scrape endpoint; like /health it must answer while the database warms up
+    if (route === '/metrics' && method === 'GET') {
+      return handleCORS(new NextResponse(renderMetrics(), {
+        status: 200,
+        headers: { 'Content-Type': 'text/plain; version=0.0.4; charset=utf-8', 'Cache-Control': 'no-store' }
+      }))
+    }
+
+    // Initialize database on first request (memoized per process)
+    await measure('init', initializeDatabase)
 
     // Root endpoint
     if (route === '/' && method === 'GET') {
@@ -37,6 +235,8 @@ async function handleRoute(request, { params }) {
       const result = await createDatabaseTables()
       if (result) {
         await initializeSpanishData()
+        referenceCache.clear()
+        listingCache.clear()
         return handleCORS(NextResponse.json({ message: "Database setup completed successfully" }))
       } else {
         return handleCORS(NextResponse.json(
@@ -48,17 +248,17 @@ async function handleRoute(request, { params }) {
 
     // PROVINCES ENDPOINTS
     if (route === '/provinces' && method === 'GET') {
-      const { data, error } = await supabase
+      const entry = await getReferenceData('provinces', () => supabase
         .from('provinces')
         .select('*')
-        .order('name', { ascending: true })
+        .order('name', { ascending: true }))
 
-      if (error) {
-        console.error('Error fetching provinces:', error)
+      if (entry.error) {
+        console.error('Error fetching provinces:', entry.error)
         return handleCORS(NextResponse.json({ error: 'Failed to fetch provinces' }, { status: 500 }))
       }
 
-      return handleCORS(NextResponse.json(data || []))
+      return cachedJSON(request, entry, REFERENCE_CACHE_CONTROL)
     }
 
     // CITIES ENDPOINTS
@@ -66,41 +266,68 @@ async function handleRoute(request, { params }) {
       const url = new URL(request.url)
       const provinceId = url.searchParams.get('province')
 
-      let query = supabase.from('cities').select('*').order('name', { ascending: true })
-      
-      if (provinceId) {
-        query = query.eq('province_id', provinceId)
-      }
+      const entry = await getReferenceData(`cities:${provinceId || ''}`, () => {
+        let query = supabase.from('cities').select('*').order('name', { ascending: true })
 
-      const { data, error } = await query
+        if (provinceId) {
+          query = query.eq('province_id', provinceId)
+        }
 
-      if (error) {
-        console.error('Error fetching cities:', error)
+        return query
+      })
+
+      if (entry.error) {
+        console.error('Error fetching cities:', entry.error)
         return handleCORS(NextResponse.json({ error: 'Failed to fetch cities' }, { status: 500 }))
       }
 
-      return handleCORS(NextResponse.json(data || []))
+      return cachedJSON(request, entry, REFERENCE_CACHE_CONTROL)
     }
 
     // DOG LISTINGS ENDPOINTS
     if (route === '/dogs' && method === 'GET') {
       const url = new URL(request.url)
+      const cacheKey = listingCacheKey(route, url.searchParams)
+      const cached = listingCache.get(cacheKey)
+      if (cached) {
+        return cachedJSON(request, cached, LISTING_CACHE_CONTROL, { 'X-Cache': 'HIT' })
+      }
+      const generation = listingGeneration()
+
       const province = url.searchParams.get('province')
       const city = url.searchParams.get('city')
       const size = url.searchParams.get('size')
       const gender = url.searchParams.get('gender')
       const urgent = url.searchParams.get('urgent') === 'true'
+      const page = getPageParams(url.searchParams)
+      // id is always selected so the cache can tell which listings a response contains
+      const { select, error: selectError } = getSelect(url.searchParams, DOG_LISTING_SELECTION, page ? DOG_LISTING_SORT_KEYS : ['id'])
+      if (selectError) {
+        return handleCORS(NextResponse.json({ error: selectError }, { status: 400 }))
+      }
+
+      // ?near=<city>&radius_km= sorts by distance from the city instead of province/city filters
+      const nearParams = getNearParams(url.searchParams)
+      if (nearParams?.error) {
+        return handleCORS(NextResponse.json({ error: nearParams.error }, { status: 400 }))
+      }
+      if (nearParams) {
+        const result = await nearbyDogListings({ ...nearParams, size, gender, urgent, limit: page ? page.limit : null, cursor: page?.cursor, select })
+        const errorResponse = nearbyErrorResponse(result)
+        if (errorResponse) return handleCORS(errorResponse)
+
+        const payload = page ? result : result.data
+        const entry = measure('encode', () => cacheListingResponse(cacheKey, generation, payload, result.data, listingFilters(url.searchParams)))
+        return cachedJSON(request, entry, LISTING_CACHE_CONTROL, { 'X-Cache': 'MISS' })
+      }
 
       let query = supabase
         .from('dog_listings')
-        .select(`
-          *,
-          provinces:province_id(name),
-          cities:city_id(name)
-        `)
+        .select(select)
         .eq('status', 'active')
         .order('isUrgent', { ascending: false })
         .order('createdAt', { ascending: false })
+        .order('id', { ascending: false })
 
       if (province) query = query.eq('province_id', province)
       if (city) query = query.eq('city_id', city)
@@ -108,6 +335,17 @@ async function handleRoute(request, { params }) {
       if (gender) query = query.eq('gender', gender)
       if (urgent) query = query.eq('isUrgent', true)
 
+      if (page) {
+        if (page.cursor) {
+          const cursorValues = decodeCursor(page.cursor, DOG_LISTING_SORT_KEYS)
+          if (!cursorValues) {
+            return handleCORS(NextResponse.json({ error: 'Invalid cursor' }, { status: 400 }))
+          }
+          query = applyCursor(query, cursorValues, DOG_LISTING_SORT_KEYS)
+        }
+        query = query.limit(page.limit + 1)
+      }
+
       const { data, error } = await query
 
       if (error) {
@@ -115,47 +353,31 @@ async function handleRoute(request, { params }) {
         return handleCORS(NextResponse.json({ error: 'Failed to fetch dog listings' }, { status: 500 }))
       }
 
-      return handleCORS(NextResponse.json(data || []))
+      const rows = data || []
+      const payload = page ? buildPage(rows, page.limit, DOG_LISTING_SORT_KEYS) : rows
+      const entry = measure('encode', () => cacheListingResponse(cacheKey, generation, payload, rows, listingFilters(url.searchParams)))
+      return cachedJSON(request, entry, LISTING_CACHE_CONTROL, { 'X-Cache': 'MISS' })
     }
 
     if (route === '/dogs' && method === 'POST') {
       const body = await request.json()
 
       // Validate required fields
-      const requiredFields = ['title', 'dogName', 'description', 'age', 'size', 'gender', 'contactName', 'contactEmail', 'province', 'city']
-      for (const field of requiredFields) {
-        if (!body[field]) {
-          return handleCORS(NextResponse.json(
-            { error: `Missing required field: ${field}` }, 
-            { status: 400 }
-          ))
-        }
+      const validationError = validateDogListing(body)
+      if (validationError) {
+        return handleCORS(NextResponse.json(
+          { error: validationError }, 
+          { status: 400 }
+        ))
       }
 
-      const dogListing = {
-        id: uuidv4(),
-        title: body.title.trim(),
-        description: body.description.trim(),
-        dogName: body.dogName.trim(),
-        age: parseInt(body.age),
-        size: body.size,
-        gender: body.gender,
-        breed: body.breed?.trim() || null,
-        isUrgent: Boolean(body.isUrgent),
-        isVaccinated: Boolean(body.isVaccinated),
-        isNeutered: Boolean(body.isNeutered),
-        contactEmail: body.contactEmail.trim(),
-        contactPhone: body.contactPhone?.trim() || null,
-        contactName: body.contactName.trim(),
-        province_id: body.province,
-        city_id: body.city,
-        imageUrls: body.imageUrls || [],
-        listingType: 'adoption',
-        status: 'active',
-        createdAt: new Date().toISOString(),
-        updatedAt: new Date().toISOString()
+      const retryAfter = takeTokens(dogRateChecks(request))
+      if (retryAfter > 0) {
+        return handleCORS(tooManyRequests(retryAfter))
       }
 
+      const dogListing = buildDogListing(body)
+
       const { data, error } = await supabase
         .from('dog_listings')
         .insert([dogListing])
@@ -167,12 +389,26 @@ async function handleRoute(request, { params }) {
         return handleCORS(NextResponse.json({ error: 'Failed to create listing' }, { status: 500 }))
       }
 
+      invalidateListings([data])
       return handleCORS(NextResponse.json(data))
     }
 
+    // Batch create: validates every item, inserts the valid ones in one statement
+    if (route === '/dogs/batch' && method === 'POST') {
+      return handleCORS(await handleBatchInsert(request, 'dog_listings', validateDogListing, buildDogListing, {
+        rateChecks: records => dogRateChecks(request, records.length),
+        onInserted: invalidateListings
+      }))
+    }
+
     // Get single dog listing
     if (route.startsWith('/dogs/') && method === 'GET') {
       const dogId = route.split('/')[2]
+      const cached = listingCache.get(route)
+      if (cached) {
+        return cachedJSON(request, cached, LISTING_CACHE_CONTROL, { 'X-Cache': 'HIT' })
+      }
+      const generation = listingGeneration()
 
       const { data, error } = await supabase
         .from('dog_listings')
@@ -189,7 +425,8 @@ async function handleRoute(request, { params }) {
         return handleCORS(NextResponse.json({ error: 'Dog not found' }, { status: 404 }))
       }
 
-      return handleCORS(NextResponse.json(data))
+      const entry = measure('encode', () => cacheListingResponse(route, generation, data, [data]))
+      return cachedJSON(request, entry, LISTING_CACHE_CONTROL, { 'X-Cache': 'MISS' })
     }
 
     // Update dog listing
@@ -214,6 +451,7 @@ async function handleRoute(request, { params }) {
         return handleCORS(NextResponse.json({ error: 'Failed to update listing' }, { status: 500 }))
       }
 
+      invalidateListings([data])
       return handleCORS(NextResponse.json(data))
     }
 
@@ -231,6 +469,7 @@ async function handleRoute(request, { params }) {
         return handleCORS(NextResponse.json({ error: 'Failed to delete listing' }, { status: 500 }))
       }
 
+      invalidateListings([{ id: dogId }])
       return handleCORS(NextResponse.json({ message: 'Listing deleted successfully' }))
     }
 
@@ -238,19 +477,33 @@ async function handleRoute(request, { params }) {
     if (route === '/messages' && method === 'GET') {
       const url = new URL(request.url)
       const listingId = url.searchParams.get('listing_id')
+      const page = getPageParams(url.searchParams)
+      const { select, error: selectError } = getSelect(url.searchParams, MESSAGE_SELECTION, page ? MESSAGE_SORT_KEYS : [])
+      if (selectError) {
+        return handleCORS(NextResponse.json({ error: selectError }, { status: 400 }))
+      }
 
       let query = supabase
         .from('messages')
-        .select(`
-          *,
-          dog_listings:listing_id(dogName, contactEmail)
-        `)
+        .select(select)
         .order('createdAt', { ascending: false })
+        .order('id', { ascending: false })
 
       if (listingId) {
         query = query.eq('listing_id', listingId)
       }
 
+      if (page) {
+        if (page.cursor) {
+          const cursorValues = decodeCursor(page.cursor, MESSAGE_SORT_KEYS)
+          if (!cursorValues) {
+            return handleCORS(NextResponse.json({ error: 'Invalid cursor' }, { status: 400 }))
+          }
+          query = applyCursor(query, cursorValues, MESSAGE_SORT_KEYS)
+        }
+        query = query.limit(page.limit + 1)
+      }
+
       const { data, error } = await query
 
       if (error) {
@@ -258,34 +511,32 @@ async function handleRoute(request, { params }) {
         return handleCORS(NextResponse.json({ error: 'Failed to fetch messages' }, { status: 500 }))
       }
 
-      return handleCORS(NextResponse.json(data || []))
+      if (page) {
+        return handleCORS(compressedJSON(request, buildPage(data || [], page.limit, MESSAGE_SORT_KEYS)))
+      }
+
+      return handleCORS(compressedJSON(request, data || []))
     }
 
     if (route === '/messages' && method === 'POST') {
       const body = await request.json()
 
       // Validate required fields
-      const requiredFields = ['listing_id', 'senderName', 'senderEmail', 'message']
-      for (const field of requiredFields) {
-        if (!body[field]) {
-          return handleCORS(NextResponse.json(
-            { error: `Missing required field: ${field}` }, 
-            { status: 400 }
-          ))
-        }
+      const validationError = validateMessage(body)
+      if (validationError) {
+        return handleCORS(NextResponse.json(
+          { error: validationError }, 
+          { status: 400 }
+        ))
       }
 
-      const message = {
-        id: uuidv4(),
-        listing_id: body.listing_id,
-        senderName: body.senderName.trim(),
-        senderEmail: body.senderEmail.trim(),
-        senderPhone: body.senderPhone?.trim() || null,
-        message: body.message.trim(),
-        isRead: false,
-        createdAt: new Date().toISOString()
+      const retryAfter = takeTokens(messageRateChecks(request, [body]))
+      if (retryAfter > 0) {
+        return handleCORS(tooManyRequests(retryAfter))
       }
 
+      const message = buildMessage(body)
+
       const { data, error } = await supabase
         .from('messages')
         .insert([message])
@@ -300,6 +551,12 @@ async function handleRoute(request, { params }) {
       return handleCORS(NextResponse.json(data))
     }
 
+    if (route === '/messages/batch' && method === 'POST') {
+      return handleCORS(await handleBatchInsert(request, 'messages', validateMessage, buildMessage, {
+        rateChecks: records => messageRateChecks(request, records)
+      }))
+    }
+
     // Mark message as read
     if (route.startsWith('/messages/') && route.endsWith('/read') && method === 'PUT') {
       const messageId = route.split('/')[2]
@@ -326,14 +583,39 @@ async function handleRoute(request, { params }) {
       const province = url.searchParams.get('province')
       const size = url.searchParams.get('size')
       const gender = url.searchParams.get('gender')
+      const page = getPageParams(url.searchParams)
+      const limit = page ? page.limit : 50
+      const { select, error: selectError } = getSelect(url.searchParams, DOG_LISTING_SELECTION, page ? DOG_LISTING_SORT_KEYS : ['id'])
+      if (selectError) {
+        return handleCORS(NextResponse.json({ error: selectError }, { status: 400 }))
+      }
+
+      // Proximity search, optionally combined with the full-text query
+      const nearParams = getNearParams(url.searchParams)
+      if (nearParams?.error) {
+        return handleCORS(NextResponse.json({ error: nearParams.error }, { status: 400 }))
+      }
+      if (nearParams) {
+        const result = await nearbyDogListings({ ...nearParams, query, size, gender, limit, cursor: page?.cursor, select })
+        const errorResponse = nearbyErrorResponse(result)
+        if (errorResponse) return handleCORS(errorResponse)
+        return handleCORS(compressedJSON(request, page ? result : result.data))
+      }
+
+      // Ranked full-text search; falls through to the ilike scan if the index is not set up
+      if (query) {
+        const result = await searchDogListings({ query, province, size, gender, limit, cursor: page?.cursor, select })
+        if (result?.invalidCursor) {
+          return handleCORS(NextResponse.json({ error: 'Invalid cursor' }, { status: 400 }))
+        }
+        if (result) {
+          return handleCORS(compressedJSON(request, page ? result : result.data))
+        }
+      }
 
       let supabaseQuery = supabase
         .from('dog_listings')
-        .select(`
-          *,
-          provinces:province_id(name),
-          cities:city_id(name)
-        `)
+        .select(select)
         .eq('status', 'active')
 
       // Text search in multiple fields
@@ -348,52 +630,65 @@ async function handleRoute(request, { params }) {
       supabaseQuery = supabaseQuery
         .order('isUrgent', { ascending: false })
         .order('createdAt', { ascending: false })
-        .limit(50)
+        .order('id', { ascending: false })
 
-      const { data, error } = await supabaseQuery
+      if (page?.cursor) {
+        const cursorValues = decodeCursor(page.cursor, DOG_LISTING_SORT_KEYS)
+        if (!cursorValues) {
+          return handleCORS(NextResponse.json({ error: 'Invalid cursor' }, { status: 400 }))
+        }
+        supabaseQuery = applyCursor(supabaseQuery, cursorValues, DOG_LISTING_SORT_KEYS)
+      }
+
+      const { data, error } = await supabaseQuery.limit(page ? limit + 1 : limit)
 
       if (error) {
         console.error('Error searching dogs:', error)
         return handleCORS(NextResponse.json({ error: 'Search failed' }, { status: 500 }))
       }
 
-      return handleCORS(NextResponse.json(data || []))
+      if (page) {
+        return handleCORS(compressedJSON(request, buildPage(data || [], limit, DOG_LISTING_SORT_KEYS)))
+      }
+
+      return handleCORS(compressedJSON(request, data || []))
     }
 
-    // STATS ENDPOINTS
-    if (route === '/stats' && method === 'GET') {
-      const [
-        { count: totalDogs },
-        { count: urgentDogs },
-        { count: totalMessages },
-        { data: dogsByProvince }
-      ] = await Promise.all([
-        supabase.from('dog_listings').select('*', { count: 'exact', head: true }).eq('status', 'active'),
-        supabase.from('dog_listings').select('*', { count: 'exact', head: true }).eq('status', 'active').eq('isUrgent', true),
-        supabase.from('messages').select('*', { count: 'exact', head: true }),
-        supabase
-          .from('dog_listings')
-          .select('province_id, provinces:province_id(name)')
-          .eq('status', 'active')
-      ])
-
-      const provinceStats = {}
-      dogsByProvince?.forEach(dog => {
-        const provinceName = dog.provinces?.name
-        if (provinceName) {
-          provinceStats[provinceName] = (provinceStats[provinceName] || 0) + 1
-        }
-      })
+    // EXPORT ENDPOINTS
+    // NDJSON, one row per line, streamed in chunks of ?chunk= rows (all statuses unless ?status=)
+    if ((route === '/export/dogs' || route === '/export/messages') && method === 'GET') {
+      const url = new URL(request.url)
+      const exportingDogs = route === '/export/dogs'
+      const table = exportingDogs ? 'dog_listings' : 'messages'
+      const filterParam = exportingDogs ? 'status' : 'listing_id'
+      const { select, error: selectError } = getSelect(url.searchParams, exportingDogs ? DOG_LISTING_SELECTION : MESSAGE_SELECTION, ['id'])
+      if (selectError) {
+        return handleCORS(NextResponse.json({ error: selectError }, { status: 400 }))
+      }
 
-      return handleCORS(NextResponse.json({
-        totalDogs: totalDogs || 0,
-        urgentDogs: urgentDogs || 0,
-        totalMessages: totalMessages || 0,
-        dogsByProvince: provinceStats
+      const filters = {}
+      if (url.searchParams.get(filterParam)) filters[filterParam] = url.searchParams.get(filterParam)
+
+      const { stream, error } = await exportRows(table, { select, filters, chunkSize: getExportChunkSize(url.searchParams) })
+      if (error) {
+        console.error(`Error exporting ${table}:`, error)
+        return handleCORS(NextResponse.json({ error: 'Export failed' }, { status: 500 }))
+      }
+
+      return handleCORS(new NextResponse(stream, {
+        status: 200,
+        headers: { 'Content-Type': 'application/x-ndjson', 'Cache-Control': 'no-store' }
       }))
     }
 
+    // STATS ENDPOINTS
+    if (route === '/stats' && method === 'GET') {
+      const stats = await getStats()
+      return handleCORS(NextResponse.json(stats))
+    }
+
     // Route not found
+    markUnmatched()
     return handleCORS(NextResponse.json(
       { error: `Route ${route} not found` }, 
       { status: 404 }
@@ -409,8 +704,9 @@ async function handleRoute(request, { params }) {
 }
 
 // Export all HTTP methods
-export const GET = handleRoute
-export const POST = handleRoute
-export const PUT = handleRoute
-export const DELETE = handleRoute
-export const PATCH = handleRoute
\ No newline at end of file
+const instrumentedRoute = instrument(handleRoute)
+export const GET = instrumentedRoute
+export const POST = instrumentedRoute
+export const PUT = instrumentedRoute
+export const DELETE = instrumentedRoute
+export const PATCH = instrumentedRoute
\ No newline at end of file
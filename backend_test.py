@@ -5,10 +5,24 @@ Tests all backend endpoints for the dog adoption platform
 """
 
 import requests
+import argparse
 import json
+import atexit
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
 import uuid
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from seed_test_data import load_env
 
 # Configuration
 BASE_URL = "http://localhost:3000/api"
@@ -16,15 +30,438 @@ HEADERS = {
     'Content-Type': 'application/json',
     'Accept': 'application/json'
 }
+RESULTS_FILE = '/app/backend_test_results.json'
+
+# Endpoint mix replayed by load mode: (name, path, weight)
+LOAD_TEST_ENDPOINTS = [
+    ("GET /api", "", 1),
+    ("GET /api/provinces", "/provinces", 2),
+    ("GET /api/cities", "/cities", 2),
+    ("GET /api/dogs", "/dogs", 6),
+    ("GET /api/dogs?size=mediano", "/dogs?size=mediano", 2),
+    ("GET /api/dogs?urgent=true", "/dogs?urgent=true", 2),
+    ("GET /api/search", "/search?q=Luna", 4),
+    ("GET /api/stats", "/stats", 3),
+    ("GET /api/messages", "/messages", 1)
+]
+
+# /api/dogs filter combinations checked by the query-plan benchmark: (name, query params).
+# The first four are the ones test_get_dog_listings exercises; location filters are filled in at run time.
+LISTING_FILTER_COMBINATIONS = [
+    ("All", {}),
+    ("Size", {'size': 'mediano'}),
+    ("Gender", {'gender': 'hembra'}),
+    ("Urgent", {'urgent': 'true'}),
+    ("Size+Gender", {'size': 'mediano', 'gender': 'hembra'})
+]
+# Soak mode operation mix: (operation, weight). Writes are kept under the default
+# per-client rate limits at the default --rate.
+SOAK_MIX = [
+    ("browse", 12),
+    ("view_dog", 4),
+    ("search", 4),
+    ("stats", 2),
+    ("list_messages", 2),
+    ("create_dog", 0.5),
+    ("send_message", 0.5)
+]
+# Per-window series checked for a sustained upward trend, and how much the last window
+# must exceed the first (percent) before a trend is flagged
+SOAK_TREND_SERIES = ['p50_ms', 'p99_ms', 'rss_bytes', 'open_fds', 'heap_used_bytes', 'messages_bytes']
+SOAK_TREND_MIN_GROWTH_PCT = 10.0
+SOAK_TREND_MIN_TAU = 0.7
+
+# Largest batch the /dogs/batch and /messages/batch endpoints accept (lib/records.js)
+MAX_BATCH_SIZE = 100
+
+# Listings and messages the functional suite creates from one client address, with headroom.
+# Per-IP rate limits below this make write tests fail depending on the order they run in.
+SUITE_WRITE_BUDGET = 200
+# Per-IP limits for the app started by --start-app; the per-listing message limit keeps its
+# default so test_rate_limiting still has something to hit
+LOCAL_STACK_RATE_LIMITS = {
+    'RATE_LIMIT_DOGS_BURST': '1000', 'RATE_LIMIT_DOGS_PER_MINUTE': '1000',
+    'RATE_LIMIT_MESSAGES_BURST': '1000', 'RATE_LIMIT_MESSAGES_PER_MINUTE': '1000'
+}
+
+# Below this many active listings the planner rightly prefers sequential scans
+MIN_PLAN_CHECK_ROWS = 10000
+
+# Proximity search check: origin city, radius, and how far (percent) server distances may
+# stray from the client-side great-circle distance (the server uses a slightly different sphere)
+GEO_ORIGIN_CITY = 'madrid-city'
+GEO_RADIUS_KM = 400
+GEO_DISTANCE_TOLERANCE_PCT = 1.0
+EARTH_MEAN_RADIUS_KM = 6371.0088
+
+# Functional suite, in result order: (test method, prerequisite tests, exclusive).
+# Independent tests run concurrently. Exclusive tests run alone, after every earlier test
+# and before every later one, because they time requests or need the data to hold still.
+TEST_PLAN = [
+    ('test_warmup_benchmark', [], True),
+    ('test_root_endpoint', [], False),
+    ('test_database_setup', [], False),
+    ('test_provinces_endpoint', ['test_database_setup'], False),
+    ('test_cities_endpoint', ['test_database_setup'], False),
+    ('test_reference_data_caching', ['test_database_setup'], False),
+    ('test_metrics_endpoint', ['test_database_setup'], False),
+    ('test_create_dog_listing', ['test_database_setup'], False),
+    ('test_get_dog_listings', ['test_database_setup'], False),
+    ('test_get_single_dog', ['test_create_dog_listing'], False),
+    ('test_send_message', ['test_create_dog_listing'], False),
+    ('test_get_messages', ['test_send_message'], False),
+    ('test_search_functionality', ['test_create_dog_listing'], False),
+    ('test_stats_endpoint', ['test_database_setup'], False),
+    ('test_batch_endpoints', ['test_database_setup'], False),
+    ('test_query_plans', ['test_database_setup'], False),
+    ('test_error_handling', ['test_database_setup'], False),
+    ('test_pagination', [], True),
+    ('test_payload_size', [], True),
+    ('test_stats_consistency', [], True),
+    ('test_listing_cache', [], True),
+    ('test_listing_cache_eviction', [], True),
+    ('test_streaming_export', [], True),
+    ('test_geo_proximity', [], True),
+    # Last: it drains this client's message rate-limit buckets
+    ('test_rate_limiting', [], True)
+]
+
+
+def expand_test_plan(plan):
+    """Return {test: prerequisites} with the ordering implied by exclusive tests made explicit"""
+    dependencies = {}
+    seen = []
+    last_exclusive = None
+    for name, prerequisites, exclusive in plan:
+        unknown = [dep for dep in prerequisites if dep not in seen]
+        if unknown:
+            raise ValueError(f"{name} depends on {unknown}, which must appear earlier in the plan")
+        dependencies[name] = set(seen) if exclusive else set(prerequisites)
+        if last_exclusive:
+            dependencies[name].add(last_exclusive)
+        if exclusive:
+            last_exclusive = name
+        seen.append(name)
+    return dependencies
+
+
+def critical_path(dependencies, durations):
+    """Longest chain of dependent tests by duration: (seconds, [tests]). Dependencies must be in plan order."""
+    finish = {}
+    chain = {}
+    for name, prerequisites in dependencies.items():
+        slowest = max(prerequisites, key=lambda dep: finish[dep], default=None)
+        finish[name] = durations[name] + (finish[slowest] if slowest else 0.0)
+        chain[name] = (chain[slowest] if slowest else []) + [name]
+    if not finish:
+        return 0.0, []
+    last = max(finish, key=finish.get)
+    return finish[last], chain[last]
+
+
+# Connect (TCP + TLS) time of the request in flight on the current thread
+_connect_timing = threading.local()
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _connect_timing.ms = getattr(_connect_timing, 'ms', 0.0) + (time.perf_counter() - started) * 1000
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _connect_timing.ms = getattr(_connect_timing, 'ms', 0.0) + (time.perf_counter() - started) * 1000
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections record how long connect() took"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def great_circle_km(lat1, lng1, lat2, lng2):
+    """Haversine distance in kilometres between two points given in degrees"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_MEAN_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_prometheus(text):
+    """Parse Prometheus text exposition into {(metric name, ((label, value), ...)): value}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        name, _, label_text = series.partition('{')
+        labels = []
+        for pair in label_text.rstrip('}').split('",') if label_text else []:
+            key, _, raw = pair.partition('=')
+            labels.append((key, raw.strip('"').replace('\\"', '"')))
+        samples[(name, tuple(sorted(labels)))] = float(value)
+    return samples
+
+
+def metric_deltas(before, after, name):
+    """Per (method, route) increase of a counter between two scrapes, summed over other labels"""
+    deltas = {}
+    for (metric, labels), value in after.items():
+        if metric != name:
+            continue
+        labels_dict = dict(labels)
+        key = (labels_dict['method'], labels_dict['route'], labels_dict.get('stage'))
+        deltas[key] = deltas.get(key, 0.0) + value - before.get((metric, labels), 0.0)
+    return deltas
+
+
+def kendall_tau(values):
+    """Kendall rank correlation of values against time: 1.0 for a strictly increasing series"""
+    concordant = discordant = 0
+    for i in range(len(values)):
+        for j in range(i + 1, len(values)):
+            if values[j] > values[i]:
+                concordant += 1
+            elif values[j] < values[i]:
+                discordant += 1
+    pairs = len(values) * (len(values) - 1) / 2
+    return (concordant - discordant) / pairs if pairs else 0.0
+
+
+def detect_trends(windows, series=SOAK_TREND_SERIES, min_windows=4):
+    """Flag per-window series that rise near-monotonically and grow past the threshold"""
+    trends = {}
+    for name in series:
+        values = [window[name] for window in windows if window.get(name) is not None]
+        if len(values) < min_windows:
+            continue
+        tau = kendall_tau(values)
+        growth_pct = (values[-1] - values[0]) / values[0] * 100 if values[0] else 0.0
+        trends[name] = {
+            'tau': round(tau, 3),
+            'growth_pct': round(growth_pct, 1),
+            'first': values[0],
+            'last': values[-1],
+            'flagged': tau >= SOAK_TREND_MIN_TAU and growth_pct >= SOAK_TREND_MIN_GROWTH_PCT
+        }
+    return trends
+
+
+def process_resources(pid):
+    """RSS bytes and open FD count of a local process read from /proc (None where unavailable)"""
+    resources = {'rss_bytes': None, 'open_fds': None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    resources['rss_bytes'] = int(line.split()[1]) * 1024
+        resources['open_fds'] = len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        pass
+    return resources
+
 
 class AdoptaunpanaAPITester:
-    def __init__(self):
-        self.base_url = BASE_URL
+    def __init__(self, base_url=BASE_URL, pool_size=10, retries=3, backoff=0.3):
+        self.base_url = base_url
         self.headers = HEADERS
         self.test_results = []
         self.created_dog_id = None
         self.created_message_id = None
-        
+        self._context = threading.local()
+        self.schedule_report = None
+        self.server_attribution = {}
+        self.http_timings = []
+        self.session = self.create_session(pool_size, retries, backoff)
+        # Direct PostgREST access, only needed by the query-plan benchmark
+        self.supabase_url = os.environ.get('NEXT_PUBLIC_SUPABASE_URL')
+        self.supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+
+    @property
+    def current_test(self):
+        """Test running on this thread (tests run concurrently under the scheduler)"""
+        return getattr(self._context, 'test', None)
+
+    @current_test.setter
+    def current_test(self, name):
+        self._context.test = name
+
+    def create_session(self, pool_size, retries, backoff):
+        """Build the keep-alive session shared by every test and load worker"""
+        session = requests.Session()
+        # Only idempotent methods are retried, so a flaky POST never creates duplicates
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[502, 503, 504])
+        adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.headers)
+        return session
+
+    def endpoint_name(self, method, url):
+        """Collapse a request URL to 'METHOD /api/route' with IDs replaced by {id}"""
+        path = url[len(self.base_url):] if url.startswith(self.base_url) else url
+        path = path.split('?', 1)[0]
+        segments = []
+        for segment in path.strip('/').split('/'):
+            if not segment:
+                continue
+            try:
+                uuid.UUID(segment)
+                segments.append('{id}')
+            except ValueError:
+                segments.append(segment)
+        return f"{method} /api" + ''.join(f"/{segment}" for segment in segments)
+
+    def send(self, method, url, record=True, **kwargs):
+        """Send a request through the pooled session and attach a timing breakdown to the response"""
+        _connect_timing.ms = 0.0
+        started = time.perf_counter()
+        response = self.session.request(method, url, **kwargs)
+        total_ms = (time.perf_counter() - started) * 1000
+        response.timing = {
+            'test': self.current_test,
+            'endpoint': self.endpoint_name(method, url),
+            'url': url,
+            'status': response.status_code,
+            'connect_ms': round(_connect_timing.ms, 2),
+            'ttfb_ms': round(response.elapsed.total_seconds() * 1000, 2),
+            'total_ms': round(total_ms, 2),
+            'response_bytes': len(response.content)
+        }
+        if record:
+            self.http_timings.append(response.timing)
+        return response
+
+    def latency_by_endpoint(self):
+        """Aggregate the recorded HTTP timings per endpoint"""
+        grouped = {}
+        for timing in self.http_timings:
+            grouped.setdefault(timing['endpoint'], []).append(timing)
+
+        table = {}
+        for endpoint, timings in grouped.items():
+            totals = [t['total_ms'] for t in timings]
+            table[endpoint] = {
+                'requests': len(timings),
+                'p50_ms': round(percentile(totals, 50), 2),
+                'p90_ms': round(percentile(totals, 90), 2),
+                'p99_ms': round(percentile(totals, 99), 2),
+                'max_ms': round(max(totals), 2),
+                'avg_connect_ms': round(sum(t['connect_ms'] for t in timings) / len(timings), 2),
+                'avg_ttfb_ms': round(sum(t['ttfb_ms'] for t in timings) / len(timings), 2),
+                'avg_response_bytes': round(sum(t['response_bytes'] for t in timings) / len(timings))
+            }
+        return table
+
+    def print_latency_table(self):
+        table = self.latency_by_endpoint()
+        print(f"\n{'Endpoint':<30}{'reqs':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'connect':>9}{'ttfb':>9}{'bytes':>9}")
+        for endpoint, row in sorted(table.items()):
+            print(f"{endpoint:<30}{row['requests']:>6}{row['p50_ms']:>9.1f}{row['p90_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+                  f"{row['avg_connect_ms']:>9.1f}{row['avg_ttfb_ms']:>9.1f}{row['avg_response_bytes']:>9}")
+        return table
+
+    def scrape_metrics(self):
+        """Parsed GET /api/metrics samples, or None when the server does not expose them"""
+        try:
+            response = self.send('GET', f"{self.base_url}/metrics", record=False, timeout=10)
+        except requests.RequestException:
+            return None
+        return parse_prometheus(response.text) if response.status_code == 200 else None
+
+    def attribute_latency(self, before, after):
+        """Split client-observed latency per endpoint into server stages using two metric scrapes"""
+        requests_delta = metric_deltas(before, after, 'api_requests_total')
+        duration_delta = metric_deltas(before, after, 'api_request_duration_seconds_sum')
+        calls_delta = metric_deltas(before, after, 'api_supabase_calls_total')
+        stage_delta = metric_deltas(before, after, 'api_stage_duration_seconds_total')
+        client = self.latency_by_endpoint()
+        client_avg = {}
+        for timing in self.http_timings:
+            client_avg.setdefault(timing['endpoint'], []).append(timing['total_ms'])
+
+        attribution = {}
+        for (method, route, _), count in requests_delta.items():
+            if count <= 0 or route == 'unmatched':
+                continue
+            endpoint = f"{method} /api{'' if route == '/' else route}"
+            stages = {stage: round(seconds * 1000 / count, 2)
+                      for (m, r, stage), seconds in stage_delta.items() if (m, r) == (method, route) and stage}
+            server_ms = duration_delta.get((method, route, None), 0.0) * 1000 / count
+            row = {
+                'server_requests': int(count),
+                'server_avg_ms': round(server_ms, 2),
+                'db_avg_ms': stages.get('db', 0.0),
+                'init_avg_ms': stages.get('init', 0.0),
+                'encode_avg_ms': stages.get('encode', 0.0),
+                'supabase_calls_per_request': round(calls_delta.get((method, route, None), 0.0) / count, 2)
+            }
+            if endpoint in client_avg:
+                client_ms = sum(client_avg[endpoint]) / len(client_avg[endpoint])
+                row['client_avg_ms'] = round(client_ms, 2)
+                row['client_p50_ms'] = client[endpoint]['p50_ms']
+                # Whatever the server did not account for: network, framework routing, queueing
+                row['outside_handler_ms'] = round(client_ms - server_ms, 2)
+            attribution[endpoint] = row
+        return attribution
+
+    def print_attribution_table(self):
+        if not self.server_attribution:
+            return
+        print(f"\n{'Endpoint':<30}{'client':>9}{'server':>9}{'db':>9}{'calls':>7}{'init':>8}{'encode':>8}{'outside':>9}")
+        for endpoint, row in sorted(self.server_attribution.items()):
+            print(f"{endpoint:<30}{row.get('client_avg_ms', 0):>9.1f}{row['server_avg_ms']:>9.1f}{row['db_avg_ms']:>9.1f}"
+                  f"{row['supabase_calls_per_request']:>7.1f}{row['init_avg_ms']:>8.1f}{row['encode_avg_ms']:>8.1f}"
+                  f"{row.get('outside_handler_ms', 0):>9.1f}")
+
+    def connection_stats(self):
+        """Count requests sent vs TCP connections opened by the pooled session"""
+        total_requests = 0
+        total_connections = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                total_requests += pool.num_requests
+                total_connections += pool.num_connections
+        return {
+            'requests': total_requests,
+            'connections_opened': total_connections,
+            'connections_reused': max(0, total_requests - total_connections)
+        }
+
+    def print_connection_stats(self):
+        stats = self.connection_stats()
+        print(f"🔌 Connections: {stats['requests']} requests over {stats['connections_opened']} connections "
+              f"({stats['connections_reused']} reused)")
+        return stats
+
     def log_result(self, test_name, success, message, response_data=None):
         """Log test results"""
         result = {
@@ -34,7 +471,8 @@ class AdoptaunpanaAPITester:
             'timestamp': datetime.now().isoformat(),
             'response_data': response_data
         }
-        self.test_results.append(result)
+        # The scheduler collects each test's results on its own thread and merges them in plan order
+        getattr(self._context, 'results', self.test_results).append(result)
         status = "✅ PASS" if success else "❌ FAIL"
         print(f"{status}: {test_name} - {message}")
         if response_data and not success:
@@ -43,7 +481,7 @@ class AdoptaunpanaAPITester:
     def test_root_endpoint(self):
         """Test GET /api - root endpoint"""
         try:
-            response = requests.get(f"{self.base_url}", headers=self.headers, timeout=10)
+            response = self.send('GET', f"{self.base_url}", headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -61,10 +499,42 @@ class AdoptaunpanaAPITester:
             self.log_result("Root Endpoint", False, f"Request failed: {str(e)}")
             return False
     
+    def test_warmup_benchmark(self):
+        """Test GET /api/health warmup state and compare request latency before/after warmup"""
+        try:
+            health = self.send('GET', f"{self.base_url}/health", headers=self.headers, timeout=10)
+            if health.status_code != 200 or 'database' not in health.json():
+                self.log_result("Warmup Benchmark", False, f"Health endpoint failed: HTTP {health.status_code}: {health.text}")
+                return False
+            state_before = health.json()['database']['state']
+
+            # The first routed request after a restart pays for the initialization check
+            first_ms = self.send('GET', f"{self.base_url}", headers=self.headers, timeout=30).timing['total_ms']
+            warm_ms = [self.send('GET', f"{self.base_url}", headers=self.headers, timeout=10).timing['total_ms']
+                       for _ in range(20)]
+
+            database = self.send('GET', f"{self.base_url}/health", headers=self.headers, timeout=10).json()['database']
+            if database['state'] != 'ready':
+                self.log_result("Warmup Benchmark", False, f"Database not ready after warmup: {database}")
+                return False
+
+            if state_before == 'ready':
+                detail = f"server already warm; first request {first_ms:.1f}ms"
+            else:
+                detail = f"cold first request {first_ms:.1f}ms (server warmup {database['warmupMs']}ms)"
+            self.log_result("Warmup Benchmark", True,
+                            f"{detail}, warm p50 {percentile(warm_ms, 50):.1f}ms / p99 {percentile(warm_ms, 99):.1f}ms "
+                            f"after {database['attempts']} initialization attempt(s)")
+            return True
+
+        except Exception as e:
+            self.log_result("Warmup Benchmark", False, f"Request failed: {str(e)}")
+            return False
+
     def test_database_setup(self):
         """Test POST /api/setup - database table creation"""
         try:
-            response = requests.post(f"{self.base_url}/setup", headers=self.headers, timeout=30)
+            response = self.send('POST', f"{self.base_url}/setup", headers=self.headers, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -85,7 +555,7 @@ class AdoptaunpanaAPITester:
     def test_provinces_endpoint(self):
         """Test GET /api/provinces - fetch Spanish provinces"""
         try:
-            response = requests.get(f"{self.base_url}/provinces", headers=self.headers, timeout=10)
+            response = self.send('GET', f"{self.base_url}/provinces", headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -116,7 +586,7 @@ class AdoptaunpanaAPITester:
         """Test GET /api/cities - fetch cities with province filtering"""
         try:
             # Test all cities
-            response = requests.get(f"{self.base_url}/cities", headers=self.headers, timeout=10)
+            response = self.send('GET', f"{self.base_url}/cities", headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 all_cities = response.json()
@@ -128,7 +598,7 @@ class AdoptaunpanaAPITester:
                         first_city = all_cities[0]
                         province_id = first_city.get('province_id')
                         if province_id:
-                            filtered_response = requests.get(
+                            filtered_response = self.send('GET',
                                 f"{self.base_url}/cities?province={province_id}", 
                                 headers=self.headers, 
                                 timeout=10
@@ -164,11 +634,85 @@ class AdoptaunpanaAPITester:
             self.log_result("Cities Endpoint", False, f"Request failed: {str(e)}")
             return False
     
+    def test_reference_data_caching(self):
+        """Test ETag/Cache-Control on GET /api/provinces and /api/cities and the cache-hit latency"""
+        try:
+            for name, path in [("Provinces", "/provinces"), ("Cities", "/cities"), ("Cities Filtered", "/cities?province=madrid")]:
+                response = self.send('GET', f"{self.base_url}{path}", headers=self.headers, timeout=10)
+                etag = response.headers.get('ETag')
+                if response.status_code != 200 or not etag:
+                    self.log_result(f"Reference Cache ({name})", False,
+                                    f"Expected 200 with ETag, got HTTP {response.status_code}, ETag={etag}")
+                    return False
+                if 'max-age' not in response.headers.get('Cache-Control', ''):
+                    self.log_result(f"Reference Cache ({name})", False,
+                                    f"Missing Cache-Control max-age: {response.headers.get('Cache-Control')}")
+                    return False
+
+                conditional_headers = dict(self.headers, **{'If-None-Match': etag})
+                revalidated = self.send('GET', f"{self.base_url}{path}", headers=conditional_headers, timeout=10)
+                if revalidated.status_code != 304 or revalidated.content:
+                    self.log_result(f"Reference Cache ({name})", False,
+                                    f"Expected empty 304 for matching ETag, got HTTP {revalidated.status_code}")
+                    return False
+
+                stale_headers = dict(self.headers, **{'If-None-Match': '"stale"'})
+                refreshed = self.send('GET', f"{self.base_url}{path}", headers=stale_headers, timeout=10)
+                if refreshed.status_code != 200 or refreshed.json() != response.json():
+                    self.log_result(f"Reference Cache ({name})", False,
+                                    f"Expected full 200 for stale ETag, got HTTP {refreshed.status_code}")
+                    return False
+
+                hit_ms = []
+                not_modified_ms = []
+                for _ in range(20):
+                    hit_ms.append(self.send('GET', f"{self.base_url}{path}", headers=self.headers,
+                                            timeout=10).timing['total_ms'])
+                    not_modified_ms.append(self.send('GET', f"{self.base_url}{path}", headers=conditional_headers,
+                                                     timeout=10).timing['total_ms'])
+                self.log_result(f"Reference Cache ({name})", True,
+                                f"ETag revalidation working; cache hit p50 {percentile(hit_ms, 50):.1f}ms, "
+                                f"304 p50 {percentile(not_modified_ms, 50):.1f}ms")
+            return True
+
+        except Exception as e:
+            self.log_result("Reference Cache", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_metrics_endpoint(self):
+        """Test GET /api/metrics (Prometheus text) and the Server-Timing header on API responses"""
+        try:
+            response = self.send('GET', f"{self.base_url}/dogs", headers=self.headers, params={'limit': 1}, timeout=10)
+            server_timing = response.headers.get('Server-Timing', '')
+            if 'total;dur=' not in server_timing:
+                self.log_result("Metrics (Server-Timing)", False, f"Missing Server-Timing total: '{server_timing}'")
+                return False
+
+            metrics = self.send('GET', f"{self.base_url}/metrics", timeout=10)
+            if metrics.status_code != 200 or not metrics.headers.get('Content-Type', '').startswith('text/plain'):
+                self.log_result("Metrics Endpoint", False, f"HTTP {metrics.status_code}, {metrics.headers.get('Content-Type')}")
+                return False
+            samples = parse_prometheus(metrics.text)
+            dogs_requests = sum(value for (name, labels), value in samples.items()
+                                if name == 'api_requests_total' and ('route', '/dogs') in labels)
+            if dogs_requests < 1 or not any(name == 'api_supabase_calls_total' for name, _ in samples):
+                self.log_result("Metrics Endpoint", False, "GET /api/dogs requests or Supabase call counters missing")
+                return False
+
+            self.log_result("Metrics Endpoint", True,
+                            f"{len(samples)} samples, {dogs_requests:.0f} GET /api/dogs requests counted; "
+                            f"Server-Timing: {server_timing}")
+            return True
+
+        except Exception as e:
+            self.log_result("Metrics Endpoint", False, f"Request failed: {str(e)}")
+            return False
+
     def test_create_dog_listing(self):
         """Test POST /api/dogs - create new dog listing"""
         try:
             # First get provinces and cities for valid IDs
-            provinces_response = requests.get(f"{self.base_url}/provinces", headers=self.headers, timeout=10)
+            provinces_response = self.send('GET', f"{self.base_url}/provinces", headers=self.headers, timeout=10)
             if provinces_response.status_code != 200:
                 self.log_result("Create Dog Listing", False, "Cannot get provinces for test data")
                 return False
@@ -179,7 +723,7 @@ class AdoptaunpanaAPITester:
                 return False
             
             province = provinces[0]
-            cities_response = requests.get(f"{self.base_url}/cities?province={province['id']}", headers=self.headers, timeout=10)
+            cities_response = self.send('GET', f"{self.base_url}/cities?province={province['id']}", headers=self.headers, timeout=10)
             if cities_response.status_code != 200:
                 self.log_result("Create Dog Listing", False, "Cannot get cities for test data")
                 return False
@@ -211,10 +755,10 @@ class AdoptaunpanaAPITester:
                 "imageUrls": ["https://example.com/dog1.jpg", "https://example.com/dog2.jpg"]
             }
             
-            response = requests.post(f"{self.base_url}/dogs", 
-                                   headers=self.headers, 
-                                   json=test_dog, 
-                                   timeout=15)
+            response = self.send('POST', f"{self.base_url}/dogs", 
+                                           headers=self.headers, 
+                                           json=test_dog, 
+                                           timeout=15)
             
             if response.status_code == 200:
                 data = response.json()
@@ -237,7 +781,7 @@ class AdoptaunpanaAPITester:
         """Test GET /api/dogs - fetch dog listings with filters"""
         try:
             # Test getting all dogs
-            response = requests.get(f"{self.base_url}/dogs", headers=self.headers, timeout=10)
+            response = self.send('GET', f"{self.base_url}/dogs", headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 all_dogs = response.json()
@@ -245,21 +789,21 @@ class AdoptaunpanaAPITester:
                     self.log_result("Get Dog Listings (All)", True, f"Found {len(all_dogs)} dog listings")
                     
                     # Test filtering by size
-                    size_response = requests.get(f"{self.base_url}/dogs?size=mediano", headers=self.headers, timeout=10)
+                    size_response = self.send('GET', f"{self.base_url}/dogs?size=mediano", headers=self.headers, timeout=10)
                     if size_response.status_code == 200:
                         size_filtered = size_response.json()
                         self.log_result("Get Dog Listings (Size Filter)", True, 
                                       f"Size filter working: {len(size_filtered)} medium dogs")
                         
                         # Test filtering by gender
-                        gender_response = requests.get(f"{self.base_url}/dogs?gender=hembra", headers=self.headers, timeout=10)
+                        gender_response = self.send('GET', f"{self.base_url}/dogs?gender=hembra", headers=self.headers, timeout=10)
                         if gender_response.status_code == 200:
                             gender_filtered = gender_response.json()
                             self.log_result("Get Dog Listings (Gender Filter)", True, 
                                           f"Gender filter working: {len(gender_filtered)} female dogs")
                             
                             # Test urgent filter
-                            urgent_response = requests.get(f"{self.base_url}/dogs?urgent=true", headers=self.headers, timeout=10)
+                            urgent_response = self.send('GET', f"{self.base_url}/dogs?urgent=true", headers=self.headers, timeout=10)
                             if urgent_response.status_code == 200:
                                 urgent_filtered = urgent_response.json()
                                 self.log_result("Get Dog Listings (Urgent Filter)", True, 
@@ -295,8 +839,8 @@ class AdoptaunpanaAPITester:
             return False
         
         try:
-            response = requests.get(f"{self.base_url}/dogs/{self.created_dog_id}", 
-                                  headers=self.headers, timeout=10)
+            response = self.send('GET', f"{self.base_url}/dogs/{self.created_dog_id}", 
+                                          headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -329,10 +873,10 @@ class AdoptaunpanaAPITester:
                 "message": "Hola, estoy muy interesado en adoptar a Luna. ¿Podríamos hablar por teléfono? Tengo experiencia con perros y un jardín grande."
             }
             
-            response = requests.post(f"{self.base_url}/messages", 
-                                   headers=self.headers, 
-                                   json=test_message, 
-                                   timeout=15)
+            response = self.send('POST', f"{self.base_url}/messages", 
+                                           headers=self.headers, 
+                                           json=test_message, 
+                                           timeout=15)
             
             if response.status_code == 200:
                 data = response.json()
@@ -355,7 +899,7 @@ class AdoptaunpanaAPITester:
         """Test GET /api/messages - fetch messages"""
         try:
             # Test getting all messages
-            response = requests.get(f"{self.base_url}/messages", headers=self.headers, timeout=10)
+            response = self.send('GET', f"{self.base_url}/messages", headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 all_messages = response.json()
@@ -364,7 +908,7 @@ class AdoptaunpanaAPITester:
                     
                     # Test filtering by listing_id if we have a dog
                     if self.created_dog_id:
-                        filtered_response = requests.get(
+                        filtered_response = self.send('GET',
                             f"{self.base_url}/messages?listing_id={self.created_dog_id}", 
                             headers=self.headers, timeout=10
                         )
@@ -391,11 +935,174 @@ class AdoptaunpanaAPITester:
             self.log_result("Get Messages", False, f"Request failed: {str(e)}")
             return False
     
+    def walk_pages(self, path, limit, max_rows=None):
+        """Follow next_cursor from the first page and return the rows seen, stopping at the last
+        page or once max_rows rows have been collected"""
+        rows = []
+        cursor = None
+        while True:
+            params = {'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.send('GET', f"{self.base_url}{path}", headers=self.headers, params=params, timeout=10)
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+            page = response.json()
+            if len(page['data']) > limit:
+                raise RuntimeError(f"Page of {len(page['data'])} rows exceeds limit {limit}")
+            rows.extend(page['data'])
+            if page.get('next_cursor') and page['next_cursor'] == cursor:
+                raise RuntimeError("next_cursor did not advance")
+            cursor = page.get('next_cursor')
+            if not cursor or (max_rows is not None and len(rows) >= max_rows):
+                return rows if max_rows is None else rows[:max_rows]
+
+    def compare_walk(self, name, expected_ids, paged_ids, page_size):
+        """Log and return whether a paginated walk reproduced the expected ids exactly"""
+        duplicates = len(paged_ids) - len(set(paged_ids))
+        skipped = set(expected_ids) - set(paged_ids)
+        if duplicates or skipped:
+            self.log_result(f"Pagination ({name})", False,
+                            f"{duplicates} duplicated and {len(skipped)} skipped rows across pages")
+            return False
+        if paged_ids != expected_ids:
+            self.log_result(f"Pagination ({name})", False, "Paged order differs from the unpaginated order")
+            return False
+        self.log_result(f"Pagination ({name})", True,
+                        f"Walked {len(paged_ids)} rows in pages of {page_size} with no duplicates or gaps")
+        return True
+
+    def test_pagination(self, rows=24, page_size=7):
+        """Test GET /api/dogs and /api/messages cursor pagination on rows this test creates -
+        no duplicates, nothing skipped, whatever the table size"""
+        dog_ids = []
+        try:
+            # Urgent and newest, so they lead the urgent=true feed. Created in one batch, many
+            # share a createdAt millisecond, which exercises the id tie-break.
+            province_id, city_id = self.pick_location()
+            dogs = [self.build_test_dog(province_id, city_id, dogName=f"Pagina{i}", isUrgent=True) for i in range(rows)]
+            response = self.send('POST', f"{self.base_url}/dogs/batch", headers=self.headers, json=dogs, timeout=30)
+            if response.status_code != 200 or response.json()['inserted'] != rows:
+                self.log_result("Pagination", False, f"Cannot create test dogs: HTTP {response.status_code}")
+                return False
+            dog_ids = [result['id'] for result in response.json()['results']]
+            messages = [{"listing_id": dog_ids[0], "senderName": "Pagination Test", "senderEmail": "page.test@example.com",
+                         "message": f"Mensaje {i}"} for i in range(rows)]
+            response = self.send('POST', f"{self.base_url}/messages/batch", headers=self.headers, json=messages, timeout=30)
+            if response.status_code != 200 or response.json()['inserted'] != rows:
+                self.log_result("Pagination", False, f"Cannot create test messages: HTTP {response.status_code}")
+                return False
+
+            # Dogs: the first rows of the urgent feed, walked page by page vs one limit=rows page
+            full_response = self.send('GET', f"{self.base_url}/dogs", headers=self.headers, timeout=30,
+                                      params={'urgent': 'true', 'limit': rows})
+            expected_ids = [row['id'] for row in full_response.json()['data']]
+            if set(expected_ids) != set(dog_ids):
+                self.log_result("Pagination (Dog Listings)", False, "Created listings do not lead the urgent feed")
+                return False
+            paged_ids = [row['id'] for row in self.walk_pages('/dogs?urgent=true', page_size, max_rows=rows)]
+            if not self.compare_walk("Dog Listings", expected_ids, paged_ids, page_size):
+                return False
+
+            # Messages: every message of the test listing
+            path = f"/messages?listing_id={dog_ids[0]}"
+            expected_ids = [row['id'] for row in self.send('GET', f"{self.base_url}{path}", headers=self.headers,
+                                                          timeout=30).json()]
+            paged_ids = [row['id'] for row in self.walk_pages(path, page_size)]
+            if len(expected_ids) != rows or not self.compare_walk("Messages", expected_ids, paged_ids, page_size):
+                return False
+
+            invalid = self.send('GET', f"{self.base_url}/dogs?cursor=not-a-cursor", headers=self.headers, timeout=10)
+            if invalid.status_code != 400:
+                self.log_result("Pagination (Invalid Cursor)", False, f"Expected 400, got: {invalid.status_code}")
+                return False
+            self.log_result("Pagination (Invalid Cursor)", True, "Malformed cursor rejected with 400")
+            return True
+
+        except Exception as e:
+            self.log_result("Pagination", False, f"Request failed: {str(e)}")
+            return False
+        finally:
+            for dog_id in dog_ids:
+                self.send('DELETE', f"{self.base_url}/dogs/{dog_id}", headers=self.headers, timeout=15)
+
+    def wire_size(self, url, encoding):
+        """Bytes on the wire for url with the given Accept-Encoding, plus the Content-Encoding used"""
+        headers = dict(self.headers, **{'Accept-Encoding': encoding})
+        response = self.session.get(url, headers=headers, timeout=30, stream=True)
+        raw = response.raw.read(decode_content=False)
+        response.close()
+        return len(raw), response.headers.get('Content-Encoding', 'identity')
+
+    def test_payload_size(self):
+        """Test fields=/view=card projections and response compression, reporting bytes per listing"""
+        try:
+            full = self.send('GET', f"{self.base_url}/dogs", headers=self.headers, timeout=30)
+            card = self.send('GET', f"{self.base_url}/dogs?view=card", headers=self.headers, timeout=30)
+            if full.status_code != 200 or card.status_code != 200:
+                self.log_result("Payload Size", False, f"HTTP {full.status_code}/{card.status_code}")
+                return False
+
+            full_rows, card_rows = full.json(), card.json()
+            if len(full_rows) != len(card_rows):
+                self.log_result("Payload Size (Card View)", False,
+                                f"Card view returned {len(card_rows)} rows, full view {len(full_rows)}")
+                return False
+            if card_rows and ('description' in card_rows[0] or 'thumbnail' not in card_rows[0]):
+                self.log_result("Payload Size (Card View)", False, f"Unexpected card fields: {sorted(card_rows[0])}")
+                return False
+
+            sparse = self.send('GET', f"{self.base_url}/dogs?fields=id,dogName", headers=self.headers, timeout=30)
+            if sparse.status_code != 200 or any(set(row) != {'id', 'dogName'} for row in sparse.json()):
+                self.log_result("Payload Size (Fields)", False, f"fields=id,dogName not honoured: HTTP {sparse.status_code}")
+                return False
+
+            invalid = self.send('GET', f"{self.base_url}/dogs?fields=id,notAColumn", headers=self.headers, timeout=10)
+            if invalid.status_code != 400:
+                self.log_result("Payload Size (Fields)", False, f"Expected 400 for unknown field, got {invalid.status_code}")
+                return False
+
+            # Each content-coding of a cached response is its own representation with its own ETag
+            card_url = f"{self.base_url}/dogs?view=card"
+            tags = {}
+            for encoding in ['identity', 'gzip', 'br']:
+                response = self.send('GET', card_url, headers=dict(self.headers, **{'Accept-Encoding': encoding}), timeout=30)
+                tags[response.headers.get('Content-Encoding', 'identity')] = response.headers.get('ETag')
+            if len(set(tags.values())) != len(tags):
+                self.log_result("Payload Size (ETags)", False, f"Content-codings share an ETag: {tags}")
+                return False
+            if 'gzip' in tags and 'br' in tags:
+                cross = self.send('GET', card_url, timeout=30,
+                                  headers=dict(self.headers, **{'Accept-Encoding': 'br', 'If-None-Match': tags['gzip']}))
+                if cross.status_code != 200:
+                    self.log_result("Payload Size (ETags)", False,
+                                    f"gzip ETag revalidated a br request: HTTP {cross.status_code}")
+                    return False
+
+            count = max(len(full_rows), 1)
+            sizes = {
+                'full': len(full.content),
+                'card': len(card.content),
+                'card+gzip': self.wire_size(f"{self.base_url}/dogs?view=card", 'gzip'),
+                'card+br': self.wire_size(f"{self.base_url}/dogs?view=card", 'br')
+            }
+            report = ", ".join(
+                f"{name} {(size[0] if isinstance(size, tuple) else size) / count:.0f}B"
+                + (f" ({size[1]})" if isinstance(size, tuple) else "")
+                for name, size in sizes.items()
+            )
+            self.log_result("Payload Size", True, f"Bytes per listing over {len(full_rows)} listings: {report}")
+            return True
+
+        except Exception as e:
+            self.log_result("Payload Size", False, f"Request failed: {str(e)}")
+            return False
+
     def test_search_functionality(self):
         """Test GET /api/search - search functionality"""
         try:
             # Test text search
-            search_response = requests.get(f"{self.base_url}/search?q=Luna", headers=self.headers, timeout=10)
+            search_response = self.send('GET', f"{self.base_url}/search?q=Luna", headers=self.headers, timeout=10)
             
             if search_response.status_code == 200:
                 search_results = search_response.json()
@@ -404,14 +1111,14 @@ class AdoptaunpanaAPITester:
                                   f"Text search working: {len(search_results)} results for 'Luna'")
                     
                     # Test search with filters
-                    filtered_search = requests.get(f"{self.base_url}/search?q=Luna&size=mediano&gender=hembra", 
-                                                 headers=self.headers, timeout=10)
+                    filtered_search = self.send('GET', f"{self.base_url}/search?q=Luna&size=mediano&gender=hembra", 
+                                                         headers=self.headers, timeout=10)
                     
                     if filtered_search.status_code == 200:
                         filtered_results = filtered_search.json()
                         self.log_result("Search Functionality (Filtered)", True, 
                                       f"Filtered search working: {len(filtered_results)} results")
-                        return True
+                        return self.check_full_text_search() and self.benchmark_search()
                     else:
                         self.log_result("Search Functionality (Filtered)", False, 
                                       f"Filtered search failed: HTTP {filtered_search.status_code}")
@@ -427,10 +1134,63 @@ class AdoptaunpanaAPITester:
             self.log_result("Search Functionality", False, f"Request failed: {str(e)}")
             return False
     
+    def check_full_text_search(self):
+        """Accent folding, stemming and relevance order of /api/search (needs the Luna listing)"""
+        if not self.created_dog_id:
+            return True
+
+        # "carinosa" (no ñ) and "cariñosas" (plural) must both stem to Luna's "cariñosa"
+        for variant in ["carinosa", "cariñosas"]:
+            response = self.send('GET', f"{self.base_url}/search", headers=self.headers,
+                                 params={'q': variant}, timeout=10)
+            ids = [dog['id'] for dog in response.json()] if response.status_code == 200 else []
+            if self.created_dog_id not in ids:
+                self.log_result("Search Functionality (Full Text)", False,
+                                f"'{variant}' did not match the Luna listing (HTTP {response.status_code})")
+                return False
+
+        # A name hit (weight A) must outrank description-only hits
+        response = self.send('GET', f"{self.base_url}/search", headers=self.headers, params={'q': 'Luna'}, timeout=10)
+        results = response.json()
+        if results and results[0].get('dogName') != 'Luna':
+            self.log_result("Search Functionality (Ranking)", False,
+                            f"Expected a dog named Luna first, got {results[0].get('dogName')}")
+            return False
+
+        paged_ids = [row['id'] for row in self.walk_pages('/search?q=Luna', limit=10, max_rows=100)]
+        if len(paged_ids) != len(set(paged_ids)):
+            self.log_result("Search Functionality (Pagination)", False, "Duplicate results across search pages")
+            return False
+
+        self.log_result("Search Functionality (Full Text)", True,
+                        f"Accent folding, stemming and ranking working; {len(paged_ids)} paged results for 'Luna'")
+        return True
+
+    def benchmark_search(self, repetitions=10):
+        """Time representative queries; seed a large table with seed_test_data.py for meaningful numbers"""
+        queries = ['Luna', 'perro cariñoso', 'galgo', 'bueno con niños', 'podenco tranquilo', 'zzzz-sin-resultados']
+        stats = self.send('GET', f"{self.base_url}/stats", headers=self.headers, timeout=10).json()
+        catalog_size = stats.get('totalDogs', 0)
+
+        timings = []
+        for query in queries:
+            for _ in range(repetitions):
+                response = self.send('GET', f"{self.base_url}/search", headers=self.headers,
+                                     params={'q': query, 'limit': 20}, timeout=30)
+                if response.status_code != 200:
+                    self.log_result("Search Benchmark", False, f"'{query}' failed: HTTP {response.status_code}")
+                    return False
+                timings.append(response.timing['total_ms'])
+
+        self.log_result("Search Benchmark", True,
+                        f"{len(timings)} searches over {catalog_size} active listings: "
+                        f"p50 {percentile(timings, 50):.1f}ms, p99 {percentile(timings, 99):.1f}ms")
+        return True
+
     def test_stats_endpoint(self):
         """Test GET /api/stats - platform statistics"""
         try:
-            response = requests.get(f"{self.base_url}/stats", headers=self.headers, timeout=10)
+            response = self.send('GET', f"{self.base_url}/stats", headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -452,6 +1212,694 @@ class AdoptaunpanaAPITester:
             self.log_result("Stats Endpoint", False, f"Request failed: {str(e)}")
             return False
     
+    def pick_location(self):
+        """Return (province_id, city_id) of the first seeded city"""
+        response = self.send('GET', f"{self.base_url}/cities", headers=self.headers, timeout=10)
+        if response.status_code != 200 or not response.json():
+            raise RuntimeError("No cities available for test data")
+        city = response.json()[0]
+        return city['province_id'], city['id']
+
+    def build_test_dog(self, province_id, city_id, **overrides):
+        dog = {
+            "title": "Perro de Prueba",
+            "dogName": "Prueba",
+            "description": "Listado creado por el test de consistencia de estadísticas.",
+            "age": 12,
+            "size": "pequeño",
+            "gender": "macho",
+            "isUrgent": False,
+            "contactName": "Test Suite",
+            "contactEmail": "stats.test@example.com",
+            "province": province_id,
+            "city": city_id
+        }
+        dog.update(overrides)
+        return dog
+
+    def recount_stats(self):
+        """Ground-truth stats from exact PostgREST counts, bypassing the app and its caches"""
+        provinces = self.supabase_request('GET', '/provinces', params={'select': 'id,name'}).json()
+        by_province = {}
+        for province in provinces:
+            count = self.count_rows('dog_listings', status='active', province_id=province['id'])
+            if count:
+                by_province[province['name']] = by_province.get(province['name'], 0) + count
+        return {
+            'totalDogs': self.count_rows('dog_listings', status='active'),
+            'urgentDogs': self.count_rows('dog_listings', status='active', isUrgent='true'),
+            'totalMessages': self.count_rows('messages'),
+            'dogsByProvince': by_province
+        }
+
+    def stats_mismatches(self):
+        stats = self.send('GET', f"{self.base_url}/stats", headers=self.headers, timeout=10).json()
+        expected = self.recount_stats()
+        return [f"{key}: stats={stats.get(key)} recount={value}"
+                for key, value in expected.items() if stats.get(key) != value]
+
+    def expect_write(self, name, response):
+        """Raise unless a write request succeeded, so counts are never compared after a failed write"""
+        if response.status_code != 200:
+            raise RuntimeError(f"{name} failed: HTTP {response.status_code}: {response.text}")
+        return response.json()
+
+    def test_stats_consistency(self, batch_size=40):
+        """Test GET /api/stats aggregates match exact PostgREST counts after bulk writes"""
+        if not self.supabase_url or not self.supabase_key:
+            self.log_result("Stats Consistency", True,
+                            "Skipped: set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY to recount")
+            return True
+        created_ids = []
+        try:
+            # Multi-row statements, spread over several provinces, so the statement-level
+            # triggers aggregate transition tables with more than one row per province
+            cities = self.send('GET', f"{self.base_url}/cities", headers=self.headers, timeout=10).json()[:3]
+            dogs = [self.build_test_dog(cities[i % len(cities)]['province_id'], cities[i % len(cities)]['id'],
+                                        dogName=f"Stats{i}", isUrgent=(i % 2 == 0))
+                    for i in range(batch_size)]
+            created = self.expect_write("Batch create",
+                                        self.send('POST', f"{self.base_url}/dogs/batch", headers=self.headers,
+                                                  json=dogs, timeout=30))
+            created_ids = [result['id'] for result in created['results'] if result['success']]
+            if created['inserted'] != batch_size:
+                raise RuntimeError(f"Batch create inserted {created['inserted']}/{batch_size}")
+
+            # Exercise every maintained transition: urgent flip, status change, delete, message insert
+            self.expect_write("Urgent flip", self.send('PUT', f"{self.base_url}/dogs/{created_ids[0]}",
+                                                       headers=self.headers, json={'isUrgent': False}, timeout=15))
+            self.expect_write("Status change", self.send('PUT', f"{self.base_url}/dogs/{created_ids[1]}",
+                                                         headers=self.headers, json={'status': 'adopted'}, timeout=15))
+            self.expect_write("Delete", self.send('DELETE', f"{self.base_url}/dogs/{created_ids[-1]}",
+                                                  headers=self.headers, timeout=15))
+            created_ids.pop()
+            messages = [{
+                "listing_id": created_ids[i % len(created_ids)],
+                "senderName": "Stats Test",
+                "senderEmail": "stats.sender@example.com",
+                "message": f"Mensaje {i} del test de consistencia"
+            } for i in range(batch_size)]
+            sent = self.expect_write("Batch messages", self.send('POST', f"{self.base_url}/messages/batch",
+                                                                 headers=self.headers, json=messages, timeout=30))
+            if sent['inserted'] != batch_size:
+                raise RuntimeError(f"Batch messages inserted {sent['inserted']}/{batch_size}")
+
+            mismatches = self.stats_mismatches()
+            if mismatches:
+                self.log_result("Stats Consistency (After Writes)", False, "; ".join(mismatches))
+                return False
+            self.log_result("Stats Consistency (After Writes)", True,
+                            f"Aggregates match exact counts after batches of {batch_size} listings and messages, "
+                            f"updates and a delete")
+
+            # Deleting listings cascades to their messages and must be reflected too
+            while created_ids:
+                self.expect_write("Delete", self.send('DELETE', f"{self.base_url}/dogs/{created_ids[-1]}",
+                                                      headers=self.headers, timeout=15))
+                created_ids.pop()
+
+            mismatches = self.stats_mismatches()
+            if mismatches:
+                self.log_result("Stats Consistency (After Deletes)", False, "; ".join(mismatches))
+                return False
+            self.log_result("Stats Consistency (After Deletes)", True, "Aggregates match recount after deletes")
+            return True
+
+        except Exception as e:
+            self.log_result("Stats Consistency", False, f"Request failed: {str(e)}")
+            return False
+        finally:
+            for dog_id in created_ids:
+                self.send('DELETE', f"{self.base_url}/dogs/{dog_id}", headers=self.headers, timeout=15)
+
+    def test_batch_endpoints(self, batch_size=25):
+        """Test POST /api/dogs/batch and /api/messages/batch and compare records/s with the single-item path"""
+        created_ids = []
+        try:
+            province_id, city_id = self.pick_location()
+
+            # Single-item baseline
+            started = time.perf_counter()
+            for i in range(batch_size):
+                dog = self.build_test_dog(province_id, city_id, dogName=f"Single{i}")
+                response = self.send('POST', f"{self.base_url}/dogs", headers=self.headers, json=dog, timeout=15)
+                if response.status_code != 200:
+                    self.log_result("Batch Endpoints (Single Baseline)", False, f"HTTP {response.status_code}: {response.text}")
+                    return False
+                created_ids.append(response.json()['id'])
+            single_rate = batch_size / (time.perf_counter() - started)
+
+            # Batch with one invalid item in the middle
+            items = [self.build_test_dog(province_id, city_id, dogName=f"Batch{i}") for i in range(batch_size)]
+            items[batch_size // 2] = {"title": "Sin datos"}
+            started = time.perf_counter()
+            response = self.send('POST', f"{self.base_url}/dogs/batch", headers=self.headers, json=items, timeout=30)
+            batch_rate = batch_size / (time.perf_counter() - started)
+            if response.status_code != 200:
+                self.log_result("Batch Endpoints (Dogs)", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+            data = response.json()
+            results = data['results']
+            created_ids.extend(r['id'] for r in results if r['success'])
+            rejected = [r for r in results if not r['success']]
+            if data['inserted'] != batch_size - 1 or len(rejected) != 1 or rejected[0]['index'] != batch_size // 2 \
+                    or 'Missing required field' not in rejected[0]['error']:
+                self.log_result("Batch Endpoints (Dogs)", False, f"Unexpected per-item results: {data}")
+                return False
+            self.log_result("Batch Endpoints (Dogs)", True,
+                            f"{data['inserted']} inserted, invalid item rejected; {batch_rate:.0f} records/s "
+                            f"batched vs {single_rate:.0f} records/s single ({batch_rate / single_rate:.1f}x)")
+
+            messages = [{
+                "listing_id": created_ids[i % len(created_ids)],
+                "senderName": "Batch Test",
+                "senderEmail": "batch.sender@example.com",
+                "message": f"Mensaje en lote {i}"
+            } for i in range(batch_size)]
+            started = time.perf_counter()
+            response = self.send('POST', f"{self.base_url}/messages/batch", headers=self.headers, json=messages, timeout=30)
+            message_rate = batch_size / (time.perf_counter() - started)
+            if response.status_code != 200 or response.json().get('inserted') != batch_size:
+                self.log_result("Batch Endpoints (Messages)", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+            self.log_result("Batch Endpoints (Messages)", True, f"{batch_size} messages inserted at {message_rate:.0f} records/s")
+
+            too_large = self.send('POST', f"{self.base_url}/messages/batch", headers=self.headers,
+                                  json=messages * 10, timeout=30)
+            if too_large.status_code != 400:
+                self.log_result("Batch Endpoints (Limit)", False, f"Expected 400 for oversized batch, got {too_large.status_code}")
+                return False
+            return True
+
+        except Exception as e:
+            self.log_result("Batch Endpoints", False, f"Request failed: {str(e)}")
+            return False
+        finally:
+            for dog_id in created_ids:
+                self.send('DELETE', f"{self.base_url}/dogs/{dog_id}", headers=self.headers, timeout=15)
+
+    def cache_status(self, url):
+        """GET url and return (response, X-Cache header)"""
+        response = self.send('GET', url, headers=self.headers, timeout=15)
+        return response, response.headers.get('X-Cache')
+
+    def test_listing_cache(self, repetitions=20):
+        """Test the GET /api/dogs and /api/dogs/{id} response cache: hits, ETags and invalidation on writes"""
+        created_ids = []
+        try:
+            province_id, city_id = self.pick_location()
+            response = self.send('POST', f"{self.base_url}/dogs", headers=self.headers,
+                                 json=self.build_test_dog(province_id, city_id, dogName="Cacheado"), timeout=15)
+            if response.status_code != 200:
+                self.log_result("Listing Cache", False, f"Cannot create test dog: HTTP {response.status_code}")
+                return False
+            dog_id = response.json()['id']
+            created_ids.append(dog_id)
+
+            single_url = f"{self.base_url}/dogs/{dog_id}"
+            list_url = f"{self.base_url}/dogs?province={province_id}&size=pequeño"
+            reordered_url = f"{self.base_url}/dogs?size=pequeño&province={province_id}"
+            other_url = f"{self.base_url}/dogs?province={province_id}&size=grande"
+
+            # Miss then hit, for the single listing and a filtered list (param order must not matter)
+            for name, first_url, second_url in [("Single", single_url, single_url), ("Filtered List", list_url, reordered_url)]:
+                first, first_status = self.cache_status(first_url)
+                second, second_status = self.cache_status(second_url)
+                if first.status_code != 200 or (first_status, second_status) != ('MISS', 'HIT') \
+                        or first.json() != second.json() or first.headers.get('ETag') != second.headers.get('ETag'):
+                    self.log_result(f"Listing Cache ({name})", False,
+                                    f"Expected MISS then HIT with the same body and ETag, got {first_status}/{second_status}")
+                    return False
+                conditional_headers = dict(self.headers, **{'If-None-Match': first.headers['ETag']})
+                revalidated = self.send('GET', second_url, headers=conditional_headers, timeout=15)
+                if revalidated.status_code != 304 or revalidated.content:
+                    self.log_result(f"Listing Cache ({name})", False,
+                                    f"Expected empty 304 for matching ETag, got HTTP {revalidated.status_code}")
+                    return False
+            self.cache_status(other_url)
+
+            # Hit latency vs a cache-busting query that always misses
+            hit_ms = [self.cache_status(list_url)[0].timing['total_ms'] for _ in range(repetitions)]
+            miss_ms = [self.cache_status(f"{list_url}&nocache={i}")[0].timing['total_ms'] for i in range(repetitions)]
+            self.log_result("Listing Cache (Latency)", True,
+                            f"hit p50 {percentile(hit_ms, 50):.1f}ms vs miss p50 {percentile(miss_ms, 50):.1f}ms "
+                            f"({percentile(miss_ms, 50) / max(percentile(hit_ms, 50), 0.001):.1f}x)")
+
+            # An update must drop the single entry and lists containing the dog, but not unrelated lists
+            update = self.send('PUT', single_url, headers=self.headers, json={"dogName": "Actualizado"}, timeout=15)
+            if update.status_code != 200:
+                self.log_result("Listing Cache (Update)", False, f"HTTP {update.status_code}: {update.text}")
+                return False
+            single, single_status = self.cache_status(single_url)
+            listed, list_status = self.cache_status(list_url)
+            _, other_status = self.cache_status(other_url)
+            listed_names = {dog['id']: dog['dogName'] for dog in listed.json()}
+            if single.json().get('dogName') != 'Actualizado' or listed_names.get(dog_id) != 'Actualizado' \
+                    or (single_status, list_status, other_status) != ('MISS', 'MISS', 'HIT'):
+                self.log_result("Listing Cache (Update)", False,
+                                f"Stale or imprecise invalidation: single={single.json().get('dogName')} ({single_status}), "
+                                f"list={listed_names.get(dog_id)} ({list_status}), unrelated list {other_status}")
+                return False
+
+            # A new matching listing must appear in the cached filtered list
+            response = self.send('POST', f"{self.base_url}/dogs", headers=self.headers,
+                                 json=self.build_test_dog(province_id, city_id, dogName="Nuevo"), timeout=15)
+            new_id = response.json()['id']
+            created_ids.append(new_id)
+            listed, list_status = self.cache_status(list_url)
+            if new_id not in {dog['id'] for dog in listed.json()} or list_status != 'MISS':
+                self.log_result("Listing Cache (Create)", False, f"New listing missing from filtered list ({list_status})")
+                return False
+
+            # A delete must drop the single entry and the listing from lists
+            self.send('DELETE', single_url, headers=self.headers, timeout=15)
+            created_ids.remove(dog_id)
+            single, _ = self.cache_status(single_url)
+            listed, _ = self.cache_status(list_url)
+            if single.status_code != 404 or dog_id in {dog['id'] for dog in listed.json()}:
+                self.log_result("Listing Cache (Delete)", False,
+                                f"Deleted listing still served: single HTTP {single.status_code}")
+                return False
+
+            self.log_result("Listing Cache (Invalidation)", True,
+                            "Update, create and delete invalidate exactly the affected responses")
+            return True
+
+        except Exception as e:
+            self.log_result("Listing Cache", False, f"Request failed: {str(e)}")
+            return False
+        finally:
+            for dog_id in created_ids:
+                self.send('DELETE', f"{self.base_url}/dogs/{dog_id}", headers=self.headers, timeout=15)
+
+    def test_listing_cache_eviction(self, max_probe_entries=2000):
+        """Test that the listing cache evicts least-recently-used entries at its size bound"""
+        try:
+            stats = self.send('GET', f"{self.base_url}/health", headers=self.headers, timeout=10).json().get('responseCache')
+            if not stats:
+                self.log_result("Listing Cache Eviction", False, "GET /api/health does not report responseCache")
+                return False
+            if stats['maxEntries'] > max_probe_entries:
+                self.log_result("Listing Cache Eviction", True,
+                                f"Skipped: maxEntries={stats['maxEntries']} (set RESPONSE_CACHE_MAX_ENTRIES to test)")
+                return True
+
+            def probe(i):
+                return f"{self.base_url}/dogs?limit=1&probe={i}"
+
+            self.cache_status(probe(0))
+            # Touch entry 0 halfway through so entry 1 becomes the oldest
+            for i in range(1, stats['maxEntries'] + 1):
+                self.cache_status(probe(i))
+                if i == stats['maxEntries'] // 2:
+                    self.cache_status(probe(0))
+
+            after = self.send('GET', f"{self.base_url}/health", headers=self.headers, timeout=10).json()['responseCache']
+            _, kept_status = self.cache_status(probe(0))
+            _, evicted_status = self.cache_status(probe(1))
+            if after['evictions'] <= stats['evictions'] or after['entries'] > after['maxEntries'] \
+                    or after['bytes'] > after['maxBytes'] or (kept_status, evicted_status) != ('HIT', 'MISS'):
+                self.log_result("Listing Cache Eviction", False,
+                                f"Unexpected LRU behaviour: recently used {kept_status}, oldest {evicted_status}, "
+                                f"stats {after}")
+                return False
+
+            self.log_result("Listing Cache Eviction", True,
+                            f"{after['evictions'] - stats['evictions']} evictions at {after['maxEntries']} entries; "
+                            f"{after['bytes']} of {after['maxBytes']} bytes used")
+            return True
+
+        except Exception as e:
+            self.log_result("Listing Cache Eviction", False, f"Request failed: {str(e)}")
+            return False
+
+    def stream_export(self, path, params=None):
+        """Yield rows from an NDJSON export one line at a time without buffering the response"""
+        url = f"{self.base_url}{path}"
+        started = time.perf_counter()
+        response = self.session.get(url, headers=self.headers, params=params, stream=True, timeout=60)
+        response_bytes = 0
+        try:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+            for line in response.iter_lines():
+                response_bytes += len(line) + 1
+                if line:
+                    yield json.loads(line)
+        finally:
+            response.close()
+            self.http_timings.append({
+                'test': self.current_test,
+                'endpoint': self.endpoint_name('GET', url),
+                'url': url,
+                'status': response.status_code,
+                'connect_ms': 0.0,
+                'ttfb_ms': round(response.elapsed.total_seconds() * 1000, 2),
+                'total_ms': round((time.perf_counter() - started) * 1000, 2),
+                'response_bytes': response_bytes
+            })
+
+    def test_streaming_export(self, chunk_size=100):
+        """Test GET /api/export/dogs and /api/export/messages: row counts, ordering and rows/s"""
+        try:
+            checks = [
+                ("Dogs", "/export/dogs", {'status': 'active'}, "/dogs"),
+                ("Messages", "/export/messages", {}, "/messages")
+            ]
+            for name, path, params, list_path in checks:
+                expected = self.send('GET', f"{self.base_url}{list_path}", headers=self.headers,
+                                     params={'fields': 'id'}, timeout=60).json()
+
+                started = time.perf_counter()
+                first_row_ms = None
+                ids = []
+                for row in self.stream_export(path, dict(params, chunk=chunk_size)):
+                    if first_row_ms is None:
+                        first_row_ms = (time.perf_counter() - started) * 1000
+                    ids.append(row['id'])
+                elapsed = time.perf_counter() - started
+
+                if sorted(ids) != sorted(row['id'] for row in expected):
+                    self.log_result(f"Streaming Export ({name})", False,
+                                    f"Exported {len(ids)} rows ({len(set(ids))} unique), expected {len(expected)}")
+                    return False
+                if ids != sorted(ids, reverse=True):
+                    self.log_result(f"Streaming Export ({name})", False, "Rows are not in keyset (id) order")
+                    return False
+
+                self.log_result(f"Streaming Export ({name})", True,
+                                f"{len(ids)} rows in chunks of {chunk_size} at {len(ids) / elapsed:.0f} rows/s, "
+                                f"first row after {first_row_ms or 0:.1f}ms")
+
+            invalid = self.send('GET', f"{self.base_url}/export/dogs?fields=notAColumn", headers=self.headers, timeout=10)
+            if invalid.status_code != 400:
+                self.log_result("Streaming Export (Fields)", False, f"Expected 400 for unknown field, got {invalid.status_code}")
+                return False
+            return True
+
+        except Exception as e:
+            self.log_result("Streaming Export", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_geo_proximity(self, repetitions=10):
+        """Test ?near=&radius_km= on /api/dogs and /api/search against client-side distances, and benchmark it
+        against the per-province fan-out it replaces"""
+        created_ids = []
+        try:
+            cities = self.send('GET', f"{self.base_url}/cities", headers=self.headers, timeout=10).json()
+            located = {city['id']: city for city in cities if city.get('latitude') is not None}
+            origin = located.get(GEO_ORIGIN_CITY)
+            if origin is None:
+                self.log_result("Geo Proximity", False, f"City {GEO_ORIGIN_CITY} has no coordinates (run /api/setup)")
+                return False
+            distances = {city_id: great_circle_km(origin['latitude'], origin['longitude'], city['latitude'], city['longitude'])
+                         for city_id, city in located.items()}
+            tolerance = GEO_RADIUS_KM * GEO_DISTANCE_TOLERANCE_PCT / 100
+            # Cities too close to the radius to call either way are left out of membership checks
+            inside = {city_id for city_id, km in distances.items() if km <= GEO_RADIUS_KM - tolerance}
+            outside = {city_id for city_id, km in distances.items() if km > GEO_RADIUS_KM + tolerance}
+            if len(inside) < 2 or not outside:
+                self.log_result("Geo Proximity", False, f"Need cities on both sides of {GEO_RADIUS_KM}km from {GEO_ORIGIN_CITY}")
+                return False
+
+            # Listings at the origin, at the nearest other city in range and at the farthest city
+            nearest = min(inside - {GEO_ORIGIN_CITY}, key=distances.get)
+            farthest = max(outside, key=distances.get)
+            for city_id in [GEO_ORIGIN_CITY, nearest, farthest]:
+                dog = self.build_test_dog(located[city_id]['province_id'], city_id, dogName="Geoproximidad")
+                response = self.send('POST', f"{self.base_url}/dogs", headers=self.headers, json=dog, timeout=15)
+                if response.status_code != 200:
+                    self.log_result("Geo Proximity", False, f"Cannot create test dog: HTTP {response.status_code}")
+                    return False
+                created_ids.append(response.json()['id'])
+            in_range_ids, far_id = set(created_ids[:2]), created_ids[2]
+
+            near_path = f"/dogs?near={GEO_ORIGIN_CITY}&radius_km={GEO_RADIUS_KM}"
+            response = self.send('GET', f"{self.base_url}{near_path}", headers=self.headers, timeout=30)
+            if response.status_code != 200:
+                self.log_result("Geo Proximity (Dogs)", False, f"HTTP {response.status_code}: {response.text}")
+                return False
+            nearby = response.json()
+
+            problems = []
+            reported = [dog['distance_km'] for dog in nearby]
+            if reported != sorted(reported):
+                problems.append("results not sorted by distance")
+            for dog in nearby:
+                expected = distances.get(dog['city_id'])
+                if dog['distance_km'] > GEO_RADIUS_KM + 0.1 or dog['city_id'] in outside:
+                    problems.append(f"{dog['id']} at {dog['distance_km']}km is outside the radius")
+                elif expected is not None and abs(dog['distance_km'] - expected) > max(0.2, expected * GEO_DISTANCE_TOLERANCE_PCT / 100):
+                    problems.append(f"{dog['id']} reported {dog['distance_km']}km, expected {expected:.1f}km")
+            returned_ids = {dog['id'] for dog in nearby}
+            if not in_range_ids <= returned_ids or far_id in returned_ids:
+                problems.append("created listings not included/excluded by distance")
+            # Ground truth: every active listing in a city well inside the radius
+            all_dogs = self.send('GET', f"{self.base_url}/dogs", headers=self.headers, timeout=60).json()
+            missing = {dog['id'] for dog in all_dogs if dog['city_id'] in inside} - returned_ids
+            if missing:
+                problems.append(f"{len(missing)} in-range listings missing")
+            if problems:
+                self.log_result("Geo Proximity (Dogs)", False, "; ".join(problems[:5]))
+                return False
+            self.log_result("Geo Proximity (Dogs)", True,
+                            f"{len(nearby)} listings within {GEO_RADIUS_KM}km of {GEO_ORIGIN_CITY}, "
+                            f"sorted by distance and within {GEO_DISTANCE_TOLERANCE_PCT}% of client-side distances")
+
+            # Cursor pagination must walk exactly the unpaginated result, in the same order
+            walked = self.walk_pages(near_path, limit=7)
+            if [dog['id'] for dog in walked] != [dog['id'] for dog in nearby]:
+                self.log_result("Geo Proximity (Pagination)", False,
+                                f"Paginated walk returned {len(walked)} rows, expected {len(nearby)} in the same order")
+                return False
+
+            # Combined with full-text search
+            response = self.send('GET', f"{self.base_url}/search", headers=self.headers, timeout=15,
+                                 params={'q': 'Geoproximidad', 'near': GEO_ORIGIN_CITY, 'radius_km': GEO_RADIUS_KM})
+            searched = response.json() if response.status_code == 200 else []
+            if response.status_code != 200 or {dog['id'] for dog in searched} & set(created_ids) != in_range_ids \
+                    or searched[0]['id'] != created_ids[0]:
+                self.log_result("Geo Proximity (Search)", False, f"HTTP {response.status_code}: unexpected results for q+near")
+                return False
+
+            for params, reason in [({'near': 'ciudad-inexistente'}, "unknown city"),
+                                   ({'near': GEO_ORIGIN_CITY, 'radius_km': '-5'}, "negative radius")]:
+                response = self.send('GET', f"{self.base_url}/dogs", headers=self.headers, params=params, timeout=10)
+                if response.status_code != 400:
+                    self.log_result("Geo Proximity (Validation)", False, f"Expected 400 for {reason}, got {response.status_code}")
+                    return False
+            self.log_result("Geo Proximity (Pagination, Search, Validation)", True,
+                            "Paginated walk matches, q+near filters by text and distance, bad input is rejected")
+
+            # Benchmark against the fan-out a client needed before: one request per province with a
+            # city in range, then filtering and sorting by distance client-side. Both are cache-busted.
+            provinces = sorted({located[city_id]['province_id'] for city_id in distances if distances[city_id] <= GEO_RADIUS_KM})
+            near_ms, fanout_ms = [], []
+            for i in range(repetitions):
+                started = time.perf_counter()
+                self.send('GET', f"{self.base_url}{near_path}&nocache=geo{i}", headers=self.headers, timeout=30)
+                near_ms.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                merged = []
+                for province_id in provinces:
+                    response = self.send('GET', f"{self.base_url}/dogs", headers=self.headers, timeout=30,
+                                         params={'province': province_id, 'nocache': f"geo{i}"})
+                    merged.extend(dog for dog in response.json() if distances.get(dog['city_id'], math.inf) <= GEO_RADIUS_KM)
+                merged.sort(key=lambda dog: distances[dog['city_id']])
+                fanout_ms.append((time.perf_counter() - started) * 1000)
+
+            near_p50, fanout_p50 = percentile(near_ms, 50), percentile(fanout_ms, 50)
+            self.log_result("Geo Proximity (Benchmark)", True,
+                            f"near p50 {near_p50:.1f}ms vs {len(provinces)}-province fan-out p50 {fanout_p50:.1f}ms "
+                            f"({fanout_p50 / max(near_p50, 0.001):.1f}x)")
+            return True
+
+        except Exception as e:
+            self.log_result("Geo Proximity", False, f"Request failed: {str(e)}")
+            return False
+        finally:
+            for dog_id in created_ids:
+                self.send('DELETE', f"{self.base_url}/dogs/{dog_id}", headers=self.headers, timeout=15)
+
+    def supabase_request(self, method, path, **kwargs):
+        """Call PostgREST directly with the service role key (not recorded in the API timings)"""
+        headers = dict(self.headers, apikey=self.supabase_key, Authorization=f"Bearer {self.supabase_key}")
+        headers.update(kwargs.pop('headers', {}))
+        return self.send(method, f"{self.supabase_url}/rest/v1{path}", record=False, headers=headers, timeout=30, **kwargs)
+
+    def count_rows(self, table, **filters):
+        """Exact row count of a table for the given equality filters, from PostgREST's Content-Range"""
+        params = dict({'select': 'id'}, **{column: f"eq.{value}" for column, value in filters.items()})
+        response = self.supabase_request('GET', f"/{table}", params=params, headers={'Prefer': 'count=exact', 'Range': '0-0'})
+        if response.status_code not in (200, 206):
+            raise RuntimeError(f"Counting {table} failed: HTTP {response.status_code}: {response.text}")
+        return int(response.headers.get('Content-Range', '*/0').split('/')[-1])
+
+    def active_listing_count(self):
+        return self.count_rows('dog_listings', status='active')
+
+    def plan_nodes(self, plan):
+        """Flatten an EXPLAIN (FORMAT JSON) plan tree into a list of nodes"""
+        nodes = [plan]
+        for child in plan.get('Plans', []):
+            nodes.extend(self.plan_nodes(child))
+        return nodes
+
+    def test_query_plans(self, repetitions=5):
+        """Benchmark the /api/dogs filter combinations and flag query plans that sequentially scan dog_listings"""
+        if not self.supabase_url or not self.supabase_key:
+            self.log_result("Query Plans", True,
+                            "Skipped: set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY to check plans")
+            return True
+        try:
+            province_id, city_id = self.pick_location()
+            combinations = LISTING_FILTER_COMBINATIONS + [
+                ("Province", {'province': province_id}),
+                ("City", {'city': city_id}),
+                ("Province+Urgent", {'province': province_id, 'urgent': 'true'})
+            ]
+            row_count = self.active_listing_count()
+            enforce = row_count >= MIN_PLAN_CHECK_ROWS
+
+            flagged = []
+            for name, params in combinations:
+                plan_response = self.supabase_request('POST', '/rpc/explain_listing_query', json={
+                    'filter_province': params.get('province'),
+                    'filter_city': params.get('city'),
+                    'filter_size': params.get('size'),
+                    'filter_gender': params.get('gender'),
+                    'urgent_only': params.get('urgent') == 'true',
+                    'page_size': 21
+                })
+                if plan_response.status_code == 404:
+                    self.log_result("Query Plans", True,
+                                    "Skipped: explain_listing_query is not installed (run POST /api/setup on Postgres)")
+                    return True
+                if plan_response.status_code != 200:
+                    self.log_result(f"Query Plans ({name})", False, f"HTTP {plan_response.status_code}: {plan_response.text}")
+                    return False
+
+                nodes = self.plan_nodes(plan_response.json()[0]['Plan'])
+                seq_scan = any(node['Node Type'] == 'Seq Scan' and node.get('Relation Name') == 'dog_listings'
+                               for node in nodes)
+                indexes = sorted({node['Index Name'] for node in nodes if 'Index Name' in node})
+                sorts = sum(1 for node in nodes if node['Node Type'] in ('Sort', 'Incremental Sort'))
+
+                # Page latency through the API; the extra param bypasses the response cache
+                page_ms = [self.send('GET', f"{self.base_url}/dogs", headers=self.headers,
+                                     params=dict(params, limit=20, bench=uuid.uuid4().hex), timeout=30).timing['total_ms']
+                           for _ in range(repetitions)]
+
+                detail = (f"{'SEQ SCAN' if seq_scan else ', '.join(indexes) or 'no index'}"
+                          f"{f', {sorts} sort step(s)' if sorts else ''}; page p50 {percentile(page_ms, 50):.1f}ms")
+                if seq_scan and enforce:
+                    flagged.append(name)
+                    self.log_result(f"Query Plans ({name})", False, f"Sequential scan on dog_listings: {detail}")
+                else:
+                    self.log_result(f"Query Plans ({name})", True, detail)
+
+            if not enforce:
+                self.log_result("Query Plans", True,
+                                f"Only {row_count} active listings (< {MIN_PLAN_CHECK_ROWS}); sequential scans not flagged. "
+                                f"Seed more with: python seed_test_data.py --dogs 100000")
+            return not flagged
+
+        except Exception as e:
+            self.log_result("Query Plans", False, f"Request failed: {str(e)}")
+            return False
+
+    def test_rate_limiting(self, workers=8, readers=2):
+        """Burst POST /api/messages at one listing: the limiter must cap accepted writes while /api/dogs reads stay flat"""
+        dog_id = None
+        try:
+            limits = self.send('GET', f"{self.base_url}/health", headers=self.headers, timeout=10).json().get('rateLimits')
+            if not limits:
+                self.log_result("Rate Limiting", False, "GET /api/health does not report rateLimits")
+                return False
+            listing_limit = limits['messagesPerListing']
+            if not listing_limit['capacity'] or not listing_limit['refillPerMinute']:
+                self.log_result("Rate Limiting", True, "Skipped: per-listing message limit disabled")
+                return True
+
+            province_id, city_id = self.pick_location()
+            response = self.send('POST', f"{self.base_url}/dogs", headers=self.headers,
+                                 json=self.build_test_dog(province_id, city_id, dogName="Limitado"), timeout=15)
+            if response.status_code != 200:
+                self.log_result("Rate Limiting", False, f"Cannot create test dog: HTTP {response.status_code}")
+                return False
+            dog_id = response.json()['id']
+
+            # A batch bigger than the per-listing burst is refused outright rather than capped
+            oversized = listing_limit['capacity'] + 1
+            if oversized <= MAX_BATCH_SIZE:
+                batch = [{"listing_id": dog_id, "senderName": "Rate Test", "senderEmail": "rate.test@example.com",
+                          "message": f"Mensaje {i}"} for i in range(oversized)]
+                response = self.send('POST', f"{self.base_url}/messages/batch", headers=self.headers, json=batch, timeout=30)
+                if response.status_code != 400:
+                    self.log_result("Rate Limiting (Oversized Batch)", False,
+                                    f"Batch of {oversized} messages to one listing got HTTP {response.status_code}, expected 400")
+                    return False
+
+            def read_latency():
+                # The extra param bypasses the listing response cache so every read reaches the database
+                return self.send('GET', f"{self.base_url}/dogs", headers=self.headers,
+                                 params={'limit': 20, 'bench': uuid.uuid4().hex}, timeout=30).timing['total_ms']
+
+            baseline_ms = [read_latency() for _ in range(20)]
+
+            burst = listing_limit['capacity'] * 2 + 20
+            message = {"listing_id": dog_id, "senderName": "Rate Test",
+                       "senderEmail": "rate.test@example.com", "message": "Mensaje de prueba de ráfaga"}
+            stop = threading.Event()
+            during_ms = []
+
+            def reader():
+                while not stop.is_set():
+                    during_ms.append(read_latency())
+
+            with ThreadPoolExecutor(max_workers=workers + readers) as executor:
+                reader_futures = [executor.submit(reader) for _ in range(readers)]
+                started = time.perf_counter()
+                responses = list(executor.map(
+                    lambda _: self.send('POST', f"{self.base_url}/messages", headers=self.headers, json=message, timeout=30),
+                    range(burst)))
+                elapsed = time.perf_counter() - started
+                stop.set()
+                for future in reader_futures:
+                    future.result()
+
+            accepted = sum(1 for r in responses if r.status_code == 200)
+            limited = [r for r in responses if r.status_code == 429]
+            unexpected = {r.status_code for r in responses} - {200, 429}
+            # Burst allowance plus whatever refilled while the burst ran
+            allowed = listing_limit['capacity'] + listing_limit['refillPerMinute'] / 60 * elapsed + 1
+
+            if unexpected or not limited or accepted > allowed:
+                self.log_result("Rate Limiting (Cap)", False,
+                                f"{accepted} accepted (cap {allowed:.0f}), {len(limited)} limited, unexpected {unexpected}")
+                return False
+            if any(int(r.headers.get('Retry-After', 0)) < 1 for r in limited):
+                self.log_result("Rate Limiting (Retry-After)", False, "429 responses without a positive Retry-After")
+                return False
+            self.log_result("Rate Limiting (Cap)", True,
+                            f"{accepted}/{burst} messages accepted in {elapsed:.1f}s (cap {allowed:.0f}), "
+                            f"{len(limited)} rejected with 429 + Retry-After")
+
+            baseline_p50, during_p50 = percentile(baseline_ms, 50), percentile(during_ms or [0], 50)
+            flat = during_p50 <= baseline_p50 * 2 + 25
+            self.log_result("Rate Limiting (Read Latency)", flat,
+                            f"/api/dogs p50 {baseline_p50:.1f}ms before vs {during_p50:.1f}ms during the burst "
+                            f"({len(during_ms)} reads)")
+            return flat
+
+        except Exception as e:
+            self.log_result("Rate Limiting", False, f"Request failed: {str(e)}")
+            return False
+        finally:
+            if dog_id:
+                self.send('DELETE', f"{self.base_url}/dogs/{dog_id}", headers=self.headers, timeout=15)
+
     def test_error_handling(self):
         """Test error handling for missing fields"""
         try:
@@ -461,10 +1909,10 @@ class AdoptaunpanaAPITester:
                 # Missing required fields intentionally
             }
             
-            response = requests.post(f"{self.base_url}/dogs", 
-                                   headers=self.headers, 
-                                   json=invalid_dog, 
-                                   timeout=10)
+            response = self.send('POST', f"{self.base_url}/dogs", 
+                                           headers=self.headers, 
+                                           json=invalid_dog, 
+                                           timeout=10)
             
             if response.status_code == 400:
                 data = response.json()
@@ -482,41 +1930,94 @@ class AdoptaunpanaAPITester:
             self.log_result("Error Handling", False, f"Request failed: {str(e)}")
             return False
     
-    def run_all_tests(self):
+    def run_test(self, name):
+        """Run one test on the current thread: (passed, results it logged, start, end)"""
+        self.current_test = name
+        self._context.results = []
+        started = time.perf_counter()
+        try:
+            passed = bool(getattr(self, name)())
+        except Exception as e:
+            print(f"❌ FAIL: {name} - Unexpected error: {str(e)}")
+            passed = False
+        finally:
+            results = self._context.results
+            del self._context.results
+        return passed, results, started, time.perf_counter()
+
+    def run_scheduled(self, plan, workers):
+        """Run the plan on a worker pool, starting each test once its prerequisites have finished"""
+        dependencies = expand_test_plan(plan)
+        outcomes = {}
+        running = {}
+        suite_started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = [name for name, _, _ in plan]
+            while pending or running:
+                for name in list(pending):
+                    if len(running) >= workers:
+                        break
+                    if dependencies[name] <= outcomes.keys():
+                        pending.remove(name)
+                        running[executor.submit(self.run_test, name)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    outcomes[running.pop(future)] = future.result()
+
+        wall = time.perf_counter() - suite_started
+        durations = {name: outcome[3] - outcome[2] for name, outcome in outcomes.items()}
+        path_seconds, path = critical_path(dependencies, durations)
+        self.schedule_report = {
+            'workers': workers,
+            'wall_seconds': round(wall, 3),
+            'serial_seconds': round(sum(durations.values()), 3),
+            'critical_path_seconds': round(path_seconds, 3),
+            'critical_path': path,
+            'tests': {
+                name: {
+                    'start_seconds': round(outcomes[name][2] - suite_started, 3),
+                    'duration_seconds': round(durations[name], 3),
+                    'passed': outcomes[name][0]
+                } for name, _, _ in plan
+            }
+        }
+        return outcomes
+
+    def check_write_limits(self):
+        """Warn when the server's per-IP write limits are too tight for the suite's own writes"""
+        try:
+            limits = self.send('GET', f"{self.base_url}/health", headers=self.headers, timeout=10).json().get('rateLimits') or {}
+        except Exception as e:
+            print(f"⚠️  Could not read rate limits from /api/health: {str(e)}")
+            return
+        for name, env_prefix in [('dogsPerIp', 'RATE_LIMIT_DOGS'), ('messagesPerIp', 'RATE_LIMIT_MESSAGES')]:
+            limit = limits.get(name)
+            if limit and limit['capacity'] and limit['refillPerMinute'] and limit['capacity'] < SUITE_WRITE_BUDGET:
+                print(f"⚠️  {name} allows a burst of {limit['capacity']} but the suite writes up to {SUITE_WRITE_BUDGET}; "
+                      f"write tests may get 429s. Start the server with {env_prefix}_BURST/{env_prefix}_PER_MINUTE "
+                      f">= {SUITE_WRITE_BUDGET} (--start-app does this).")
+
+    def run_all_tests(self, workers=4):
         """Run all backend API tests"""
         print("🐕 Starting adoptaunpana.es Backend API Tests")
         print("=" * 60)
-        
-        tests = [
-            self.test_root_endpoint,
-            self.test_database_setup,
-            self.test_provinces_endpoint,
-            self.test_cities_endpoint,
-            self.test_create_dog_listing,
-            self.test_get_dog_listings,
-            self.test_get_single_dog,
-            self.test_send_message,
-            self.test_get_messages,
-            self.test_search_functionality,
-            self.test_stats_endpoint,
-            self.test_error_handling
-        ]
-        
-        passed = 0
-        failed = 0
-        
-        for test in tests:
-            try:
-                if test():
-                    passed += 1
-                else:
-                    failed += 1
-            except Exception as e:
-                print(f"❌ FAIL: {test.__name__} - Unexpected error: {str(e)}")
-                failed += 1
-            
-            # Small delay between tests
-            time.sleep(0.5)
+
+        self.check_write_limits()
+        metrics_before = self.scrape_metrics()
+        outcomes = self.run_scheduled(TEST_PLAN, workers)
+        metrics_after = self.scrape_metrics()
+
+        # Deterministic output regardless of which test finished first
+        order = {name: index for index, (name, _, _) in enumerate(TEST_PLAN)}
+        for name, _, _ in TEST_PLAN:
+            self.test_results.extend(outcomes[name][1])
+        self.http_timings.sort(key=lambda timing: order.get(timing['test'], len(order)))
+
+        passed = sum(1 for outcome in outcomes.values() if outcome[0])
+        failed = len(outcomes) - passed
+        if metrics_before is not None and metrics_after is not None:
+            self.server_attribution = self.attribute_latency(metrics_before, metrics_after)
         
         print("\n" + "=" * 60)
         print(f"🐕 adoptaunpana.es Backend API Test Results")
@@ -528,22 +2029,499 @@ class AdoptaunpanaAPITester:
             print("🎉 All tests passed! Backend API is working correctly.")
         else:
             print("⚠️  Some tests failed. Check the details above.")
+        report = self.schedule_report
+        print(f"⏱️  Wall time {report['wall_seconds']:.1f}s with {report['workers']} workers "
+              f"(tests sum {report['serial_seconds']:.1f}s, critical path {report['critical_path_seconds']:.1f}s: "
+              f"{' → '.join(name[len('test_'):] for name in report['critical_path'])})")
+        self.print_latency_table()
+        self.print_attribution_table()
+        self.print_connection_stats()
         
         return passed, failed, self.test_results
 
+    def run_load_test(self, users=10, duration=30, total_requests=None, seed=None):
+        """Replay the endpoint mix from concurrent virtual users and report latency percentiles"""
+        print(f"🐕 Starting adoptaunpana.es load test: {users} users, "
+              + (f"{total_requests} requests" if total_requests else f"{duration}s"))
+        print("=" * 60)
+
+        names = [name for name, _, _ in LOAD_TEST_ENDPOINTS]
+        paths = {name: path for name, path, _ in LOAD_TEST_ENDPOINTS}
+        weights = [weight for _, _, weight in LOAD_TEST_ENDPOINTS]
+
+        latencies = {name: [] for name in names}
+        payload_bytes = {name: [] for name in names}
+        errors = {name: 0 for name in names}
+        lock = threading.Lock()
+        issued = [0]
+        started = time.perf_counter()
+        deadline = started + duration
+
+        def next_request_allowed():
+            with lock:
+                if total_requests is not None:
+                    if issued[0] >= total_requests:
+                        return False
+                elif time.perf_counter() >= deadline:
+                    return False
+                issued[0] += 1
+                return True
+
+        def virtual_user(user_index):
+            rng = random.Random(None if seed is None else seed + user_index)
+            while next_request_allowed():
+                name = rng.choices(names, weights=weights)[0]
+                request_started = time.perf_counter()
+                size = 0
+                try:
+                    response = self.send('GET', f"{self.base_url}{paths[name]}", record=False,
+                                         headers=self.headers, timeout=30)
+                    ok = response.status_code == 200
+                    size = response.timing['response_bytes']
+                except Exception:
+                    ok = False
+                elapsed_ms = (time.perf_counter() - request_started) * 1000
+                with lock:
+                    latencies[name].append(elapsed_ms)
+                    payload_bytes[name].append(size)
+                    if not ok:
+                        errors[name] += 1
+
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            for future in [pool.submit(virtual_user, i) for i in range(users)]:
+                future.result()
+
+        wall_time = time.perf_counter() - started
+        endpoints = {}
+        for name in names:
+            samples = latencies[name]
+            if not samples:
+                continue
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': errors[name],
+                'throughput_rps': round(len(samples) / wall_time, 2),
+                'p50_ms': round(percentile(samples, 50), 2),
+                'p90_ms': round(percentile(samples, 90), 2),
+                'p99_ms': round(percentile(samples, 99), 2),
+                'max_ms': round(max(samples), 2),
+                'avg_response_bytes': round(sum(payload_bytes[name]) / len(samples))
+            }
+
+        total = sum(e['requests'] for e in endpoints.values())
+        total_errors = sum(e['errors'] for e in endpoints.values())
+
+        print(f"{'Endpoint':<30}{'reqs':>7}{'err':>6}{'rps':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+        for name, e in endpoints.items():
+            print(f"{name:<30}{e['requests']:>7}{e['errors']:>6}{e['throughput_rps']:>9.1f}"
+                  f"{e['p50_ms']:>9.1f}{e['p90_ms']:>9.1f}{e['p99_ms']:>9.1f}{e['max_ms']:>9.1f}")
+        print("\n" + "=" * 60)
+        print(f"📊 {total} requests in {wall_time:.1f}s ({total / wall_time if wall_time else 0:.1f} req/s), "
+              f"{total_errors} errors")
+        connections = self.print_connection_stats()
+
+        return {
+            'users': users,
+            'duration_s': round(wall_time, 2),
+            'total_requests': total,
+            'total_errors': total_errors,
+            'throughput_rps': round(total / wall_time, 2) if wall_time else 0,
+            'endpoints': endpoints,
+            'connections': connections
+        }
+
+
+    def server_resources(self, pid=None):
+        """Server RSS, open FDs and heap from /proc when pid is given, else from GET /api/metrics"""
+        if pid:
+            return dict(process_resources(pid), heap_used_bytes=None)
+        samples = self.scrape_metrics() or {}
+        gauges = {
+            'rss_bytes': 'process_resident_memory_bytes',
+            'open_fds': 'process_open_fds',
+            'heap_used_bytes': 'nodejs_heap_used_bytes'
+        }
+        return {key: int(samples[(name, ())]) if (name, ()) in samples else None for key, name in gauges.items()}
+
+    def soak_operation(self, name, rng, state):
+        """Send one soak-mix request and return its response"""
+        if name == "browse":
+            params = {'limit': 20}
+            filter_name, value = rng.choice([(None, None), ('size', 'mediano'), ('gender', 'hembra'), ('urgent', 'true')])
+            if filter_name:
+                params[filter_name] = value
+            return self.send('GET', f"{self.base_url}/dogs", record=False, headers=self.headers, params=params, timeout=30)
+        if name == "view_dog":
+            return self.send('GET', f"{self.base_url}/dogs/{rng.choice(state['dog_ids'])}", record=False,
+                             headers=self.headers, timeout=30)
+        if name == "search":
+            query = rng.choice(['Luna', 'perro cariñoso', 'galgo', 'bueno con niños', 'podenco'])
+            return self.send('GET', f"{self.base_url}/search", record=False, headers=self.headers,
+                             params={'q': query, 'limit': 20}, timeout=30)
+        if name == "stats":
+            return self.send('GET', f"{self.base_url}/stats", record=False, headers=self.headers, timeout=30)
+        if name == "list_messages":
+            # The unpaginated list, which grows with every message sent
+            response = self.send('GET', f"{self.base_url}/messages", record=False, headers=self.headers, timeout=60)
+            state['messages_bytes'] = response.timing['response_bytes']
+            return response
+        if name == "create_dog":
+            dog = self.build_test_dog(state['province_id'], state['city_id'], dogName=f"Soak{rng.randrange(10**6)}",
+                                      contactEmail="soak.test@example.com")
+            response = self.send('POST', f"{self.base_url}/dogs", record=False, headers=self.headers, json=dog, timeout=30)
+            if response.status_code == 200:
+                with state['lock']:
+                    state['created_ids'].append(response.json()['id'])
+                    state['dog_ids'].append(response.json()['id'])
+            return response
+        message = {"listing_id": rng.choice(state['dog_ids']), "senderName": "Soak Test",
+                   "senderEmail": "soak.test@example.com", "message": "Mensaje del test de resistencia"}
+        return self.send('POST', f"{self.base_url}/messages", record=False, headers=self.headers, json=message, timeout=30)
+
+    def run_soak_test(self, users=10, duration=3600, rate=20.0, window=60, server_pid=None, seed=None):
+        """Drive a steady mixed workload and record per-window latency and server resources"""
+        print(f"🐕 Starting adoptaunpana.es soak test: {users} users at {rate:.1f} req/s for {duration:.0f}s "
+              f"({window:.0f}s windows)")
+        print("=" * 60)
+
+        province_id, city_id = self.pick_location()
+        existing = self.send('GET', f"{self.base_url}/dogs", record=False, headers=self.headers,
+                             params={'limit': 100, 'fields': 'id'}, timeout=30).json()['data']
+        state = {
+            'province_id': province_id,
+            'city_id': city_id,
+            'dog_ids': [dog['id'] for dog in existing],
+            'created_ids': [],
+            'messages_bytes': None,
+            'lock': threading.Lock()
+        }
+        # view_dog and send_message pick from dog_ids, so an empty database needs one listing first
+        if not state['dog_ids']:
+            response = self.send('POST', f"{self.base_url}/dogs", record=False, headers=self.headers, timeout=30,
+                                 json=self.build_test_dog(province_id, city_id, dogName="SoakInicial",
+                                                          contactEmail="soak.test@example.com"))
+            if response.status_code != 200:
+                raise RuntimeError(f"No listings to soak and cannot create one: HTTP {response.status_code}")
+            state['created_ids'].append(response.json()['id'])
+            state['dog_ids'].append(response.json()['id'])
+        names = [name for name, _ in SOAK_MIX]
+        weights = [weight for _, weight in SOAK_MIX]
+
+        samples = []
+        windows = []
+        lock = threading.Lock()
+        stop = threading.Event()
+        started = time.perf_counter()
+        deadline = started + duration
+
+        def virtual_user(user_index):
+            rng = random.Random(None if seed is None else seed + user_index)
+            interval = users / rate
+            # Stagger users so the aggregate arrival rate is steady
+            next_due = started + interval * user_index / users
+            while not stop.is_set():
+                delay = next_due - time.perf_counter()
+                if delay > 0:
+                    stop.wait(delay)
+                if stop.is_set() or time.perf_counter() >= deadline:
+                    return
+                next_due += interval
+                name = rng.choices(names, weights=weights)[0]
+                request_started = time.perf_counter()
+                try:
+                    status = self.soak_operation(name, rng, state).status_code
+                except Exception:
+                    status = None
+                with lock:
+                    samples.append((name, (time.perf_counter() - request_started) * 1000, status))
+
+        def close_window(index, window_started):
+            with lock:
+                window_samples = samples[:]
+                samples.clear()
+            latencies = [ms for _, ms, _ in window_samples]
+            resources = self.server_resources(server_pid)
+            row = {
+                'window': index,
+                'elapsed_s': round(time.perf_counter() - started, 1),
+                'requests': len(window_samples),
+                'throughput_rps': round(len(window_samples) / max(time.perf_counter() - window_started, 0.001), 2),
+                'errors': sum(1 for _, _, status in window_samples if status is None or status >= 500),
+                'rate_limited': sum(1 for _, _, status in window_samples if status == 429),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p90_ms': round(percentile(latencies, 90), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'operations': {
+                    name: round(percentile([ms for op, ms, _ in window_samples if op == name], 50), 2)
+                    for name in names if any(op == name for op, _, _ in window_samples)
+                },
+                'messages_bytes': state['messages_bytes'],
+                **resources
+            }
+            windows.append(row)
+            rss = f"{row['rss_bytes'] / 2**20:.0f}MB" if row['rss_bytes'] else "n/a"
+            print(f"⏱️  window {index:>3} @ {row['elapsed_s']:>7.0f}s: {row['requests']:>5} reqs, "
+                  f"p50 {row['p50_ms']:.1f}ms, p99 {row['p99_ms']:.1f}ms, {row['errors']} errors, "
+                  f"rss {rss}, fds {row['open_fds'] if row['open_fds'] is not None else 'n/a'}")
+
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            futures = [pool.submit(virtual_user, i) for i in range(users)]
+            index = 0
+            window_started = time.perf_counter()
+            try:
+                while time.perf_counter() < deadline:
+                    stop.wait(min(window, max(deadline - time.perf_counter(), 0)))
+                    close_window(index, window_started)
+                    index += 1
+                    window_started = time.perf_counter()
+            finally:
+                stop.set()
+                for future in futures:
+                    future.result()
+
+        for dog_id in state['created_ids']:
+            self.send('DELETE', f"{self.base_url}/dogs/{dog_id}", record=False, headers=self.headers, timeout=30)
+
+        trends = detect_trends(windows)
+        flagged = [name for name, trend in trends.items() if trend['flagged']]
+        print("\n" + "=" * 60)
+        for name, trend in trends.items():
+            marker = "📈 TREND" if trend['flagged'] else "ok"
+            print(f"{name:<18} tau {trend['tau']:>6.2f}  growth {trend['growth_pct']:>7.1f}%  {marker}")
+        if flagged:
+            print(f"⚠️  Sustained upward trend in: {', '.join(flagged)}")
+        else:
+            print("🎉 No sustained upward trend in latency or server resources.")
+
+        return {
+            'users': users,
+            'rate_rps': rate,
+            'duration_s': round(time.perf_counter() - started, 1),
+            'window_s': window,
+            'resource_source': f"/proc/{server_pid}" if server_pid else '/api/metrics',
+            'created_listings': len(state['created_ids']),
+            'windows': windows,
+            'trends': trends,
+            'flagged': flagged,
+            'connections': self.connection_stats()
+        }
+
+
+# Metrics compared against a baseline and whether a higher value is a regression
+COMPARED_METRICS = [
+    ('p50_ms', True),
+    ('p99_ms', True),
+    ('throughput_rps', False),
+    ('avg_response_bytes', True)
+]
+
+
+def endpoint_metrics(results):
+    """Return the per-endpoint metrics block of a results file (load test preferred)"""
+    if 'load_test' in results:
+        return results['load_test'].get('endpoints', {})
+    return results.get('latency_by_endpoint', {})
+
+
+def has_successful_samples(metrics):
+    """True when an endpoint block has at least one request that did not fail"""
+    return metrics.get('requests', 0) > metrics.get('errors', 0)
+
+
+def compare_results(baseline, current, threshold_pct=20.0):
+    """Diff two results files endpoint by endpoint and return (rows, regressions, missing).
+    missing lists baseline endpoints the current run did not exercise successfully; they count
+    as regressions, so a run cannot pass by covering less."""
+    baseline_endpoints = endpoint_metrics(baseline)
+    current_endpoints = endpoint_metrics(current)
+    rows = []
+    regressions = []
+    missing = sorted(endpoint for endpoint, metrics in baseline_endpoints.items()
+                     if has_successful_samples(metrics)
+                     and not has_successful_samples(current_endpoints.get(endpoint, {})))
+
+    for endpoint in sorted(set(baseline_endpoints) & set(current_endpoints) - set(missing)):
+        for metric, higher_is_worse in COMPARED_METRICS:
+            before = baseline_endpoints[endpoint].get(metric)
+            after = current_endpoints[endpoint].get(metric)
+            if before is None or after is None:
+                continue
+            if before:
+                change_pct = (after - before) / before * 100
+            else:
+                change_pct = 0.0 if not after else math.inf
+            worse_pct = change_pct if higher_is_worse else -change_pct
+            row = {
+                'endpoint': endpoint,
+                'metric': metric,
+                'baseline': before,
+                'current': after,
+                'change_pct': round(change_pct, 2),
+                'regressed': worse_pct > threshold_pct
+            }
+            rows.append(row)
+            if row['regressed']:
+                regressions.append(row)
+
+    return rows, regressions, missing
+
+
+def print_comparison(rows, regressions, missing, baseline_path, threshold_pct):
+    print("\n" + "=" * 60)
+    print(f"📈 Comparison against baseline {baseline_path} (threshold {threshold_pct:.0f}%)")
+    print(f"{'Endpoint':<30}{'metric':>20}{'baseline':>12}{'current':>12}{'change':>10}")
+    for row in rows:
+        flag = "  ❌" if row['regressed'] else ""
+        print(f"{row['endpoint']:<30}{row['metric']:>20}{row['baseline']:>12.1f}{row['current']:>12.1f}"
+              f"{row['change_pct']:>9.1f}%{flag}")
+    for endpoint in missing:
+        print(f"{endpoint:<30}{'no successful requests in the current run':>54}  ❌")
+    if missing:
+        print(f"⚠️  {len(missing)} baseline endpoint(s) missing from the current run: {', '.join(missing)}")
+    if regressions:
+        print(f"⚠️  {len(regressions)} metric(s) regressed past {threshold_pct:.0f}%")
+    elif rows and not missing:
+        print("🎉 No endpoint regressed past the threshold.")
+    elif not rows:
+        print("⚠️  No common endpoints to compare.")
+
+
+def wait_for(url, timeout, process):
+    """Poll url until it answers (any status) or the process dies / timeout expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=5)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def start_local_stack(supabase_port, app_port=None):
+    """Start the in-memory Supabase stand-in and, if app_port is given, the Next.js app pointed at it"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    processes = []
+    atexit.register(lambda: [p.terminate() for p in processes if p.poll() is None])
+
+    supabase_url = f"http://127.0.0.1:{supabase_port}"
+    standin = subprocess.Popen([sys.executable, os.path.join(root, 'local_supabase.py'), '--port', str(supabase_port)],
+                               cwd=root)
+    processes.append(standin)
+    wait_for(f"{supabase_url}/rest/v1/provinces", 30, standin)
+    print(f"🗄️  Local Supabase stand-in running at {supabase_url}")
+
+    if app_port is None:
+        print(f"   Start the app with NEXT_PUBLIC_SUPABASE_URL={supabase_url} to use it")
+        return None
+
+    # Point this process (direct PostgREST checks) and the app at the stand-in
+    os.environ.update(NEXT_PUBLIC_SUPABASE_URL=supabase_url,
+                      NEXT_PUBLIC_SUPABASE_ANON_KEY='local-anon-key',
+                      SUPABASE_SERVICE_ROLE_KEY='local-service-role-key')
+    env = dict(LOCAL_STACK_RATE_LIMITS, **os.environ)
+    app = subprocess.Popen(['npx', 'next', 'dev', '--hostname', '127.0.0.1', '--port', str(app_port)],
+                           cwd=root, env=env)
+    processes.append(app)
+    app_url = f"http://127.0.0.1:{app_port}/api"
+    # The first hit compiles the route in dev mode, so allow plenty of time
+    wait_for(f"{app_url}/health", 180, app)
+    print(f"🚀 Next.js app running at {app_url} against the stand-in")
+    return app_url
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="adoptaunpana.es backend API test suite")
+    parser.add_argument('--base-url', default=BASE_URL, help="API base URL")
+    parser.add_argument('--output', default=RESULTS_FILE, help="Where to write the results JSON")
+    parser.add_argument('--load', action='store_true', help="Run the concurrent load test instead of the functional suite")
+    parser.add_argument('--soak', action='store_true',
+                        help="Run the soak test: a steady mixed workload for --duration seconds, sampled per --window")
+    parser.add_argument('--users', type=int, default=10, help="Concurrent virtual users in load and soak mode")
+    parser.add_argument('--duration', type=float, default=30, help="Load or soak test duration in seconds")
+    parser.add_argument('--requests', type=int, default=None, dest='total_requests',
+                        help="Stop the load test after this many requests instead of after --duration")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for the load/soak test mix")
+    parser.add_argument('--rate', type=float, default=20.0, help="Target requests per second across all users in soak mode")
+    parser.add_argument('--window', type=float, default=60.0, help="Soak sampling window in seconds")
+    parser.add_argument('--server-pid', type=int, default=None,
+                        help="In soak mode, read RSS/open FDs of this local server process from /proc instead of /api/metrics")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Functional tests run concurrently on this many workers (1 runs them one at a time)")
+    parser.add_argument('--pool-size', type=int, default=10, help="Keep-alive connections kept per host")
+    parser.add_argument('--retries', type=int, default=3, help="Retries for idempotent requests on connection errors/5xx")
+    parser.add_argument('--backoff', type=float, default=0.3, help="Exponential backoff factor between retries")
+    parser.add_argument('--compare', metavar='BASELINE', default=None,
+                        help="Compare the results against a stored baseline results file")
+    parser.add_argument('--current', metavar='RESULTS', default=None,
+                        help="With --compare, diff this existing results file instead of running the suite")
+    parser.add_argument('--local', action='store_true',
+                        help="Start the in-memory Supabase stand-in (local_supabase.py) for a hermetic run")
+    parser.add_argument('--local-port', type=int, default=54321, help="Port for the local Supabase stand-in")
+    parser.add_argument('--start-app', action='store_true',
+                        help="With --local, also start the Next.js app pointed at the stand-in and test it")
+    parser.add_argument('--app-port', type=int, default=3100, help="Port for the app started by --start-app")
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help="Percent change in p50/p99/throughput/payload size that counts as a regression")
+    return parser.parse_args()
+
+
+def run_comparison(baseline_path, current_results, threshold_pct):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    rows, regressions, missing = compare_results(baseline, current_results, threshold_pct)
+    print_comparison(rows, regressions, missing, baseline_path, threshold_pct)
+    return 1 if regressions or missing else 0
+
+
 if __name__ == "__main__":
-    tester = AdoptaunpanaAPITester()
-    passed, failed, results = tester.run_all_tests()
-    
-    # Save detailed results to file
-    with open('/app/backend_test_results.json', 'w') as f:
-        json.dump({
+    args = parse_args()
+    load_env(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+    if args.compare and args.current:
+        with open(args.current) as f:
+            sys.exit(run_comparison(args.compare, json.load(f), args.threshold))
+
+    base_url = args.base_url
+    if args.local:
+        base_url = start_local_stack(args.local_port, args.app_port if args.start_app else None) or base_url
+
+    pool_size = max(args.pool_size, args.users if args.load or args.soak else args.workers)
+    tester = AdoptaunpanaAPITester(base_url, pool_size=pool_size, retries=args.retries, backoff=args.backoff)
+
+    if args.soak:
+        output = {
+            'soak_test': tester.run_soak_test(users=args.users, duration=args.duration, rate=args.rate,
+                                              window=args.window, server_pid=args.server_pid, seed=args.seed)
+        }
+    elif args.load:
+        output = {
+            'load_test': tester.run_load_test(users=args.users, duration=args.duration,
+                                              total_requests=args.total_requests, seed=args.seed)
+        }
+    else:
+        passed, failed, results = tester.run_all_tests(workers=max(args.workers, 1))
+        output = {
             'summary': {
                 'passed': passed,
                 'failed': failed,
                 'success_rate': passed/(passed+failed)*100 if (passed+failed) > 0 else 0
             },
-            'detailed_results': results
-        }, f, indent=2)
-    
-    print(f"\n📄 Detailed results saved to: /app/backend_test_results.json")
\ No newline at end of file
+            'detailed_results': results,
+            'schedule': tester.schedule_report,
+            'latency_by_endpoint': tester.latency_by_endpoint(),
+            'server_attribution': tester.server_attribution,
+            'http_timings': tester.http_timings,
+            'connections': tester.connection_stats()
+        }
+
+    # Save detailed results to file
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n📄 Detailed results saved to: {args.output}")
+
+    if args.compare:
+        sys.exit(run_comparison(args.compare, output, args.threshold))
\ No newline at end of file
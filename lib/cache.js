@@ -0,0 +1,145 @@
+import { createHash } from 'crypto'
+
+// Small in-process cache with a per-entry time-to-live
+export class TTLCache {
+  constructor(ttlMs) {
+    this.ttlMs = ttlMs
+    this.entries = new Map()
+  }
+
+  get(key) {
+    const entry = this.entries.get(key)
+    if (!entry) return undefined
+    if (entry.expiresAt <= Date.now()) {
+      this.entries.delete(key)
+      return undefined
+    }
+    return entry.value
+  }
+
+  set(key, value) {
+    this.entries.set(key, { value, expiresAt: Date.now() + this.ttlMs })
+    return value
+  }
+
+  clear() {
+    this.entries.clear()
+  }
+}
+
+// Strong ETag over the serialized response body
+export function computeETag(body) {
+  return `"${createHash('sha1').update(body).digest('base64url')}"`
+}
+
+// Strong ETag of one content-coding of a body: validators must differ between codings
+// (RFC 9110 8.8.3), so compressed variants get the coding appended
+export function encodedETag(etag, encoding) {
+  return encoding ? `${etag.slice(0, -1)}-${encoding}"` : etag
+}
+
+// True when an If-None-Match header lists the given ETag (or *)
+export function etagMatches(ifNoneMatch, etag) {
+  if (!ifNoneMatch) return false
+  return ifNoneMatch.split(',').some(tag => {
+    const candidate = tag.trim().replace(/^W\//, '')
+    return candidate === '*' || candidate === etag
+  })
+}
+
+// Least-recently-used cache bounded by entry count and total body bytes, with a TTL
+// as a backstop for writes made outside this process
+export class LRUCache {
+  constructor({ maxEntries, maxBytes, ttlMs }) {
+    this.maxEntries = maxEntries
+    this.maxBytes = maxBytes
+    this.ttlMs = ttlMs
+    this.entries = new Map()
+    this.bytes = 0
+    this.hits = 0
+    this.misses = 0
+    this.evictions = 0
+    this.invalidations = 0
+  }
+
+  get(key) {
+    const entry = this.entries.get(key)
+    if (!entry || entry.expiresAt <= Date.now()) {
+      if (entry) this.delete(key)
+      this.misses++
+      return undefined
+    }
+    // Re-insert to mark as most recently used
+    this.entries.delete(key)
+    this.entries.set(key, entry)
+    this.hits++
+    return entry
+  }
+
+  set(key, entry) {
+    this.delete(key)
+    entry.key = key
+    entry.size = Buffer.byteLength(entry.body) +
+      Object.values(entry.variants || {}).reduce((total, variant) => total + variant.length, 0)
+    entry.expiresAt = Date.now() + this.ttlMs
+    if (entry.size > this.maxBytes) return entry
+
+    this.entries.set(key, entry)
+    this.bytes += entry.size
+    this.evictOverflow()
+    return entry
+  }
+
+  // Account for bytes added to an entry after it was stored (a compressed variant).
+  // No-op for entries that are not, or no longer, in this cache.
+  grow(entry, bytes) {
+    if (this.entries.get(entry.key) !== entry) return
+    entry.size += bytes
+    this.bytes += bytes
+    this.evictOverflow()
+  }
+
+  evictOverflow() {
+    while (this.entries.size > this.maxEntries || this.bytes > this.maxBytes) {
+      const oldestKey = this.entries.keys().next().value
+      this.delete(oldestKey)
+      this.evictions++
+    }
+  }
+
+  delete(key) {
+    const entry = this.entries.get(key)
+    if (!entry) return false
+    this.entries.delete(key)
+    this.bytes -= entry.size
+    return true
+  }
+
+  // Drop every entry for which predicate(entry, key) is true
+  invalidateWhere(predicate) {
+    for (const [key, entry] of this.entries) {
+      if (predicate(entry, key)) {
+        this.delete(key)
+        this.invalidations++
+      }
+    }
+  }
+
+  clear() {
+    this.entries.clear()
+    this.bytes = 0
+  }
+
+  stats() {
+    return {
+      entries: this.entries.size,
+      bytes: this.bytes,
+      maxEntries: this.maxEntries,
+      maxBytes: this.maxBytes,
+      hits: this.hits,
+      misses: this.misses,
+      evictions: this.evictions,
+      invalidations: this.invalidations
+    }
+  }
+}
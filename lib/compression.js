@@ -0,0 +1,32 @@
+import { brotliCompressSync, gzipSync, constants } from 'zlib'
+
+// Bodies below this size are not worth the CPU or the extra header
+const MIN_COMPRESS_BYTES = 1024
+
+// Content-coding to send a body of byteLength bytes in: 'br', 'gzip', or null for identity
+export function negotiateEncoding(byteLength, acceptEncoding) {
+  if (byteLength < MIN_COMPRESS_BYTES || !acceptEncoding) return null
+
+  const accepted = acceptEncoding.split(',').map(value => value.trim().split(';')[0].toLowerCase())
+  if (accepted.includes('br')) return 'br'
+  if (accepted.includes('gzip')) return 'gzip'
+  return null
+}
+
+// Compress a buffer with the given content-coding (null returns it unchanged)
+export function compress(buffer, encoding) {
+  if (encoding === 'br') {
+    // Quality 4 keeps per-request CPU low while still beating gzip on JSON
+    return brotliCompressSync(buffer, { params: { [constants.BROTLI_PARAM_QUALITY]: 4 } })
+  }
+  if (encoding === 'gzip') return gzipSync(buffer, { level: 6 })
+  return buffer
+}
+
+// Pick br or gzip from Accept-Encoding and compress the serialized body.
+// Returns { body, encoding } with encoding null when sent uncompressed.
+export function compressBody(body, acceptEncoding) {
+  const buffer = Buffer.from(body)
+  const encoding = negotiateEncoding(buffer.length, acceptEncoding)
+  return { body: compress(buffer, encoding), encoding }
+}
@@ -1,3 +1,6 @@
+import { timedFetch } from './metrics.js'
+import { SPANISH_PROVINCES, SPANISH_CITIES } from './supabase.js'
+
 export async function createDatabaseTables() {
   // Since direct SQL execution through JavaScript client is not supported,
   // we need to create tables through the Supabase dashboard or REST API
@@ -17,6 +20,8 @@ export async function createDatabaseTables() {
       id TEXT PRIMARY KEY,
       name TEXT NOT NULL,
       region TEXT NOT NULL,
+      latitude DOUBLE PRECISION,
+      longitude DOUBLE PRECISION,
       "createdAt" TIMESTAMP WITH TIME ZONE DEFAULT NOW()
     );`,
     
@@ -25,6 +30,8 @@ export async function createDatabaseTables() {
       id TEXT PRIMARY KEY,
       name TEXT NOT NULL,
       province_id TEXT NOT NULL,
+      latitude DOUBLE PRECISION,
+      longitude DOUBLE PRECISION,
       "createdAt" TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
       FOREIGN KEY (province_id) REFERENCES provinces(id)
     );`,
@@ -79,9 +86,82 @@ export async function createDatabaseTables() {
       "isRead" BOOLEAN DEFAULT false,
       "createdAt" TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
       FOREIGN KEY (listing_id) REFERENCES dog_listings(id) ON DELETE CASCADE
+    );`,
+
+    // Create aggregate tables read by /api/stats
+    `CREATE TABLE IF NOT EXISTS province_stats (
+      province_id TEXT PRIMARY KEY,
+      "activeDogs" INTEGER NOT NULL DEFAULT 0,
+      "urgentDogs" INTEGER NOT NULL DEFAULT 0,
+      FOREIGN KEY (province_id) REFERENCES provinces(id)
+    );`,
+
+    `CREATE TABLE IF NOT EXISTS platform_stats (
+      id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+      "totalMessages" BIGINT NOT NULL DEFAULT 0
     );`
   ]
 
+  // Statement-level triggers keep the aggregate tables in step with every write,
+  // so a batch insert costs one aggregate update per province instead of one per row
+  const statsTriggerQueries = [
+    `CREATE OR REPLACE FUNCTION apply_dog_listing_stats() RETURNS TRIGGER AS $$
+    BEGIN
+      IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO province_stats AS s (province_id, "activeDogs", "urgentDogs")
+          SELECT province_id, -COUNT(*), -COUNT(*) FILTER (WHERE "isUrgent")
+          FROM old_rows WHERE status = 'active' GROUP BY province_id
+        ON CONFLICT (province_id) DO UPDATE SET
+          "activeDogs" = s."activeDogs" + EXCLUDED."activeDogs",
+          "urgentDogs" = s."urgentDogs" + EXCLUDED."urgentDogs";
+      END IF;
+      IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO province_stats AS s (province_id, "activeDogs", "urgentDogs")
+          SELECT province_id, COUNT(*), COUNT(*) FILTER (WHERE "isUrgent")
+          FROM new_rows WHERE status = 'active' GROUP BY province_id
+        ON CONFLICT (province_id) DO UPDATE SET
+          "activeDogs" = s."activeDogs" + EXCLUDED."activeDogs",
+          "urgentDogs" = s."urgentDogs" + EXCLUDED."urgentDogs";
+      END IF;
+      RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;`,
+
+    `CREATE OR REPLACE TRIGGER dog_listings_stats_insert AFTER INSERT ON dog_listings
+      REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_dog_listing_stats();`,
+    `CREATE OR REPLACE TRIGGER dog_listings_stats_update AFTER UPDATE ON dog_listings
+      REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_dog_listing_stats();`,
+    `CREATE OR REPLACE TRIGGER dog_listings_stats_delete AFTER DELETE ON dog_listings
+      REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_dog_listing_stats();`,
+
+    `CREATE OR REPLACE FUNCTION apply_message_stats() RETURNS TRIGGER AS $$
+    BEGIN
+      IF TG_OP = 'INSERT' THEN
+        UPDATE platform_stats SET "totalMessages" = "totalMessages" + (SELECT COUNT(*) FROM new_rows) WHERE id = 1;
+      ELSE
+        UPDATE platform_stats SET "totalMessages" = "totalMessages" - (SELECT COUNT(*) FROM old_rows) WHERE id = 1;
+      END IF;
+      RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;`,
+
+    `CREATE OR REPLACE TRIGGER messages_stats_insert AFTER INSERT ON messages
+      REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_message_stats();`,
+    `CREATE OR REPLACE TRIGGER messages_stats_delete AFTER DELETE ON messages
+      REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION apply_message_stats();`,
+
+    // Backfill the aggregates from a full recount (safe to re-run)
+    `INSERT INTO province_stats (province_id, "activeDogs", "urgentDogs")
+      SELECT p.id, COUNT(d.id), COUNT(d.id) FILTER (WHERE d."isUrgent")
+      FROM provinces p LEFT JOIN dog_listings d ON d.province_id = p.id AND d.status = 'active'
+      GROUP BY p.id
+    ON CONFLICT (province_id) DO UPDATE SET
+      "activeDogs" = EXCLUDED."activeDogs",
+      "urgentDogs" = EXCLUDED."urgentDogs";`,
+    `INSERT INTO platform_stats (id, "totalMessages") SELECT 1, COUNT(*) FROM messages
+    ON CONFLICT (id) DO UPDATE SET "totalMessages" = EXCLUDED."totalMessages";`
+  ]
+
   // RLS policies
   const policyQueries = [
     'ALTER TABLE provinces ENABLE ROW LEVEL SECURITY;',
@@ -89,6 +169,8 @@ export async function createDatabaseTables() {
     'ALTER TABLE users ENABLE ROW LEVEL SECURITY;',
     'ALTER TABLE dog_listings ENABLE ROW LEVEL SECURITY;',
     'ALTER TABLE messages ENABLE ROW LEVEL SECURITY;',
+    'ALTER TABLE province_stats ENABLE ROW LEVEL SECURITY;',
+    'ALTER TABLE platform_stats ENABLE ROW LEVEL SECURITY;',
 
     // Public policies for provinces and cities
     `CREATE POLICY IF NOT EXISTS "Allow public read provinces" ON provinces FOR SELECT USING (true);`,
@@ -107,6 +189,10 @@ export async function createDatabaseTables() {
     `CREATE POLICY IF NOT EXISTS "Allow public insert messages" ON messages FOR INSERT WITH CHECK (true);`,
     `CREATE POLICY IF NOT EXISTS "Allow public update messages" ON messages FOR UPDATE USING (true);`,
 
+    // Stats aggregates are read-only for clients; triggers maintain them
+    `CREATE POLICY IF NOT EXISTS "Allow public read province_stats" ON province_stats FOR SELECT USING (true);`,
+    `CREATE POLICY IF NOT EXISTS "Allow public read platform_stats" ON platform_stats FOR SELECT USING (true);`,
+
     // Public policies for users
     `CREATE POLICY IF NOT EXISTS "Allow public read users" ON users FOR SELECT USING (true);`,
     `CREATE POLICY IF NOT EXISTS "Allow public insert users" ON users FOR INSERT WITH CHECK (true);`,
@@ -114,6 +200,11 @@ export async function createDatabaseTables() {
   ]
 
   // Index creation queries
+  // Single-column indexes back the foreign keys and lookups outside the feed (stats
+  // fallback and exports filter on status alone, messages on listing_id). The listing feed
+  // (status = 'active', ordered by isUrgent, createdAt, id) is served by partial composite
+  // indexes: the leading column is the filter and the rest match the sort, so a page is
+  // an index range scan with no sort step.
   const indexQueries = [
     'CREATE INDEX IF NOT EXISTS idx_dog_listings_province ON dog_listings(province_id);',
     'CREATE INDEX IF NOT EXISTS idx_dog_listings_city ON dog_listings(city_id);',
@@ -124,17 +215,178 @@ export async function createDatabaseTables() {
     'CREATE INDEX IF NOT EXISTS idx_dog_listings_status ON dog_listings(status);',
     'CREATE INDEX IF NOT EXISTS idx_dog_listings_created ON dog_listings("createdAt" DESC);',
     'CREATE INDEX IF NOT EXISTS idx_messages_listing ON messages(listing_id);',
-    'CREATE INDEX IF NOT EXISTS idx_cities_province ON cities(province_id);'
+    'CREATE INDEX IF NOT EXISTS idx_cities_province ON cities(province_id);',
+    `CREATE INDEX IF NOT EXISTS idx_dog_listings_active_feed ON dog_listings
+      ("isUrgent" DESC, "createdAt" DESC, id DESC) WHERE status = 'active';`,
+    `CREATE INDEX IF NOT EXISTS idx_dog_listings_active_province ON dog_listings
+      (province_id, "isUrgent" DESC, "createdAt" DESC, id DESC) WHERE status = 'active';`,
+    `CREATE INDEX IF NOT EXISTS idx_dog_listings_active_city ON dog_listings
+      (city_id, "isUrgent" DESC, "createdAt" DESC, id DESC) WHERE status = 'active';`,
+    `CREATE INDEX IF NOT EXISTS idx_dog_listings_active_size ON dog_listings
+      (size, "isUrgent" DESC, "createdAt" DESC, id DESC) WHERE status = 'active';`,
+    `CREATE INDEX IF NOT EXISTS idx_dog_listings_active_gender ON dog_listings
+      (gender, "isUrgent" DESC, "createdAt" DESC, id DESC) WHERE status = 'active';`,
+    'CREATE INDEX IF NOT EXISTS idx_messages_listing_created ON messages(listing_id, "createdAt" DESC, id DESC);',
+    'CREATE INDEX IF NOT EXISTS idx_messages_created ON messages("createdAt" DESC, id DESC);',
+    'ANALYZE dog_listings;',
+    'ANALYZE messages;'
+  ]
+
+  // Query-plan check for the listing feed, used by the backend benchmark to catch
+  // sequential scans (page_size NULL explains the unpaginated query). Filter values are
+  // quoted with %L; only the service role may call it.
+  const planQueries = [
+    `CREATE OR REPLACE FUNCTION explain_listing_query(
+      filter_province TEXT DEFAULT NULL,
+      filter_city TEXT DEFAULT NULL,
+      filter_size TEXT DEFAULT NULL,
+      filter_gender TEXT DEFAULT NULL,
+      urgent_only BOOLEAN DEFAULT FALSE,
+      page_size INTEGER DEFAULT 21
+    ) RETURNS JSON AS $$
+    DECLARE
+      plan JSON;
+    BEGIN
+      EXECUTE format(
+        'EXPLAIN (FORMAT JSON) SELECT * FROM dog_listings WHERE status = %L%s%s%s%s%s
+         ORDER BY "isUrgent" DESC, "createdAt" DESC, id DESC LIMIT %s',
+        'active',
+        CASE WHEN filter_province IS NULL THEN '' ELSE format(' AND province_id = %L', filter_province) END,
+        CASE WHEN filter_city IS NULL THEN '' ELSE format(' AND city_id = %L', filter_city) END,
+        CASE WHEN filter_size IS NULL THEN '' ELSE format(' AND size = %L', filter_size) END,
+        CASE WHEN filter_gender IS NULL THEN '' ELSE format(' AND gender = %L', filter_gender) END,
+        CASE WHEN urgent_only THEN ' AND "isUrgent" = true' ELSE '' END,
+        coalesce(page_size::TEXT, 'ALL')
+      ) INTO plan;
+      RETURN plan;
+    END;
+    $$ LANGUAGE plpgsql;`,
+    'REVOKE EXECUTE ON FUNCTION explain_listing_query(TEXT, TEXT, TEXT, TEXT, BOOLEAN, INTEGER) FROM PUBLIC, anon, authenticated;'
+  ]
+
+  // Full-text search: Spanish stemming with accent folding, a weighted tsvector
+  // expression index over active listings and a ranked search function. An expression
+  // index (rather than a stored column) keeps the vector out of select('*') payloads.
+  const searchQueries = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent;',
+    `DO $$
+    BEGIN
+      IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+        ALTER TEXT SEARCH CONFIGURATION es_unaccent
+          ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+      END IF;
+    END
+    $$;`,
+    `CREATE OR REPLACE FUNCTION dog_listing_search_vector(dog_name TEXT, breed TEXT, description TEXT)
+    RETURNS tsvector AS $$
+      SELECT setweight(to_tsvector('es_unaccent'::regconfig, coalesce(dog_name, '')), 'A') ||
+             setweight(to_tsvector('es_unaccent'::regconfig, coalesce(breed, '')), 'B') ||
+             setweight(to_tsvector('es_unaccent'::regconfig, coalesce(description, '')), 'C')
+    $$ LANGUAGE sql IMMUTABLE;`,
+    `CREATE INDEX IF NOT EXISTS idx_dog_listings_search ON dog_listings
+      USING GIN (dog_listing_search_vector("dogName", breed, description)) WHERE status = 'active';`,
+    // Returns ids and ranks only; callers fetch the rows (with joins) by primary key.
+    // (after_rank, after_id) is the keyset cursor of the previous page.
+    `CREATE OR REPLACE FUNCTION search_dog_listings(
+      search_query TEXT,
+      filter_province TEXT DEFAULT NULL,
+      filter_size TEXT DEFAULT NULL,
+      filter_gender TEXT DEFAULT NULL,
+      page_size INTEGER DEFAULT 50,
+      after_rank REAL DEFAULT NULL,
+      after_id UUID DEFAULT NULL
+    ) RETURNS TABLE (id UUID, rank REAL) AS $$
+      SELECT d.id, ts_rank_cd(dog_listing_search_vector(d."dogName", d.breed, d.description), q) AS rank
+      FROM dog_listings d, websearch_to_tsquery('es_unaccent', search_query) q
+      WHERE d.status = 'active'
+        AND dog_listing_search_vector(d."dogName", d.breed, d.description) @@ q
+        AND (filter_province IS NULL OR d.province_id = filter_province)
+        AND (filter_size IS NULL OR d.size = filter_size)
+        AND (filter_gender IS NULL OR d.gender = filter_gender)
+        AND (after_rank IS NULL
+          OR (ts_rank_cd(dog_listing_search_vector(d."dogName", d.breed, d.description), q), d.id) < (after_rank, after_id))
+      ORDER BY rank DESC, d.id DESC
+      LIMIT page_size
+    $$ LANGUAGE sql STABLE;`
+  ]
+
+  // Proximity search: city coordinates (backfilled for databases created before they
+  // existed) with a GiST earthdistance index, and a function returning active listings
+  // within a radius of a city ordered by distance, then the usual feed order.
+  // (after_distance, after_urgent, after_created, after_id) is the keyset cursor.
+  const coordinateValues = rows => rows
+    .map(row => `('${row.id}', ${row.latitude}, ${row.longitude})`)
+    .join(', ')
+  const geoQueries = [
+    'ALTER TABLE provinces ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;',
+    'ALTER TABLE provinces ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;',
+    'ALTER TABLE cities ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;',
+    'ALTER TABLE cities ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;',
+    `UPDATE provinces SET latitude = v.latitude, longitude = v.longitude
+      FROM (VALUES ${coordinateValues(SPANISH_PROVINCES)}) AS v(id, latitude, longitude)
+      WHERE provinces.id = v.id AND provinces.latitude IS NULL;`,
+    `UPDATE cities SET latitude = v.latitude, longitude = v.longitude
+      FROM (VALUES ${coordinateValues(SPANISH_CITIES)}) AS v(id, latitude, longitude)
+      WHERE cities.id = v.id AND cities.latitude IS NULL;`,
+    'CREATE EXTENSION IF NOT EXISTS cube;',
+    'CREATE EXTENSION IF NOT EXISTS earthdistance;',
+    `CREATE INDEX IF NOT EXISTS idx_cities_location ON cities
+      USING GIST (ll_to_earth(latitude, longitude)) WHERE latitude IS NOT NULL;`,
+    `CREATE OR REPLACE FUNCTION nearby_dog_listings(
+      origin_city TEXT,
+      radius_km DOUBLE PRECISION,
+      search_query TEXT DEFAULT NULL,
+      filter_size TEXT DEFAULT NULL,
+      filter_gender TEXT DEFAULT NULL,
+      urgent_only BOOLEAN DEFAULT FALSE,
+      page_size INTEGER DEFAULT NULL,
+      after_distance DOUBLE PRECISION DEFAULT NULL,
+      after_urgent BOOLEAN DEFAULT NULL,
+      after_created TIMESTAMPTZ DEFAULT NULL,
+      after_id UUID DEFAULT NULL
+    ) RETURNS TABLE (id UUID, distance_km DOUBLE PRECISION, "isUrgent" BOOLEAN, "createdAt" TIMESTAMPTZ) AS $$
+    BEGIN
+      IF NOT EXISTS (SELECT 1 FROM cities WHERE cities.id = origin_city AND cities.latitude IS NOT NULL) THEN
+        RAISE EXCEPTION 'Unknown city: %', origin_city USING ERRCODE = 'P0002';
+      END IF;
+
+      RETURN QUERY
+      WITH origin AS (
+        SELECT ll_to_earth(c.latitude, c.longitude) AS point FROM cities c WHERE c.id = origin_city
+      ), near_cities AS (
+        SELECT c.id AS city_id, earth_distance(o.point, ll_to_earth(c.latitude, c.longitude)) / 1000 AS distance
+        FROM cities c, origin o
+        WHERE c.latitude IS NOT NULL
+          AND earth_box(o.point, radius_km * 1000) @> ll_to_earth(c.latitude, c.longitude)
+          AND earth_distance(o.point, ll_to_earth(c.latitude, c.longitude)) <= radius_km * 1000
+      )
+      SELECT d.id, n.distance, d."isUrgent", d."createdAt"
+      FROM near_cities n
+      JOIN dog_listings d ON d.city_id = n.city_id
+      WHERE d.status = 'active'
+        AND (search_query IS NULL
+          OR dog_listing_search_vector(d."dogName", d.breed, d.description) @@ websearch_to_tsquery('es_unaccent', search_query))
+        AND (filter_size IS NULL OR d.size = filter_size)
+        AND (filter_gender IS NULL OR d.gender = filter_gender)
+        AND (NOT urgent_only OR d."isUrgent")
+        AND (after_distance IS NULL
+          OR n.distance > after_distance
+          OR (n.distance = after_distance AND (d."isUrgent", d."createdAt", d.id) < (after_urgent, after_created, after_id)))
+      ORDER BY n.distance, d."isUrgent" DESC, d."createdAt" DESC, d.id DESC
+      LIMIT page_size;
+    END;
+    $$ LANGUAGE plpgsql STABLE;`
   ]
 
   try {
     // Execute queries using REST API approach
-    const allQueries = [...tableCreationQueries, ...policyQueries, ...indexQueries]
+    const allQueries = [...tableCreationQueries, ...policyQueries, ...indexQueries, ...statsTriggerQueries, ...searchQueries, ...planQueries, ...geoQueries]
     let successCount = 0
 
     for (const query of allQueries) {
       try {
-        const response = await fetch(`${supabaseUrl}/rest/v1/rpc/execute_sql`, {
+        const response = await timedFetch(`${supabaseUrl}/rest/v1/rpc/execute_sql`, {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
@@ -0,0 +1,71 @@
+import { supabase } from './supabase.js'
+import { applyCursor } from './pagination.js'
+
+// Streaming NDJSON export: rows are fetched in primary-key order one chunk at a time
+// and written as they arrive, so server memory stays bounded by the chunk size.
+
+export const DEFAULT_EXPORT_CHUNK_SIZE = 500
+export const MAX_EXPORT_CHUNK_SIZE = 1000
+const EXPORT_KEYS = ['id']
+
+export function getExportChunkSize(searchParams) {
+  const chunk = parseInt(searchParams.get('chunk') ?? DEFAULT_EXPORT_CHUNK_SIZE)
+  return Number.isNaN(chunk) ? DEFAULT_EXPORT_CHUNK_SIZE : Math.min(Math.max(chunk, 1), MAX_EXPORT_CHUNK_SIZE)
+}
+
+// Fetch the chunk after the given id (descending id order, keyset on the primary key)
+async function fetchChunk(table, select, filters, chunkSize, afterId) {
+  let query = supabase
+    .from(table)
+    .select(select)
+    .order('id', { ascending: false })
+    .limit(chunkSize)
+
+  for (const [column, value] of Object.entries(filters)) {
+    query = query.eq(column, value)
+  }
+  if (afterId) {
+    query = applyCursor(query, { id: afterId }, EXPORT_KEYS)
+  }
+  return query
+}
+
+// Returns { stream } or { error }. The first chunk is fetched before streaming starts so
+// a failing query still gets a proper error response; a later failure aborts the stream.
+export async function exportRows(table, { select, filters = {}, chunkSize = DEFAULT_EXPORT_CHUNK_SIZE }) {
+  const first = await fetchChunk(table, select, filters, chunkSize, null)
+  if (first.error) return { error: first.error }
+
+  const encoder = new TextEncoder()
+  let rows = first.data || []
+
+  const stream = new ReadableStream({
+    // Pulled only when the consumer is ready for more, which gives us backpressure
+    async pull(controller) {
+      if (rows.length === 0) {
+        controller.close()
+        return
+      }
+
+      controller.enqueue(encoder.encode(rows.map(row => JSON.stringify(row)).join('\n') + '\n'))
+
+      if (rows.length < chunkSize) {
+        rows = []
+        return
+      }
+
+      const { data, error } = await fetchChunk(table, select, filters, chunkSize, rows[rows.length - 1].id)
+      if (error) {
+        console.error(`Error exporting ${table}:`, error)
+        controller.error(new Error(`Export of ${table} failed`))
+        return
+      }
+      rows = data || []
+    },
+    cancel() {
+      rows = []
+    }
+  })
+
+  return { stream }
+}
@@ -0,0 +1,68 @@
+// Sparse field selection (?fields=a,b,c) and named views (?view=card) for list endpoints
+
+const DOG_LISTING_COLUMNS = [
+  'id', 'title', 'description', 'dogName', 'age', 'size', 'gender', 'breed', 'isUrgent',
+  'isVaccinated', 'isNeutered', 'contactEmail', 'contactPhone', 'contactName', 'province_id',
+  'city_id', 'imageUrls', 'listingType', 'status', 'createdAt', 'updatedAt'
+]
+const MESSAGE_COLUMNS = [
+  'id', 'listing_id', 'senderName', 'senderEmail', 'senderPhone', 'message', 'isRead', 'createdAt'
+]
+
+export const DOG_LISTING_SELECTION = {
+  columns: DOG_LISTING_COLUMNS,
+  // Virtual fields that map to joins or JSON paths
+  virtual: {
+    provinces: 'provinces:province_id(name)',
+    cities: 'cities:city_id(name)',
+    thumbnail: 'thumbnail:imageUrls->>0'
+  },
+  defaultSelect: `
+    *,
+    provinces:province_id(name),
+    cities:city_id(name)
+  `,
+  views: {
+    // Everything a listing card renders: no description, contact details or full image list
+    card: ['id', 'dogName', 'age', 'size', 'gender', 'isUrgent', 'createdAt', 'thumbnail', 'provinces', 'cities']
+  }
+}
+
+export const MESSAGE_SELECTION = {
+  columns: MESSAGE_COLUMNS,
+  virtual: {
+    dog_listings: 'dog_listings:listing_id(dogName, contactEmail)'
+  },
+  defaultSelect: `
+    *,
+    dog_listings:listing_id(dogName, contactEmail)
+  `,
+  views: {
+    card: ['id', 'listing_id', 'senderName', 'isRead', 'createdAt']
+  }
+}
+
+// Build the PostgREST select string for the request. requiredColumns (e.g. pagination
+// sort keys) are always included. Returns { select } or { error }.
+export function getSelect(searchParams, selection, requiredColumns = []) {
+  const view = searchParams.get('view')
+  const fieldsParam = searchParams.get('fields')
+
+  let fields
+  if (view) {
+    fields = selection.views[view]
+    if (!fields) return { error: `Unknown view: ${view}` }
+  } else if (fieldsParam) {
+    fields = fieldsParam.split(',').map(field => field.trim()).filter(Boolean)
+  } else {
+    return { select: selection.defaultSelect }
+  }
+
+  const unknown = fields.filter(field => !selection.columns.includes(field) && !selection.virtual[field])
+  if (unknown.length > 0) {
+    return { error: `Unknown field(s): ${unknown.join(', ')}` }
+  }
+
+  const selected = [...new Set([...fields, ...requiredColumns])]
+  return { select: selected.map(field => selection.virtual[field] || field).join(',') }
+}
@@ -0,0 +1,77 @@
+import { supabase } from './supabase.js'
+import { decodeCursor, encodeCursor } from './pagination.js'
+import { DOG_LISTING_SELECTION } from './fields.js'
+
+// Proximity search around a city, through the nearby_dog_listings function created by
+// /api/setup: one query over the cities GiST index replaces a request per province.
+
+export const DEFAULT_RADIUS_KM = 25
+export const MAX_RADIUS_KM = 500
+const NEARBY_CURSOR_KEYS = ['distance_km', 'isUrgent', 'createdAt', 'id']
+const ID_CHUNK_SIZE = 200
+
+// Read near/radius_km from the query string. Returns null when the client did not ask
+// for proximity search, or { error } when radius_km is not a positive number.
+export function getNearParams(searchParams) {
+  const near = searchParams.get('near')
+  if (!near) return null
+
+  const radiusParam = searchParams.get('radius_km')
+  const radiusKm = radiusParam === null || radiusParam === '' ? DEFAULT_RADIUS_KM : Number(radiusParam)
+  if (!Number.isFinite(radiusKm) || radiusKm <= 0) {
+    return { error: 'radius_km must be a positive number' }
+  }
+  return { near, radiusKm: Math.min(radiusKm, MAX_RADIUS_KM) }
+}
+
+// Active listings within radiusKm of the city `near`, nearest first (then the feed order).
+// Rows get a distance_km field. limit null returns every match.
+// Returns { data, next_cursor }, { invalidCursor: true }, { unknownCity: true } or { error }.
+export async function nearbyDogListings({ near, radiusKm, query, size, gender, urgent, limit, cursor, select = DOG_LISTING_SELECTION.defaultSelect }) {
+  let after = null
+  if (cursor) {
+    after = decodeCursor(cursor, NEARBY_CURSOR_KEYS)
+    if (!after) return { invalidCursor: true }
+  }
+
+  const { data: matches, error } = await supabase.rpc('nearby_dog_listings', {
+    origin_city: near,
+    radius_km: radiusKm,
+    search_query: query || null,
+    filter_size: size || null,
+    filter_gender: gender || null,
+    urgent_only: Boolean(urgent),
+    page_size: limit === null ? null : limit + 1,
+    after_distance: after?.distance_km ?? null,
+    after_urgent: after?.isUrgent ?? null,
+    after_created: after?.createdAt ?? null,
+    after_id: after?.id ?? null
+  })
+
+  if (error) {
+    if (error.code === 'P0002') return { unknownCity: true }
+    return { error }
+  }
+
+  const page = limit === null ? matches : matches.slice(0, limit)
+  // The cursor keeps the exact distance so ties compare equal in the database
+  const next_cursor = limit !== null && matches.length > limit ? encodeCursor(page[page.length - 1], NEARBY_CURSOR_KEYS) : null
+  if (page.length === 0) return { data: [], next_cursor }
+
+  // Fetch the matched rows by primary key, then restore distance order. Unpaginated
+  // results can be large, so the ids are split to keep request URLs short.
+  const idChunks = []
+  for (let i = 0; i < page.length; i += ID_CHUNK_SIZE) {
+    idChunks.push(page.slice(i, i + ID_CHUNK_SIZE).map(match => match.id))
+  }
+  const results = await Promise.all(idChunks.map(ids =>
+    supabase.from('dog_listings').select(select).in('id', ids)))
+  const failed = results.find(result => result.error)
+  if (failed) return { error: failed.error }
+
+  const rowsById = new Map(results.flatMap(result => result.data).map(row => [row.id, row]))
+  const data = page
+    .filter(match => rowsById.has(match.id))
+    .map(match => ({ ...rowsById.get(match.id), distance_km: Math.round(match.distance_km * 10) / 10 }))
+  return { data, next_cursor }
+}
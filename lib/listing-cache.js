@@ -0,0 +1,90 @@
+import { LRUCache, computeETag } from './cache.js'
+
+// Response cache for dog listing reads (GET /dogs and GET /dogs/{id}).
+// Entries remember which listing ids they contain and which filters produced them,
+// so a write only drops the responses it can actually change.
+
+const MAX_ENTRIES = parseInt(process.env.RESPONSE_CACHE_MAX_ENTRIES) || 500
+const MAX_BYTES = (parseInt(process.env.RESPONSE_CACHE_MAX_MB) || 16) * 1024 * 1024
+const TTL_SECONDS = parseInt(process.env.RESPONSE_CACHE_TTL_SECONDS) || 60
+
+// Query params that filter /dogs, mapped to the listing column they compare against
+const LISTING_FILTERS = {
+  province: 'province_id',
+  city: 'city_id',
+  size: 'size',
+  gender: 'gender'
+}
+
+export const listingCache = new LRUCache({
+  maxEntries: MAX_ENTRIES,
+  maxBytes: MAX_BYTES,
+  ttlMs: TTL_SECONDS * 1000
+})
+
+// Bumped on every listing write. A read that started before a write must not store its
+// (possibly stale) result, so callers capture this before querying.
+let writeGeneration = 0
+
+export function listingGeneration() {
+  return writeGeneration
+}
+
+// Route plus query params sorted by name, so ?size=x&gender=y and ?gender=y&size=x share an entry
+export function listingCacheKey(route, searchParams) {
+  const params = [...searchParams.entries()]
+    .filter(([, value]) => value !== '')
+    .sort(([a], [b]) => (a < b ? -1 : a > b ? 1 : 0))
+  return params.length > 0 ? `${route}?${new URLSearchParams(params)}` : route
+}
+
+// Filters a /dogs request applies, or null for a single listing read.
+// A proximity (?near=) request ignores province and city, and is not narrowed by
+// distance here, so any active listing write may change it.
+export function listingFilters(searchParams) {
+  const filters = {}
+  const near = Boolean(searchParams.get('near'))
+  for (const param of Object.keys(LISTING_FILTERS)) {
+    if (near && (param === 'province' || param === 'city')) continue
+    const value = searchParams.get(param)
+    if (value) filters[param] = value
+  }
+  if (searchParams.get('urgent') === 'true') filters.urgent = true
+  return filters
+}
+
+// Serialize a response and store it unless a write happened since generation was read.
+// rows are the listings it contains (they must include id).
+export function cacheListingResponse(key, generation, payload, rows, filters = null) {
+  const body = JSON.stringify(payload)
+  const entry = {
+    body,
+    etag: computeETag(body),
+    ids: new Set(rows.map(row => row.id)),
+    filters
+  }
+  return generation === writeGeneration ? listingCache.set(key, entry) : entry
+}
+
+// True when a listing row would be returned by a /dogs request with these filters
+function matchesFilters(row, filters) {
+  if (row.status !== 'active') return false
+  if (filters.urgent && row.isUrgent !== true) return false
+  return Object.entries(LISTING_FILTERS).every(([param, column]) =>
+    filters[param] === undefined || row[column] === filters[param])
+}
+
+// Drop cached responses affected by writes to the given listings. Pass the row as it is
+// after the write (or just { id } for a delete): responses already containing the listing
+// are stale, and list responses whose filters now match it are missing it.
+export function invalidateListings(rows) {
+  if (rows.length === 0) return
+  writeGeneration++
+  const ids = new Set(rows.map(row => row.id))
+  listingCache.invalidateWhere(entry => {
+    for (const id of entry.ids) {
+      if (ids.has(id)) return true
+    }
+    return entry.filters !== null && rows.some(row => matchesFilters(row, entry.filters))
+  })
+}
@@ -0,0 +1,210 @@
+import { AsyncLocalStorage } from 'async_hooks'
+import { readdirSync } from 'fs'
+import { performance } from 'perf_hooks'
+
+// Per-route request metrics, exposed in Prometheus text format on /api/metrics and as a
+// Server-Timing header on every response. The request being handled is tracked with
+// AsyncLocalStorage so Supabase calls and stage timings are attributed without
+// threading a context object through every handler.
+
+// Histogram bucket upper bounds, in seconds
+const DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+
+const UUID_SEGMENT = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i
+
+const requestContext = new AsyncLocalStorage()
+const routeMetrics = new Map()
+const startedAt = Date.now()
+
+class Histogram {
+  constructor() {
+    this.counts = DURATION_BUCKETS.map(() => 0)
+    this.sum = 0
+    this.count = 0
+  }
+
+  observe(seconds) {
+    DURATION_BUCKETS.forEach((bound, i) => {
+      if (seconds <= bound) this.counts[i]++
+    })
+    this.sum += seconds
+    this.count++
+  }
+}
+
+function metricsFor(method, route) {
+  const key = `${method} ${route}`
+  let metrics = routeMetrics.get(key)
+  if (!metrics) {
+    metrics = {
+      method,
+      route,
+      statuses: new Map(),
+      errors: 0,
+      duration: new Histogram(),
+      supabaseCalls: 0,
+      supabaseErrors: 0,
+      supabaseDuration: new Histogram(),
+      stageSeconds: new Map()
+    }
+    routeMetrics.set(key, metrics)
+  }
+  return metrics
+}
+
+// Label for a request path: ids collapsed to {id} so label cardinality stays bounded
+export function routeLabel(path) {
+  const segments = path.map((segment, i) => {
+    const isId = UUID_SEGMENT.test(segment) ||
+      (i === 1 && ['dogs', 'messages'].includes(path[0]) && segment !== 'batch')
+    return isId ? '{id}' : segment
+  })
+  return `/${segments.join('/')}`
+}
+
+// Called by the fallback 404 handler so unknown paths share one "unmatched" label
+export function markUnmatched() {
+  const context = requestContext.getStore()
+  if (context) context.unmatched = true
+}
+
+// Add the duration of a named stage (init, encode, ...) to the request being handled
+function recordStage(stage, ms) {
+  const context = requestContext.getStore()
+  if (context) context.stages[stage] = (context.stages[stage] || 0) + ms
+}
+
+// Time fn (sync or async) as a stage of the current request
+export function measure(stage, fn) {
+  const started = performance.now()
+  const result = fn()
+  if (result && typeof result.then === 'function') {
+    return result.finally(() => recordStage(stage, performance.now() - started))
+  }
+  recordStage(stage, performance.now() - started)
+  return result
+}
+
+function recordSupabaseCall(metrics, ms, failed) {
+  metrics.supabaseCalls++
+  if (failed) metrics.supabaseErrors++
+  metrics.supabaseDuration.observe(ms / 1000)
+}
+
+// fetch wrapper for the Supabase clients: counts and times each PostgREST call.
+// Calls are buffered on the request until its route label is final; calls made after
+// the response (streamed exports) or outside any request are recorded directly.
+export async function timedFetch(input, init) {
+  const context = requestContext.getStore()
+  const started = performance.now()
+  let failed = true
+  try {
+    const response = await fetch(input, init)
+    failed = !response.ok
+    return response
+  } finally {
+    const ms = performance.now() - started
+    if (context && !context.label) {
+      context.supabaseCalls.push({ ms, failed })
+      context.stages.db = (context.stages.db || 0) + ms
+    } else {
+      recordSupabaseCall(context ? metricsFor(context.method, context.label) : metricsFor('-', 'background'), ms, failed)
+    }
+  }
+}
+
+function serverTiming(context, totalMs) {
+  const entries = Object.entries(context.stages).map(([stage, ms]) =>
+    stage === 'db'
+      ? `db;dur=${ms.toFixed(1)};desc="${context.supabaseCalls.length} Supabase call(s)"`
+      : `${stage};dur=${ms.toFixed(1)}`)
+  return [...entries, `total;dur=${totalMs.toFixed(1)}`].join(', ')
+}
+
+// Wrap a route handler so every request is counted, timed and given a Server-Timing header
+export function instrument(handler) {
+  return async (request, context) => {
+    const path = context?.params?.path || []
+    const store = { method: request.method, route: routeLabel(path), stages: {}, supabaseCalls: [], unmatched: false, label: null }
+    const started = performance.now()
+    let response
+    try {
+      response = await requestContext.run(store, () => handler(request, context))
+      return response
+    } finally {
+      const totalMs = performance.now() - started
+      const status = response?.status ?? 500
+      store.label = store.unmatched ? 'unmatched' : store.route
+      const metrics = metricsFor(store.method, store.label)
+      store.supabaseCalls.forEach(({ ms, failed }) => recordSupabaseCall(metrics, ms, failed))
+      metrics.statuses.set(status, (metrics.statuses.get(status) || 0) + 1)
+      if (status >= 500) metrics.errors++
+      metrics.duration.observe(totalMs / 1000)
+      for (const [stage, ms] of Object.entries(store.stages)) {
+        metrics.stageSeconds.set(stage, (metrics.stageSeconds.get(stage) || 0) + ms / 1000)
+      }
+      response?.headers.set('Server-Timing', serverTiming(store, totalMs))
+    }
+  }
+}
+
+// Open file descriptors of this process; null where /proc is not available
+function openFileDescriptors() {
+  try {
+    return readdirSync('/proc/self/fd').length
+  } catch (error) {
+    return null
+  }
+}
+
+function labels(values) {
+  return Object.entries(values).map(([name, value]) => `${name}="${String(value).replace(/["\\]/g, '\\$&')}"`).join(',')
+}
+
+function histogramLines(name, base, histogram) {
+  const lines = DURATION_BUCKETS.map((bound, i) => `${name}_bucket{${labels({ ...base, le: bound })}} ${histogram.counts[i]}`)
+  lines.push(`${name}_bucket{${labels({ ...base, le: '+Inf' })}} ${histogram.count}`)
+  lines.push(`${name}_sum{${labels(base)}} ${histogram.sum.toFixed(6)}`)
+  lines.push(`${name}_count{${labels(base)}} ${histogram.count}`)
+  return lines
+}
+
+// Prometheus text exposition format (version 0.0.4)
+export function renderMetrics() {
+  const all = [...routeMetrics.values()]
+  const lines = []
+  const family = (name, type, help, body) => {
+    lines.push(`# HELP ${name} ${help}`, `# TYPE ${name} ${type}`, ...body)
+  }
+
+  family('api_requests_total', 'counter', 'Requests handled, by route, method and status',
+    all.flatMap(m => [...m.statuses].map(([status, count]) =>
+      `api_requests_total{${labels({ route: m.route, method: m.method, status })}} ${count}`)))
+  family('api_request_errors_total', 'counter', 'Requests that ended in a 5xx response',
+    all.map(m => `api_request_errors_total{${labels({ route: m.route, method: m.method })}} ${m.errors}`))
+  family('api_request_duration_seconds', 'histogram', 'Time from request to response',
+    all.flatMap(m => histogramLines('api_request_duration_seconds', { route: m.route, method: m.method }, m.duration)))
+  family('api_stage_duration_seconds_total', 'counter', 'Time spent in each request stage (init, db, encode)',
+    all.flatMap(m => [...m.stageSeconds].map(([stage, seconds]) =>
+      `api_stage_duration_seconds_total{${labels({ route: m.route, method: m.method, stage })}} ${seconds.toFixed(6)}`)))
+  family('api_supabase_calls_total', 'counter', 'Supabase (PostgREST) calls made while handling the route',
+    all.map(m => `api_supabase_calls_total{${labels({ route: m.route, method: m.method })}} ${m.supabaseCalls}`))
+  family('api_supabase_errors_total', 'counter', 'Supabase calls that failed or returned a non-2xx status',
+    all.map(m => `api_supabase_errors_total{${labels({ route: m.route, method: m.method })}} ${m.supabaseErrors}`))
+  family('api_supabase_call_duration_seconds', 'histogram', 'Duration of individual Supabase calls',
+    all.flatMap(m => histogramLines('api_supabase_call_duration_seconds', { route: m.route, method: m.method }, m.supabaseDuration)))
+  family('process_start_time_seconds', 'gauge', 'Start time of the process since the Unix epoch',
+    [`process_start_time_seconds ${Math.floor(startedAt / 1000)}`])
+
+  // Resource gauges, sampled by the soak test to spot leaks
+  const memory = process.memoryUsage()
+  family('process_resident_memory_bytes', 'gauge', 'Resident set size of the server process',
+    [`process_resident_memory_bytes ${memory.rss}`])
+  family('nodejs_heap_used_bytes', 'gauge', 'V8 heap in use', [`nodejs_heap_used_bytes ${memory.heapUsed}`])
+  const openFds = openFileDescriptors()
+  if (openFds !== null) {
+    family('process_open_fds', 'gauge', 'Open file descriptors of the server process', [`process_open_fds ${openFds}`])
+  }
+
+  return lines.join('\n') + '\n'
+}
@@ -0,0 +1,56 @@
+// Keyset (cursor) pagination helpers for list endpoints
+
+export const DEFAULT_PAGE_SIZE = 20
+export const MAX_PAGE_SIZE = 100
+
+// Cursor is the sort key of the last row on the page, base64url encoded
+export function encodeCursor(row, keys) {
+  const values = keys.map(key => row[key])
+  return Buffer.from(JSON.stringify(values)).toString('base64url')
+}
+
+export function decodeCursor(cursor, keys) {
+  try {
+    const values = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'))
+    if (!Array.isArray(values) || values.length !== keys.length) return null
+    return Object.fromEntries(keys.map((key, i) => [key, values[i]]))
+  } catch (error) {
+    return null
+  }
+}
+
+// Read limit/cursor from the query string. Returns null when the client did not ask for pagination.
+export function getPageParams(searchParams) {
+  const limitParam = searchParams.get('limit')
+  const cursor = searchParams.get('cursor')
+  if (limitParam === null && cursor === null) return null
+
+  const limit = parseInt(limitParam ?? DEFAULT_PAGE_SIZE)
+  return {
+    limit: Number.isNaN(limit) ? DEFAULT_PAGE_SIZE : Math.min(Math.max(limit, 1), MAX_PAGE_SIZE),
+    cursor
+  }
+}
+
+// Quote a value for a PostgREST logic tree (or/and filters)
+function quote(value) {
+  return `"${String(value).replace(/"/g, '\\"')}"`
+}
+
+// Restrict a query to rows strictly after the cursor for a descending sort on `keys`.
+// Builds: k1 < v1 OR (k1 = v1 AND k2 < v2) OR ...
+export function applyCursor(query, cursorValues, keys) {
+  const branches = keys.map((key, i) => {
+    const equal = keys.slice(0, i).map(prev => `${prev}.eq.${quote(cursorValues[prev])}`)
+    const after = `${key}.lt.${quote(cursorValues[key])}`
+    return equal.length ? `and(${[...equal, after].join(',')})` : after
+  })
+  return query.or(branches.join(','))
+}
+
+// Split a page fetched with limit + 1 rows into { data, next_cursor }
+export function buildPage(rows, limit, keys) {
+  const data = rows.slice(0, limit)
+  const next_cursor = rows.length > limit ? encodeCursor(data[data.length - 1], keys) : null
+  return { data, next_cursor }
+}
@@ -0,0 +1,147 @@
+// Token-bucket rate limiting for the write endpoints, kept in process memory.
+// Each limiter holds one bucket per key (client IP, listing id) and forgets the least
+// recently used bucket once it tracks maxKeys of them.
+
+const MAX_KEYS = parseInt(process.env.RATE_LIMIT_MAX_KEYS) || 10000
+// Reverse proxies in front of the app that append to X-Forwarded-For. Clients can send any
+// X-Forwarded-For / X-Real-IP they like, so those headers are ignored unless this is set.
+const TRUSTED_PROXY_HOPS = parseInt(process.env.TRUSTED_PROXY_HOPS) || 0
+
+// Write requests seen with and without a trustworthy client address
+const clientAddressCounts = { identified: 0, unidentified: 0 }
+
+function envInt(name, fallback) {
+  const value = parseInt(process.env[name])
+  return Number.isNaN(value) ? fallback : value
+}
+
+export class TokenBucketLimiter {
+  // capacity: burst size; refillPerMinute: sustained rate (0 disables the limiter);
+  // unit: what one token stands for, used in error messages
+  constructor({ capacity, refillPerMinute, unit, maxKeys = MAX_KEYS }) {
+    this.capacity = capacity
+    this.unit = unit
+    this.refillPerSecond = refillPerMinute / 60
+    this.maxKeys = maxKeys
+    this.buckets = new Map()
+    this.allowed = 0
+    this.limited = 0
+  }
+
+  get enabled() {
+    return this.capacity > 0 && this.refillPerSecond > 0
+  }
+
+  // Current bucket for key, refilled up to now and marked most recently used
+  bucket(key, now) {
+    let bucket = this.buckets.get(key)
+    if (bucket) {
+      this.buckets.delete(key)
+      bucket.tokens = Math.min(this.capacity, bucket.tokens + (now - bucket.updatedAt) / 1000 * this.refillPerSecond)
+      bucket.updatedAt = now
+    } else {
+      bucket = { tokens: this.capacity, updatedAt: now }
+      if (this.buckets.size >= this.maxKeys) {
+        this.buckets.delete(this.buckets.keys().next().value)
+      }
+    }
+    this.buckets.set(key, bucket)
+    return bucket
+  }
+
+  // Seconds until the bucket holds cost tokens (0 when it already does)
+  waitSeconds(bucket, cost) {
+    return bucket.tokens >= cost ? 0 : Math.ceil((cost - bucket.tokens) / this.refillPerSecond)
+  }
+
+  stats() {
+    return {
+      capacity: this.capacity,
+      refillPerMinute: Math.round(this.refillPerSecond * 60),
+      keys: this.buckets.size,
+      maxKeys: this.maxKeys,
+      allowed: this.allowed,
+      limited: this.limited
+    }
+  }
+}
+
+export const rateLimiters = {
+  dogsPerIp: new TokenBucketLimiter({
+    capacity: envInt('RATE_LIMIT_DOGS_BURST', 60),
+    refillPerMinute: envInt('RATE_LIMIT_DOGS_PER_MINUTE', 60),
+    unit: 'listings per client'
+  }),
+  messagesPerIp: new TokenBucketLimiter({
+    capacity: envInt('RATE_LIMIT_MESSAGES_BURST', 60),
+    refillPerMinute: envInt('RATE_LIMIT_MESSAGES_PER_MINUTE', 60),
+    unit: 'messages per client'
+  }),
+  messagesPerListing: new TokenBucketLimiter({
+    capacity: envInt('RATE_LIMIT_LISTING_MESSAGES_BURST', 30),
+    refillPerMinute: envInt('RATE_LIMIT_LISTING_MESSAGES_PER_MINUTE', 30),
+    unit: 'messages per listing'
+  })
+}
+
+// The first [limiter, key, cost] check whose cost is more than its bucket can ever hold,
+// or null. Such a request can never be admitted, so callers reject it outright.
+export function oversizedCheck(checks) {
+  return checks.find(([limiter, , cost = 1]) => limiter.enabled && cost > limiter.capacity) || null
+}
+
+// Take tokens for every [limiter, key, cost] check, or for none of them.
+// Returns 0 when allowed, otherwise the Retry-After in seconds. Each check is charged its
+// full cost; reject oversized requests with oversizedCheck first.
+export function takeTokens(checks) {
+  const now = Date.now()
+  const active = checks
+    .filter(([limiter]) => limiter.enabled)
+    .map(([limiter, key, cost = 1]) => ({ limiter, bucket: limiter.bucket(key, now), cost }))
+
+  const retryAfter = Math.max(0, ...active.map(({ limiter, bucket, cost }) => limiter.waitSeconds(bucket, cost)))
+  for (const { limiter, bucket, cost } of active) {
+    if (retryAfter > 0) {
+      limiter.limited++
+    } else {
+      bucket.tokens -= cost
+      limiter.allowed++
+    }
+  }
+  return retryAfter
+}
+
+function trustedAddress(request) {
+  if (request.ip) return request.ip
+  if (TRUSTED_PROXY_HOPS > 0) {
+    const forwarded = (request.headers.get('x-forwarded-for') || '').split(',').map(entry => entry.trim()).filter(Boolean)
+    if (forwarded.length > 0) return forwarded[Math.max(0, forwarded.length - TRUSTED_PROXY_HOPS)]
+    if (TRUSTED_PROXY_HOPS === 1 && request.headers.get('x-real-ip')) return request.headers.get('x-real-ip')
+  }
+  return null
+}
+
+// Client address used as the per-IP bucket key, or null when there is none to trust.
+// request.ip is set by the hosting platform. Behind TRUSTED_PROXY_HOPS proxies, the address
+// the outermost one appended to X-Forwarded-For is used; entries to its left came from the
+// client and are ignored. Callers skip per-IP checks on null rather than pooling every
+// client in one bucket, which would let a single client block writes for everyone.
+export function clientIp(request) {
+  const address = trustedAddress(request)
+  clientAddressCounts[address ? 'identified' : 'unidentified']++
+  return address
+}
+
+// For /api/health: whether per-IP limits are being applied
+export function clientAddressStats() {
+  const { identified, unidentified } = clientAddressCounts
+  let perIpLimits = 'enforced'
+  if (identified === 0 && unidentified === 0) {
+    perIpLimits = 'unknown until the first write'
+  } else if (identified === 0) {
+    perIpLimits = 'skipped: no trusted client address (set TRUSTED_PROXY_HOPS behind a proxy)'
+  } else if (unidentified > 0) {
+    perIpLimits = 'partial: some writes had no trusted client address'
+  }
+  return { trustedProxyHops: TRUSTED_PROXY_HOPS, identified, unidentified, perIpLimits }
+}
@@ -0,0 +1,76 @@
+import { v4 as uuidv4 } from 'uuid'
+
+// Validation and row construction shared by the single and batch write endpoints
+
+export const MAX_BATCH_SIZE = 100
+
+const DOG_LISTING_REQUIRED_FIELDS = ['title', 'dogName', 'description', 'age', 'size', 'gender', 'contactName', 'contactEmail', 'province', 'city']
+const DOG_LISTING_TEXT_FIELDS = ['title', 'dogName', 'description', 'contactName', 'contactEmail']
+const MESSAGE_REQUIRED_FIELDS = ['listing_id', 'senderName', 'senderEmail', 'message']
+const MESSAGE_TEXT_FIELDS = ['senderName', 'senderEmail', 'message']
+
+// Returns an error message, or null when the record is valid
+function validate(body, requiredFields, textFields) {
+  if (!body || typeof body !== 'object' || Array.isArray(body)) {
+    return 'Expected a JSON object'
+  }
+  for (const field of requiredFields) {
+    if (!body[field]) {
+      return `Missing required field: ${field}`
+    }
+  }
+  for (const field of textFields) {
+    if (typeof body[field] !== 'string') {
+      return `Field ${field} must be a string`
+    }
+  }
+  return null
+}
+
+export function validateDogListing(body) {
+  return validate(body, DOG_LISTING_REQUIRED_FIELDS, DOG_LISTING_TEXT_FIELDS)
+}
+
+export function validateMessage(body) {
+  return validate(body, MESSAGE_REQUIRED_FIELDS, MESSAGE_TEXT_FIELDS)
+}
+
+export function buildDogListing(body) {
+  const now = new Date().toISOString()
+  return {
+    id: uuidv4(),
+    title: body.title.trim(),
+    description: body.description.trim(),
+    dogName: body.dogName.trim(),
+    age: parseInt(body.age),
+    size: body.size,
+    gender: body.gender,
+    breed: body.breed?.trim() || null,
+    isUrgent: Boolean(body.isUrgent),
+    isVaccinated: Boolean(body.isVaccinated),
+    isNeutered: Boolean(body.isNeutered),
+    contactEmail: body.contactEmail.trim(),
+    contactPhone: body.contactPhone?.trim() || null,
+    contactName: body.contactName.trim(),
+    province_id: body.province,
+    city_id: body.city,
+    imageUrls: body.imageUrls || [],
+    listingType: 'adoption',
+    status: 'active',
+    createdAt: now,
+    updatedAt: now
+  }
+}
+
+export function buildMessage(body) {
+  return {
+    id: uuidv4(),
+    listing_id: body.listing_id,
+    senderName: body.senderName.trim(),
+    senderEmail: body.senderEmail.trim(),
+    senderPhone: body.senderPhone?.trim() || null,
+    message: body.message.trim(),
+    isRead: false,
+    createdAt: new Date().toISOString()
+  }
+}
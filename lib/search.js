@@ -0,0 +1,50 @@
+import { supabase } from './supabase.js'
+import { decodeCursor, encodeCursor } from './pagination.js'
+import { DOG_LISTING_SELECTION } from './fields.js'
+
+const SEARCH_CURSOR_KEYS = ['rank', 'id']
+
+// Ranked full-text search through the search_dog_listings function created by /api/setup.
+// Returns { data, next_cursor }, { invalidCursor: true }, or null when full-text search
+// is unavailable so the caller can fall back to the ilike scan.
+export async function searchDogListings({ query, province, size, gender, limit, cursor, select = DOG_LISTING_SELECTION.defaultSelect }) {
+  let after = null
+  if (cursor) {
+    after = decodeCursor(cursor, SEARCH_CURSOR_KEYS)
+    if (!after) return { invalidCursor: true }
+  }
+
+  const { data: matches, error } = await supabase.rpc('search_dog_listings', {
+    search_query: query,
+    filter_province: province || null,
+    filter_size: size || null,
+    filter_gender: gender || null,
+    page_size: limit + 1,
+    after_rank: after?.rank ?? null,
+    after_id: after?.id ?? null
+  })
+
+  if (error) {
+    console.error('Full-text search unavailable:', error)
+    return null
+  }
+
+  const page = matches.slice(0, limit)
+  const next_cursor = matches.length > limit ? encodeCursor(page[page.length - 1], SEARCH_CURSOR_KEYS) : null
+  if (page.length === 0) return { data: [], next_cursor }
+
+  // Fetch the matched rows by primary key, then restore relevance order
+  const { data: rows, error: rowsError } = await supabase
+    .from('dog_listings')
+    .select(select)
+    .in('id', page.map(match => match.id))
+
+  if (rowsError) {
+    console.error('Error fetching search results:', rowsError)
+    return null
+  }
+
+  const rowsById = new Map(rows.map(row => [row.id, row]))
+  const data = page.map(match => rowsById.get(match.id)).filter(Boolean)
+  return { data, next_cursor }
+}
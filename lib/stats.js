@@ -0,0 +1,75 @@
+import { supabase } from './supabase.js'
+
+// Read platform statistics from the trigger-maintained aggregate tables.
+// Cost is one row per province, independent of how many listings exist.
+async function getAggregatedStats() {
+  const [
+    { data: provinceStats, error: provinceError },
+    { data: platformStats, error: platformError }
+  ] = await Promise.all([
+    supabase.from('province_stats').select('activeDogs, urgentDogs, provinces:province_id(name)'),
+    supabase.from('platform_stats').select('totalMessages').eq('id', 1).maybeSingle()
+  ])
+
+  if (provinceError || platformError || !platformStats) return null
+
+  let totalDogs = 0
+  let urgentDogs = 0
+  const dogsByProvince = {}
+  provinceStats?.forEach(row => {
+    totalDogs += row.activeDogs
+    urgentDogs += row.urgentDogs
+    const provinceName = row.provinces?.name
+    if (provinceName && row.activeDogs > 0) {
+      dogsByProvince[provinceName] = (dogsByProvince[provinceName] || 0) + row.activeDogs
+    }
+  })
+
+  return {
+    totalDogs,
+    urgentDogs,
+    totalMessages: Number(platformStats.totalMessages) || 0,
+    dogsByProvince
+  }
+}
+
+// Full recount over dog_listings/messages, used until /api/setup has created the aggregates
+async function getScannedStats() {
+  const [
+    { count: totalDogs },
+    { count: urgentDogs },
+    { count: totalMessages },
+    { data: dogsByProvince }
+  ] = await Promise.all([
+    supabase.from('dog_listings').select('*', { count: 'exact', head: true }).eq('status', 'active'),
+    supabase.from('dog_listings').select('*', { count: 'exact', head: true }).eq('status', 'active').eq('isUrgent', true),
+    supabase.from('messages').select('*', { count: 'exact', head: true }),
+    supabase
+      .from('dog_listings')
+      .select('province_id, provinces:province_id(name)')
+      .eq('status', 'active')
+  ])
+
+  const provinceStats = {}
+  dogsByProvince?.forEach(dog => {
+    const provinceName = dog.provinces?.name
+    if (provinceName) {
+      provinceStats[provinceName] = (provinceStats[provinceName] || 0) + 1
+    }
+  })
+
+  return {
+    totalDogs: totalDogs || 0,
+    urgentDogs: urgentDogs || 0,
+    totalMessages: totalMessages || 0,
+    dogsByProvince: provinceStats
+  }
+}
+
+export async function getStats() {
+  const stats = await getAggregatedStats()
+  if (stats) return stats
+
+  console.log('Stats aggregates unavailable, falling back to full scan')
+  return getScannedStats()
+}
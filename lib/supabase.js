@@ -1,62 +1,132 @@
 import { createClient } from '@supabase/supabase-js'
+import { timedFetch } from './metrics.js'
 
 const supabaseUrl = process.env.NEXT_PUBLIC_SUPABASE_URL
 const supabaseAnonKey = process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY
 
-export const supabase = createClient(supabaseUrl, supabaseAnonKey)
+// Calls go through timedFetch so /api/metrics can count and time them per route
+export const supabase = createClient(supabaseUrl, supabaseAnonKey, { global: { fetch: timedFetch } })
 
 // Admin client for server-side operations (table creation)
 const supabaseServiceKey = process.env.SUPABASE_SERVICE_ROLE_KEY
 export const supabaseAdmin = supabaseServiceKey 
-  ? createClient(supabaseUrl, supabaseServiceKey)
+  ? createClient(supabaseUrl, supabaseServiceKey, { global: { fetch: timedFetch } })
   : null
 
-// Initialize database tables and data
-export const initializeDatabase = async () => {
-  try {
-    // Check if provinces exist
-    const { data: existingProvinces } = await supabase
-      .from('provinces')
-      .select('id')
-      .limit(1)
-    
-    if (!existingProvinces || existingProvinces.length === 0) {
-      await initializeSpanishData()
-    }
-    
-    console.log('Database initialized successfully')
-  } catch (error) {
-    console.error('Database initialization error:', error)
+// Warmup state of this server process, reported by GET /api/health
+const INITIALIZATION_RETRY_DELAY_MS = 5000
+let initializationPromise = null
+export const databaseStatus = {
+  state: 'pending',
+  attempts: 0,
+  initializedAt: null,
+  warmupMs: null,
+  lastError: null,
+  lastFailureAt: null
+}
+
+const checkReferenceData = async () => {
+  // Check if provinces exist
+  const { data: existingProvinces, error } = await supabase
+    .from('provinces')
+    .select('id')
+    .limit(1)
+
+  if (error) throw error
+
+  if (!existingProvinces || existingProvinces.length === 0) {
+    await initializeSpanishData()
+  }
+}
+
+// Initialize database tables and data once per process. Concurrent callers share the
+// same in-flight promise; a failed attempt is retried by a later request after a short delay.
+export const initializeDatabase = () => {
+  if (initializationPromise) return initializationPromise
+
+  if (databaseStatus.state === 'failed' && Date.now() - databaseStatus.lastFailureAt < INITIALIZATION_RETRY_DELAY_MS) {
+    return Promise.resolve(false)
   }
+
+  const startedAt = Date.now()
+  databaseStatus.state = 'initializing'
+  databaseStatus.attempts++
+
+  initializationPromise = checkReferenceData()
+    .then(() => {
+      databaseStatus.state = 'ready'
+      databaseStatus.initializedAt = new Date().toISOString()
+      databaseStatus.warmupMs = Date.now() - startedAt
+      databaseStatus.lastError = null
+      console.log('Database initialized successfully')
+      return true
+    })
+    .catch(error => {
+      console.error('Database initialization error:', error)
+      databaseStatus.state = 'failed'
+      databaseStatus.lastError = error.message || String(error)
+      databaseStatus.lastFailureAt = Date.now()
+      initializationPromise = null
+      return false
+    })
+
+  return initializationPromise
 }
 
+// Spanish provinces and major cities. Province coordinates are the approximate
+// geographic centre, city coordinates the city centre (WGS84 degrees).
+export const SPANISH_PROVINCES = [
+  { id: 'madrid', name: 'Madrid', region: 'Comunidad de Madrid', latitude: 40.42, longitude: -3.70 },
+  { id: 'barcelona', name: 'Barcelona', region: 'Cataluña', latitude: 41.73, longitude: 1.98 },
+  { id: 'valencia', name: 'Valencia', region: 'Comunidad Valenciana', latitude: 39.37, longitude: -0.75 },
+  { id: 'sevilla', name: 'Sevilla', region: 'Andalucía', latitude: 37.44, longitude: -5.69 },
+  { id: 'bilbao', name: 'Vizcaya', region: 'País Vasco', latitude: 43.23, longitude: -2.85 },
+  { id: 'murcia', name: 'Murcia', region: 'Región de Murcia', latitude: 38.00, longitude: -1.50 },
+  { id: 'palma', name: 'Baleares', region: 'Islas Baleares', latitude: 39.57, longitude: 2.90 },
+  { id: 'las-palmas', name: 'Las Palmas', region: 'Canarias', latitude: 28.30, longitude: -15.00 },
+  { id: 'alicante', name: 'Alicante', region: 'Comunidad Valenciana', latitude: 38.48, longitude: -0.57 },
+  { id: 'cordoba', name: 'Córdoba', region: 'Andalucía', latitude: 37.99, longitude: -4.78 }
+]
+
+export const SPANISH_CITIES = [
+  { id: 'madrid-city', name: 'Madrid', province_id: 'madrid', latitude: 40.4168, longitude: -3.7038 },
+  { id: 'barcelona-city', name: 'Barcelona', province_id: 'barcelona', latitude: 41.3874, longitude: 2.1686 },
+  { id: 'valencia-city', name: 'Valencia', province_id: 'valencia', latitude: 39.4699, longitude: -0.3763 },
+  { id: 'sevilla-city', name: 'Sevilla', province_id: 'sevilla', latitude: 37.3891, longitude: -5.9845 },
+  { id: 'bilbao-city', name: 'Bilbao', province_id: 'bilbao', latitude: 43.2630, longitude: -2.9350 },
+  { id: 'murcia-city', name: 'Murcia', province_id: 'murcia', latitude: 37.9922, longitude: -1.1307 },
+  { id: 'palma-city', name: 'Palma de Mallorca', province_id: 'palma', latitude: 39.5696, longitude: 2.6502 },
+  { id: 'las-palmas-city', name: 'Las Palmas', province_id: 'las-palmas', latitude: 28.1235, longitude: -15.4363 },
+  { id: 'alicante-city', name: 'Alicante', province_id: 'alicante', latitude: 38.3452, longitude: -0.4810 },
+  { id: 'cordoba-city', name: 'Córdoba', province_id: 'cordoba', latitude: 37.8882, longitude: -4.7794 }
+]
+
 // Initialize Spanish provinces and major cities
+// Coordinates go in a separate step so seeding still works on a database created before
+// the latitude/longitude columns existed
+const withoutCoordinates = rows => rows.map(({ latitude, longitude, ...row }) => row)
+
+// Fill in missing coordinates row by row. Failures (such as PGRST204 when the columns do not
+// exist yet) are logged and skipped: proximity search stays unavailable until /api/setup adds them.
+const setCoordinates = async (table, rows) => {
+  const client = supabaseAdmin || supabase
+  for (const { id, latitude, longitude } of rows) {
+    const { error } = await client
+      .from(table)
+      .update({ latitude, longitude })
+      .eq('id', id)
+      .is('latitude', null)
+
+    if (error) {
+      console.warn(`Could not set ${table} coordinates:`, error.message)
+      return
+    }
+  }
+}
+
 export const initializeSpanishData = async () => {
-  const provinces = [
-    { id: 'madrid', name: 'Madrid', region: 'Comunidad de Madrid' },
-    { id: 'barcelona', name: 'Barcelona', region: 'Cataluña' },
-    { id: 'valencia', name: 'Valencia', region: 'Comunidad Valenciana' },
-    { id: 'sevilla', name: 'Sevilla', region: 'Andalucía' },
-    { id: 'bilbao', name: 'Vizcaya', region: 'País Vasco' },
-    { id: 'murcia', name: 'Murcia', region: 'Región de Murcia' },
-    { id: 'palma', name: 'Baleares', region: 'Islas Baleares' },
-    { id: 'las-palmas', name: 'Las Palmas', region: 'Canarias' },
-    { id: 'alicante', name: 'Alicante', region: 'Comunidad Valenciana' },
-    { id: 'cordoba', name: 'Córdoba', region: 'Andalucía' }
-  ]
-
-  const cities = [
-    { id: 'madrid-city', name: 'Madrid', province_id: 'madrid' },
-    { id: 'barcelona-city', name: 'Barcelona', province_id: 'barcelona' },
-    { id: 'valencia-city', name: 'Valencia', province_id: 'valencia' },
-    { id: 'sevilla-city', name: 'Sevilla', province_id: 'sevilla' },
-    { id: 'bilbao-city', name: 'Bilbao', province_id: 'bilbao' },
-    { id: 'murcia-city', name: 'Murcia', province_id: 'murcia' },
-    { id: 'palma-city', name: 'Palma de Mallorca', province_id: 'palma' },
-    { id: 'las-palmas-city', name: 'Las Palmas', province_id: 'las-palmas' },
-    { id: 'alicante-city', name: 'Alicante', province_id: 'alicante' },
-    { id: 'cordoba-city', name: 'Córdoba', province_id: 'cordoba' }
-  ]
+  const provinces = withoutCoordinates(SPANISH_PROVINCES)
+  const cities = withoutCoordinates(SPANISH_CITIES)
 
   try {
     // Insert provinces
@@ -77,6 +147,9 @@ export const initializeSpanishData = async () => {
       throw citiesError
     }
 
+    await setCoordinates('provinces', SPANISH_PROVINCES)
+    await setCoordinates('cities', SPANISH_CITIES)
+
   } catch (error) {
     console.error('Error initializing Spanish data:', error)
     throw error
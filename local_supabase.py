@@ -0,0 +1,761 @@
+#!/usr/bin/env python3
+"""
+adoptaunpana.es Local Supabase Stand-in
+In-memory, indexed implementation of the PostgREST subset used by the API route
+handler, so the test suite and benchmarks can run offline and reproducibly
+"""
+
+import argparse
+import json
+import math
+import re
+import threading
+import unicodedata
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# column -> type for every table the route handler touches
+SCHEMA = {
+    'provinces': {
+        'columns': {'id': 'text', 'name': 'text', 'region': 'text', 'latitude': 'float', 'longitude': 'float',
+                    'createdAt': 'timestamp'},
+        'required': ['id', 'name', 'region'],
+        'foreign_keys': {}
+    },
+    'cities': {
+        'columns': {'id': 'text', 'name': 'text', 'province_id': 'text', 'latitude': 'float', 'longitude': 'float',
+                    'createdAt': 'timestamp'},
+        'required': ['id', 'name', 'province_id'],
+        'foreign_keys': {'province_id': 'provinces'}
+    },
+    'dog_listings': {
+        'columns': {
+            'id': 'uuid', 'title': 'text', 'description': 'text', 'dogName': 'text', 'age': 'int',
+            'size': 'text', 'gender': 'text', 'breed': 'text', 'isUrgent': 'bool', 'isVaccinated': 'bool',
+            'isNeutered': 'bool', 'contactEmail': 'text', 'contactPhone': 'text', 'contactName': 'text',
+            'province_id': 'text', 'city_id': 'text', 'imageUrls': 'json', 'listingType': 'text',
+            'status': 'text', 'user_id': 'uuid', 'createdAt': 'timestamp', 'updatedAt': 'timestamp'
+        },
+        'required': ['title', 'description', 'dogName', 'age', 'size', 'gender', 'contactEmail',
+                     'contactName', 'province_id', 'city_id', 'listingType'],
+        'checks': {
+            'size': {'pequeño', 'mediano', 'grande'},
+            'gender': {'macho', 'hembra'},
+            'listingType': {'adoption', 'foster', 'lost', 'found'},
+            'status': {'active', 'adopted', 'inactive'}
+        },
+        'defaults': {'isUrgent': False, 'isVaccinated': False, 'isNeutered': False, 'imageUrls': [],
+                     'status': 'active'},
+        'foreign_keys': {'province_id': 'provinces', 'city_id': 'cities'}
+    },
+    'messages': {
+        'columns': {
+            'id': 'uuid', 'listing_id': 'uuid', 'senderName': 'text', 'senderEmail': 'text',
+            'senderPhone': 'text', 'message': 'text', 'isRead': 'bool', 'createdAt': 'timestamp'
+        },
+        'required': ['listing_id', 'senderName', 'senderEmail', 'message'],
+        'defaults': {'isRead': False},
+        'foreign_keys': {'listing_id': 'dog_listings'},
+        'cascade': True
+    },
+    'province_stats': {
+        'columns': {'province_id': 'text', 'activeDogs': 'int', 'urgentDogs': 'int'},
+        'primary_key': 'province_id',
+        'required': ['province_id'],
+        'foreign_keys': {'province_id': 'provinces'},
+        'read_only': True
+    },
+    'platform_stats': {
+        'columns': {'id': 'int', 'totalMessages': 'int'},
+        'required': [],
+        'foreign_keys': {},
+        'read_only': True
+    }
+}
+
+# Hash indexes maintained for equality filters
+INDEXED_COLUMNS = {
+    'cities': ['province_id'],
+    'dog_listings': ['status', 'province_id', 'city_id', 'size', 'gender', 'isUrgent'],
+    'messages': ['listing_id']
+}
+
+SPANISH_STOP_WORDS = {'de', 'la', 'el', 'los', 'las', 'un', 'una', 'y', 'o', 'en', 'con', 'a', 'al', 'del',
+                      'por', 'para', 'es', 'que', 'se', 'su', 'muy', 'lo'}
+SEARCH_WEIGHTS = {'dogName': 1.0, 'breed': 0.4, 'description': 0.2}
+
+# Sphere radius used by Postgres earthdistance (earth() in metres), so distances agree
+EARTH_RADIUS_KM = 6378.168
+
+
+class PostgrestError(Exception):
+    def __init__(self, status, code, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+        self.details = details
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def fold(text):
+    """Lowercase and strip accents, like unaccent + lower"""
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+
+def stem(word):
+    """Very small Spanish stemmer: drop plural endings and a final gender vowel"""
+    for suffix in ('es', 's'):
+        if len(word) > 4 and word.endswith(suffix):
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 3 and word[-1] in 'aoe':
+        word = word[:-1]
+    return word
+
+
+def search_terms(text):
+    words = re.findall(r'[a-z0-9]+', fold(text or ''))
+    return [stem(word) for word in words if word not in SPANISH_STOP_WORDS]
+
+
+def great_circle_km(lat1, lng1, lat2, lng2):
+    """Haversine distance between two points in degrees"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_timestamp(value):
+    if isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def coerce(column_type, value):
+    """Convert a JSON or query-string value to the column's Python type"""
+    if value is None:
+        return None
+    if column_type == 'bool':
+        if isinstance(value, bool):
+            return value
+        return str(value).lower() in ('true', 't', '1')
+    if column_type == 'int':
+        return int(value)
+    if column_type == 'float':
+        return float(value)
+    if column_type == 'timestamp':
+        return parse_timestamp(value).isoformat()
+    if column_type == 'uuid':
+        return str(uuid.UUID(str(value)))
+    if column_type == 'json':
+        return value
+    return str(value)
+
+
+def sort_key(column_type, value):
+    if column_type == 'timestamp' and value is not None:
+        return parse_timestamp(value)
+    return value
+
+
+def split_top_level(text, separator=','):
+    """Split on separator outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == separator and depth == 0 and not quoted:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def unquote(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+
+class Table:
+    def __init__(self, name, schema):
+        self.name = name
+        self.schema = schema
+        self.columns = schema['columns']
+        self.primary_key = schema.get('primary_key', 'id')
+        self.rows = {}
+        self.indexes = {column: {} for column in INDEXED_COLUMNS.get(name, [])}
+
+    def index_add(self, row):
+        for column, index in self.indexes.items():
+            index.setdefault(row.get(column), set()).add(row[self.primary_key])
+
+    def index_remove(self, row):
+        for column, index in self.indexes.items():
+            bucket = index.get(row.get(column))
+            if bucket:
+                bucket.discard(row[self.primary_key])
+
+    def candidates(self, equality_filters):
+        """Smallest index bucket matching the equality filters, or every key"""
+        best = None
+        for column, value in equality_filters:
+            if column in self.indexes:
+                bucket = self.indexes[column].get(value, set())
+                if best is None or len(bucket) < len(best):
+                    best = bucket
+        if best is not None:
+            return list(best)
+        return list(self.rows)
+
+
+class Database:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {name: Table(name, schema) for name, schema in SCHEMA.items()}
+        self.tables['platform_stats'].rows[1] = {'id': 1, 'totalMessages': 0}
+        # stem -> listing ids, for the full-text search RPC
+        self.search_index = {}
+
+    # -- filtering -------------------------------------------------------
+
+    def parse_condition(self, table, column, expression):
+        negate = False
+        if expression.startswith('not.'):
+            negate = True
+            expression = expression[4:]
+        operator, _, raw = expression.partition('.')
+        if column not in table.columns:
+            raise PostgrestError(400, '42703', f'column {table.name}.{column} does not exist')
+        column_type = table.columns[column]
+        return {'column': column, 'operator': operator, 'raw': unquote(raw), 'type': column_type, 'negate': negate}
+
+    def parse_logic_tree(self, table, operator, text):
+        """Parse or=(a.eq.1,and(b.eq.2,c.lt.3)) into nested conditions"""
+        text = text.strip()
+        if text.startswith('(') and text.endswith(')'):
+            text = text[1:-1]
+        children = []
+        for part in split_top_level(text):
+            part = part.strip()
+            match = re.match(r'^(not\.)?(and|or)\((.*)\)$', part)
+            if match:
+                child = self.parse_logic_tree(table, match.group(2), match.group(3))
+                child['negate'] = bool(match.group(1))
+                children.append(child)
+            else:
+                column, _, expression = part.partition('.')
+                children.append(self.parse_condition(table, column, expression))
+        return {'logic': operator, 'children': children, 'negate': False}
+
+    def matches(self, row, condition):
+        if 'logic' in condition:
+            results = (self.matches(row, child) for child in condition['children'])
+            result = any(results) if condition['logic'] == 'or' else all(results)
+            return not result if condition['negate'] else result
+
+        value = row.get(condition['column'])
+        operator, raw, column_type = condition['operator'], condition['raw'], condition['type']
+
+        if operator == 'is':
+            result = value is None if raw == 'null' else value == coerce('bool', raw)
+        elif operator == 'in':
+            options = [coerce(column_type, unquote(v.strip())) for v in split_top_level(raw.strip('()'))]
+            result = value in options
+        elif operator in ('like', 'ilike'):
+            pattern = '^' + '.*'.join(re.escape(p) for p in re.split(r'[%*]', raw)) + '$'
+            flags = re.IGNORECASE | re.DOTALL if operator == 'ilike' else re.DOTALL
+            result = value is not None and re.match(pattern, str(value), flags) is not None
+        else:
+            target = coerce(column_type, raw)
+            if value is None:
+                result = False
+            else:
+                left, right = sort_key(column_type, value), sort_key(column_type, target)
+                result = {
+                    'eq': left == right, 'neq': left != right, 'lt': left < right,
+                    'lte': left <= right, 'gt': left > right, 'gte': left >= right
+                }.get(operator)
+                if result is None:
+                    raise PostgrestError(400, 'PGRST100', f'operator {operator} is not supported')
+        return not result if condition['negate'] else result
+
+    def parse_filters(self, table, params):
+        conditions = []
+        for key, value in params:
+            if key in ('select', 'order', 'limit', 'offset', 'columns', 'on_conflict'):
+                continue
+            if key in ('or', 'and'):
+                conditions.append(self.parse_logic_tree(table, key, value))
+            else:
+                conditions.append(self.parse_condition(table, key, value))
+        return conditions
+
+    def select_rows(self, table, conditions):
+        equality = [(c['column'], coerce(c['type'], c['raw'])) for c in conditions
+                    if 'column' in c and c['operator'] == 'eq' and not c['negate']]
+        rows = (table.rows.get(key) for key in table.candidates(equality))
+        return [row for row in rows if row is not None and all(self.matches(row, c) for c in conditions)]
+
+    # -- select / embedding ------------------------------------------------
+
+    def parse_select(self, select):
+        items = []
+        for item in split_top_level(select or '*'):
+            item = item.strip()
+            match = re.match(r'^(?:(\w+):)?(\w+)\((.*)\)$', item)
+            if match:
+                alias, target, inner = match.groups()
+                items.append({'embed': True, 'alias': alias or target, 'target': target,
+                              'select': self.parse_select(inner)})
+            else:
+                # alias:column->key / alias:column->>key JSON paths
+                match = re.match(r'^(?:(\w+):)?(\w+)(->>?)(\w+)$', item)
+                if match:
+                    alias, column, arrow, key = match.groups()
+                    items.append({'embed': False, 'column': column, 'alias': alias or key,
+                                  'path': int(key) if key.isdigit() else key, 'as_text': arrow == '->>'})
+                else:
+                    items.append({'embed': False, 'column': unquote(item)})
+        return items
+
+    def project(self, table, row, select_items):
+        result = {}
+        for item in select_items:
+            if item['embed']:
+                result[item['alias']] = self.embed(table, row, item)
+            elif item['column'] == '*':
+                result.update(row)
+            elif 'path' in item:
+                result[item['alias']] = self.json_path(row.get(item['column']), item['path'], item['as_text'])
+            else:
+                result[item['column']] = row.get(item['column'])
+        return result
+
+    def json_path(self, value, key, as_text):
+        try:
+            found = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+        if as_text and found is not None and not isinstance(found, str):
+            return json.dumps(found)
+        return found
+
+    def embed(self, table, row, item):
+        foreign_keys = table.schema['foreign_keys']
+        # alias:fk_column(...) or target_table(...)
+        column = item['target'] if item['target'] in foreign_keys else next(
+            (c for c, t in foreign_keys.items() if t == item['target']), None)
+        if column is None:
+            raise PostgrestError(400, 'PGRST200', f"Could not find a relationship between '{table.name}' and '{item['target']}'")
+        target = self.tables[foreign_keys[column]]
+        related = target.rows.get(row.get(column))
+        return self.project(target, related, item['select']) if related else None
+
+    def order_rows(self, table, rows, order):
+        if not order:
+            return rows
+        for term in reversed(split_top_level(order)):
+            parts = term.split('.')
+            column = unquote(parts[0])
+            descending = 'desc' in parts[1:]
+            nulls_first = 'nullsfirst' in parts[1:] or ('nullslast' not in parts[1:] and descending)
+            column_type = table.columns.get(column)
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            present.sort(key=lambda r: sort_key(column_type, r[column]), reverse=descending)
+            rows = missing + present if nulls_first else present + missing
+        return rows
+
+    def query(self, table_name, params):
+        with self.lock:
+            table = self.get_table(table_name)
+            params_dict = dict(params)
+            rows = self.select_rows(table, self.parse_filters(table, params))
+            rows = self.order_rows(table, rows, params_dict.get('order'))
+            total = len(rows)
+            offset = int(params_dict.get('offset', 0))
+            if 'limit' in params_dict:
+                rows = rows[offset:offset + int(params_dict['limit'])]
+            else:
+                rows = rows[offset:]
+            select_items = self.parse_select(params_dict.get('select'))
+            return [self.project(table, row, select_items) for row in rows], total, offset
+
+    # -- writes --------------------------------------------------------------
+
+    def get_table(self, name):
+        if name not in self.tables:
+            raise PostgrestError(404, '42P01', f'relation "public.{name}" does not exist')
+        return self.tables[name]
+
+    def validate(self, table, row):
+        for column in table.schema.get('required', []):
+            if row.get(column) is None:
+                raise PostgrestError(400, '23502', f'null value in column "{column}" of relation "{table.name}" '
+                                                   f'violates not-null constraint')
+        for column, allowed in table.schema.get('checks', {}).items():
+            if row.get(column) is not None and row[column] not in allowed:
+                raise PostgrestError(400, '23514', f'new row for relation "{table.name}" violates check constraint '
+                                                   f'"{table.name}_{column}_check"')
+        for column, target in table.schema['foreign_keys'].items():
+            if row.get(column) is not None and row[column] not in self.tables[target].rows:
+                raise PostgrestError(409, '23503', f'insert or update on table "{table.name}" violates foreign key '
+                                                   f'constraint "{table.name}_{column}_fkey"')
+
+    def build_row(self, table, values):
+        row = {column: None for column in table.columns}
+        row.update(table.schema.get('defaults', {}))
+        for column, value in values.items():
+            if column not in table.columns:
+                raise PostgrestError(400, 'PGRST204', f"Could not find the '{column}' column of '{table.name}'")
+            row[column] = coerce(table.columns[column], value)
+        if row.get(table.primary_key) is None and table.columns.get(table.primary_key) == 'uuid':
+            row[table.primary_key] = str(uuid.uuid4())
+        for column, column_type in table.columns.items():
+            if column_type == 'timestamp' and row[column] is None and column in ('createdAt', 'updatedAt'):
+                row[column] = now_iso()
+        return row
+
+    def insert(self, table_name, records, ignore_duplicates=False):
+        """Insert records; with ignore_duplicates (ON CONFLICT DO NOTHING) existing keys are skipped"""
+        with self.lock:
+            table = self.get_table(table_name)
+            if table.schema.get('read_only'):
+                raise PostgrestError(401, '42501', f'permission denied for table {table_name}')
+            rows = [self.build_row(table, record) for record in records]
+            keys = set()
+            kept = []
+            for row in rows:
+                self.validate(table, row)
+                key = row[table.primary_key]
+                if key in table.rows or key in keys:
+                    if ignore_duplicates:
+                        continue
+                    raise PostgrestError(409, '23505', f'duplicate key value violates unique constraint '
+                                                       f'"{table_name}_pkey"')
+                keys.add(key)
+                kept.append(row)
+            rows = kept
+            # All rows validated first so a bad batch inserts nothing, like a single statement
+            for row in rows:
+                table.rows[row[table.primary_key]] = row
+                table.index_add(row)
+                self.after_write(table_name, None, row)
+            return rows
+
+    def update(self, table_name, params, values):
+        with self.lock:
+            table = self.get_table(table_name)
+            rows = self.select_rows(table, self.parse_filters(table, params))
+            updated = []
+            for row in rows:
+                new_row = dict(row)
+                for column, value in values.items():
+                    if column not in table.columns:
+                        raise PostgrestError(400, 'PGRST204', f"Could not find the '{column}' column of '{table.name}'")
+                    new_row[column] = coerce(table.columns[column], value)
+                self.validate(table, new_row)
+                updated.append((row, new_row))
+            for old_row, new_row in updated:
+                table.index_remove(old_row)
+                table.rows[new_row[table.primary_key]] = new_row
+                table.index_add(new_row)
+                self.after_write(table_name, old_row, new_row)
+            return [new_row for _, new_row in updated]
+
+    def delete(self, table_name, params):
+        with self.lock:
+            table = self.get_table(table_name)
+            rows = self.select_rows(table, self.parse_filters(table, params))
+            for row in rows:
+                self.delete_row(table, row)
+            return rows
+
+    def delete_row(self, table, row):
+        # ON DELETE CASCADE from tables that reference this one
+        for other in self.tables.values():
+            if not other.schema.get('cascade'):
+                continue
+            for column, target in other.schema['foreign_keys'].items():
+                if target != table.name:
+                    continue
+                key = row[table.primary_key]
+                children = other.candidates([(column, key)])
+                for child_key in children:
+                    child = other.rows.get(child_key)
+                    if child and child.get(column) == key:
+                        self.delete_row(other, child)
+        del table.rows[row[table.primary_key]]
+        table.index_remove(row)
+        self.after_write(table.name, row, None)
+
+    # -- "triggers" ----------------------------------------------------------
+
+    def after_write(self, table_name, old_row, new_row):
+        """Mirror the stats triggers and maintain the full-text index"""
+        if table_name == 'messages':
+            delta = (1 if new_row else 0) - (1 if old_row else 0)
+            self.tables['platform_stats'].rows[1]['totalMessages'] += delta
+        elif table_name == 'dog_listings':
+            for row, sign in ((old_row, -1), (new_row, 1)):
+                if row and row['status'] == 'active':
+                    stats = self.tables['province_stats'].rows.setdefault(
+                        row['province_id'], {'province_id': row['province_id'], 'activeDogs': 0, 'urgentDogs': 0})
+                    stats['activeDogs'] += sign
+                    stats['urgentDogs'] += sign if row['isUrgent'] else 0
+            if old_row:
+                for term in set(self.listing_terms(old_row)):
+                    self.search_index.get(term, set()).discard(old_row['id'])
+            if new_row:
+                for term in set(self.listing_terms(new_row)):
+                    self.search_index.setdefault(term, set()).add(new_row['id'])
+
+    def listing_terms(self, row):
+        return [term for field in SEARCH_WEIGHTS for term in search_terms(row.get(field))]
+
+    # -- RPC -------------------------------------------------------------------
+
+    def rpc(self, name, args):
+        if name == 'search_dog_listings':
+            return self.search_dog_listings(**args)
+        if name == 'nearby_dog_listings':
+            return self.nearby_dog_listings(**args)
+        raise PostgrestError(404, 'PGRST202', f'Could not find the function public.{name} in the schema cache')
+
+    def search_dog_listings(self, search_query, filter_province=None, filter_size=None, filter_gender=None,
+                            page_size=50, after_rank=None, after_id=None):
+        with self.lock:
+            terms = search_terms(search_query)
+            if not terms:
+                return []
+            listings = self.tables['dog_listings'].rows
+            ids = set.intersection(*(self.search_index.get(term, set()) for term in terms))
+            ranked = []
+            for listing_id in ids:
+                row = listings[listing_id]
+                if row['status'] != 'active':
+                    continue
+                if (filter_province and row['province_id'] != filter_province) or \
+                        (filter_size and row['size'] != filter_size) or \
+                        (filter_gender and row['gender'] != filter_gender):
+                    continue
+                rank = 0.0
+                for field, weight in SEARCH_WEIGHTS.items():
+                    field_terms = search_terms(row.get(field))
+                    rank += weight * sum(field_terms.count(term) for term in terms)
+                rank = round(rank, 4)
+                if after_rank is not None and (rank, listing_id) >= (float(after_rank), str(after_id)):
+                    continue
+                ranked.append({'id': listing_id, 'rank': rank})
+            ranked.sort(key=lambda r: (r['rank'], r['id']), reverse=True)
+            return ranked[:int(page_size)]
+
+    def nearby_dog_listings(self, origin_city, radius_km, search_query=None, filter_size=None, filter_gender=None,
+                            urgent_only=False, page_size=None, after_distance=None, after_urgent=None,
+                            after_created=None, after_id=None):
+        with self.lock:
+            cities = self.tables['cities'].rows
+            origin = cities.get(origin_city)
+            if origin is None or origin.get('latitude') is None:
+                raise PostgrestError(400, 'P0002', f'Unknown city: {origin_city}')
+
+            # The stand-in has no spatial index; a scan of the cities table plays its part
+            radius_km = float(radius_km)
+            near_cities = {}
+            for city in cities.values():
+                if city.get('latitude') is None:
+                    continue
+                distance = great_circle_km(origin['latitude'], origin['longitude'], city['latitude'], city['longitude'])
+                if distance <= radius_km:
+                    near_cities[city['id']] = distance
+
+            terms = search_terms(search_query) if search_query else []
+            matching_ids = set.intersection(*(self.search_index.get(term, set()) for term in terms)) if terms else None
+            after = None
+            if after_distance is not None:
+                after = (bool(after_urgent), parse_timestamp(after_created), str(after_id))
+
+            table = self.tables['dog_listings']
+            results = []
+            for city_id, distance in near_cities.items():
+                for listing_id in table.indexes['city_id'].get(city_id, ()):
+                    row = table.rows[listing_id]
+                    if row['status'] != 'active' or (matching_ids is not None and listing_id not in matching_ids):
+                        continue
+                    if (filter_size and row['size'] != filter_size) or \
+                            (filter_gender and row['gender'] != filter_gender) or \
+                            (urgent_only and not row['isUrgent']):
+                        continue
+                    feed_key = (bool(row['isUrgent']), parse_timestamp(row['createdAt']), listing_id)
+                    if after is not None and (distance < float(after_distance) or
+                                              (distance == float(after_distance) and feed_key >= after)):
+                        continue
+                    results.append((distance, feed_key, row))
+
+            # distance ascending, then the feed order (urgent, newest, id descending)
+            results.sort(key=lambda r: r[1], reverse=True)
+            results.sort(key=lambda r: r[0])
+            if page_size is not None:
+                results = results[:int(page_size)]
+            return [{'id': row['id'], 'distance_km': distance, 'isUrgent': row['isUrgent'], 'createdAt': row['createdAt']}
+                    for distance, _, row in results]
+
+
+class PostgrestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'LocalSupabase/1.0'
+    database = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def send_error_json(self, error):
+        self.send_json(error.status, {'code': error.code, 'message': error.message,
+                                      'details': error.details, 'hint': None})
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def route(self):
+        parts = urlsplit(self.path)
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        segments = [s for s in parts.path.split('/') if s]
+        if segments[:2] != ['rest', 'v1'] or len(segments) < 3:
+            raise PostgrestError(404, 'PGRST000', f'Unknown path {parts.path}')
+        return segments[2:], params
+
+    def prefer(self):
+        return {p.split('=')[0].strip(): (p.split('=') + [''])[1].strip()
+                for p in (self.headers.get('Prefer') or '').split(',') if p.strip()}
+
+    def wants_object(self):
+        return 'application/vnd.pgrst.object+json' in (self.headers.get('Accept') or '')
+
+    def respond_rows(self, status, rows, params, total=None, offset=0):
+        prefer = self.prefer()
+        headers = {}
+        if total is not None:
+            end = offset + len(rows) - 1
+            range_text = f"{offset}-{end}" if rows else '*'
+            headers['Content-Range'] = f"{range_text}/{total if prefer.get('count') else '*'}"
+        if self.command in ('POST', 'PATCH', 'DELETE') and prefer.get('return') != 'representation':
+            self.send_json(204 if self.command != 'POST' else 201, None, headers)
+            return
+        if self.wants_object():
+            if len(rows) != 1:
+                raise PostgrestError(406, 'PGRST116', 'JSON object requested, multiple (or no) rows returned',
+                                     f'The result contains {len(rows)} rows')
+            self.send_json(status, rows[0], headers)
+            return
+        self.send_json(status, rows, headers)
+
+    def project_written(self, table_name, rows, params):
+        select = dict(params).get('select')
+        table = self.database.tables[table_name]
+        items = self.database.parse_select(select)
+        return [self.database.project(table, row, items) for row in rows]
+
+    def handle_request(self):
+        try:
+            segments, params = self.route()
+            if segments[0] == 'rpc':
+                args = self.read_body() or {}
+                self.send_json(200, self.database.rpc(segments[1], args))
+                return
+
+            table_name = segments[0]
+            if self.command in ('GET', 'HEAD'):
+                rows, total, offset = self.database.query(table_name, params)
+                self.respond_rows(200, rows, params, total, offset)
+            elif self.command == 'POST':
+                body = self.read_body()
+                records = body if isinstance(body, list) else [body]
+                ignore_duplicates = self.prefer().get('resolution') == 'ignore-duplicates'
+                rows = self.database.insert(table_name, records, ignore_duplicates)
+                self.respond_rows(201, self.project_written(table_name, rows, params), params)
+            elif self.command == 'PATCH':
+                rows = self.database.update(table_name, params, self.read_body() or {})
+                self.respond_rows(200, self.project_written(table_name, rows, params), params)
+            elif self.command == 'DELETE':
+                rows = self.database.delete(table_name, params)
+                self.respond_rows(200, self.project_written(table_name, rows, params), params)
+        except PostgrestError as error:
+            self.send_error_json(error)
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_error_json(PostgrestError(400, '22P02', str(error)))
+
+    do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = handle_request
+
+
+class LocalSupabase:
+    """Run the stand-in on a background thread (for in-process use) or serve_forever()"""
+
+    def __init__(self, host='127.0.0.1', port=54321):
+        self.database = Database()
+        handler = type('BoundPostgrestHandler', (PostgrestHandler,), {'database': self.database})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="In-memory Supabase/PostgREST stand-in for adoptaunpana.es")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind")
+    parser.add_argument('--port', type=int, default=54321, help="Port to listen on")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    standin = LocalSupabase(args.host, args.port)
+    print(f"🐕 Local Supabase stand-in listening on {standin.url}")
+    print(f"   Point the app at it with NEXT_PUBLIC_SUPABASE_URL={standin.url}")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        standin.stop()
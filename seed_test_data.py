@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+adoptaunpana.es Synthetic Data Seeder
+Bulk-inserts reproducible dog listings and messages straight into Supabase
+so the API can be tested and benchmarked against realistic table sizes
+"""
+
+import requests
+import argparse
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
+
+# Seeded rows are recognisable (and purgeable) by this contact email domain
+SEED_EMAIL_DOMAIN = "seed.adoptaunpana.test"
+SEED_NAMESPACE = uuid.UUID('6f1c3b0e-5a7d-4c1e-9a2b-8d4e0f7a1c55')
+# Fixed "now" so the same seed always produces the same createdAt values
+SEED_REFERENCE_TIME = datetime(2025, 9, 1, tzinfo=timezone.utc)
+
+# Rough share of listings per province (ids from initializeSpanishData), unknown provinces get 1
+PROVINCE_WEIGHTS = {
+    'madrid': 22,
+    'barcelona': 18,
+    'valencia': 9,
+    'sevilla': 8,
+    'alicante': 7,
+    'murcia': 6,
+    'bilbao': 5,
+    'cordoba': 4,
+    'palma': 4,
+    'las-palmas': 4
+}
+SIZE_WEIGHTS = {'pequeño': 35, 'mediano': 45, 'grande': 20}
+GENDER_WEIGHTS = {'macho': 50, 'hembra': 50}
+STATUS_WEIGHTS = {'active': 85, 'adopted': 10, 'inactive': 5}
+URGENT_RATIO = 0.15
+VACCINATED_RATIO = 0.7
+NEUTERED_RATIO = 0.5
+
+DOG_NAMES = [
+    'Luna', 'Max', 'Coco', 'Lola', 'Rocky', 'Nala', 'Toby', 'Kira', 'Bruno', 'Canela',
+    'Thor', 'Maya', 'Zeus', 'Lía', 'Simba', 'Frida', 'Rex', 'Nube', 'Chispa', 'Pipo'
+]
+BREEDS = [
+    'Mestizo', 'Podenco', 'Galgo Español', 'Labrador', 'Pastor Alemán', 'Beagle',
+    'Bodeguero Andaluz', 'Mastín Español', 'Yorkshire', 'Border Collie', None
+]
+TRAITS = [
+    'muy cariñoso', 'tranquilo', 'juguetón', 'sociable con otros perros', 'bueno con niños',
+    'algo tímido al principio', 'lleno de energía', 'ideal para piso', 'le encanta pasear',
+    'educado y obediente'
+]
+STORIES = [
+    'Fue rescatado de la calle', 'Lleva meses en la protectora', 'Su familia no pudo seguir cuidándolo',
+    'Apareció abandonado en una gasolinera', 'Nació en una camada no deseada', 'Fue encontrado en el campo'
+]
+FIRST_NAMES = ['María', 'Carlos', 'Lucía', 'Javier', 'Ana', 'Pablo', 'Elena', 'Sergio', 'Carmen', 'Diego']
+LAST_NAMES = ['García', 'Rodríguez', 'López', 'Martínez', 'Sánchez', 'Pérez', 'Gómez', 'Fernández']
+MESSAGES = [
+    'Hola, estoy muy interesado en adoptar a este perro. ¿Podríamos hablar por teléfono?',
+    'Buenas, me gustaría conocerlo este fin de semana. ¿Sigue disponible?',
+    '¿Sigue disponible? Tengo experiencia con perros y un jardín grande.',
+    'Hola, somos una familia con niños y nos encantaría adoptarlo. ¿Qué pasos hay que seguir?'
+]
+
+
+def load_env(path='.env'):
+    """Read KEY=VALUE pairs from the project .env file without overriding the environment"""
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            os.environ.setdefault(key.strip(), value.strip())
+
+
+def weighted_choice(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+class SyntheticDataSeeder:
+    def __init__(self, supabase_url, api_key, seed=42, batch_size=1000, workers=8):
+        self.rest_url = f"{supabase_url.rstrip('/')}/rest/v1"
+        self.random_seed = seed
+        self.batch_size = batch_size
+        self.workers = workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'apikey': api_key,
+            'Authorization': f"Bearer {api_key}",
+            'Content-Type': 'application/json'
+        })
+        self.cities = []
+
+    def load_cities(self):
+        """Fetch the seeded cities so listings reference real province/city ids"""
+        response = self.session.get(f"{self.rest_url}/cities", params={'select': 'id,province_id'}, timeout=30)
+        response.raise_for_status()
+        self.cities = sorted(response.json(), key=lambda c: c['id'])
+        if not self.cities:
+            raise RuntimeError("No cities found - run POST /api/setup first")
+        return self.cities
+
+    def dog_id(self, index):
+        return str(uuid.uuid5(SEED_NAMESPACE, f"{self.random_seed}:dog:{index}"))
+
+    def message_id(self, index):
+        return str(uuid.uuid5(SEED_NAMESPACE, f"{self.random_seed}:message:{index}"))
+
+    def make_dog(self, index, rng, city_weights):
+        city = rng.choices(self.cities, weights=city_weights)[0]
+        name = rng.choice(DOG_NAMES)
+        contact_first = rng.choice(FIRST_NAMES)
+        contact_last = rng.choice(LAST_NAMES)
+        traits = rng.sample(TRAITS, 3)
+        created_at = SEED_REFERENCE_TIME - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        return {
+            'id': self.dog_id(index),
+            'title': f"{name} busca hogar",
+            'description': f"{rng.choice(STORIES)}. {name} es {traits[0]}, {traits[1]} y {traits[2]}.",
+            'dogName': name,
+            'age': rng.randint(2, 180),
+            'size': weighted_choice(rng, SIZE_WEIGHTS),
+            'gender': weighted_choice(rng, GENDER_WEIGHTS),
+            'breed': rng.choice(BREEDS),
+            'isUrgent': rng.random() < URGENT_RATIO,
+            'isVaccinated': rng.random() < VACCINATED_RATIO,
+            'isNeutered': rng.random() < NEUTERED_RATIO,
+            'contactName': f"{contact_first} {contact_last}",
+            'contactEmail': f"protectora{index % 500}@{SEED_EMAIL_DOMAIN}",
+            'contactPhone': f"+34 6{rng.randint(0, 99999999):08d}",
+            'province_id': city['province_id'],
+            'city_id': city['id'],
+            'imageUrls': [f"https://example.com/seed/{index}-{n}.jpg" for n in range(rng.randint(1, 4))],
+            'listingType': 'adoption',
+            'status': weighted_choice(rng, STATUS_WEIGHTS),
+            'createdAt': created_at.isoformat(),
+            'updatedAt': created_at.isoformat()
+        }
+
+    def make_message(self, index, rng, dog_count):
+        # Skewed towards a minority of popular listings
+        listing_index = int(dog_count * rng.random() ** 3)
+        sender_first = rng.choice(FIRST_NAMES)
+        sender_last = rng.choice(LAST_NAMES)
+        created_at = SEED_REFERENCE_TIME - timedelta(seconds=rng.randint(0, 180 * 24 * 3600))
+        return {
+            'id': self.message_id(index),
+            'listing_id': self.dog_id(listing_index),
+            'senderName': f"{sender_first} {sender_last}",
+            'senderEmail': f"adoptante{index}@{SEED_EMAIL_DOMAIN}",
+            'senderPhone': f"+34 6{rng.randint(0, 99999999):08d}" if rng.random() < 0.6 else None,
+            'message': rng.choice(MESSAGES),
+            'isRead': rng.random() < 0.4,
+            'createdAt': created_at.isoformat()
+        }
+
+    def build_dog_batch(self, start, count):
+        # One RNG per batch keeps the output identical regardless of worker scheduling
+        rng = random.Random(f"{self.random_seed}:dogs:{start}")
+        city_weights = [PROVINCE_WEIGHTS.get(c['province_id'], 1) for c in self.cities]
+        return [self.make_dog(i, rng, city_weights) for i in range(start, start + count)]
+
+    def build_message_batch(self, start, count, dog_count):
+        rng = random.Random(f"{self.random_seed}:messages:{start}")
+        return [self.make_message(i, rng, dog_count) for i in range(start, start + count)]
+
+    def insert_batch(self, table, rows):
+        """Insert rows and return how many were actually written"""
+        # Ids are deterministic, so rows left by an earlier run with the same seed are skipped.
+        # Only the ids of rows written come back, which is what gets counted.
+        response = self.session.post(f"{self.rest_url}/{table}", json=rows, params={'select': 'id'}, timeout=120,
+                                     headers={'Prefer': 'return=representation,resolution=ignore-duplicates'})
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"Insert into {table} failed: HTTP {response.status_code}: {response.text}")
+        return len(response.json())
+
+    def seed_table(self, table, total, build_batch):
+        """Build and insert `total` rows in batches spread over the worker pool"""
+        started = time.perf_counter()
+        batches = [(start, min(self.batch_size, total - start)) for start in range(0, total, self.batch_size)]
+        submitted = 0
+        inserted = 0
+
+        def worker(batch):
+            return self.insert_batch(table, build_batch(*batch))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for index, ((_, count), written) in enumerate(zip(batches, pool.map(worker, batches)), start=1):
+                submitted += count
+                inserted += written
+                if index % 10 == 0 or index == len(batches):
+                    print(f"   {table}: {submitted}/{total} submitted, {inserted} new")
+
+        elapsed = time.perf_counter() - started
+        skipped = f" ({submitted - inserted} already present)" if submitted != inserted else ""
+        print(f"✅ Inserted {inserted} new {table} rows{skipped} in {elapsed:.1f}s "
+              f"({submitted / elapsed if elapsed else 0:.0f} rows/s submitted)")
+        return inserted
+
+    def seed(self, dogs, messages):
+        self.load_cities()
+        print(f"🐕 Seeding {dogs} dog listings and {messages} messages (seed={self.random_seed}) "
+              f"across {len(self.cities)} cities")
+        self.seed_table('dog_listings', dogs, self.build_dog_batch)
+        if messages and dogs:
+            self.seed_table('messages', messages, lambda start, count: self.build_message_batch(start, count, dogs))
+        return dogs, messages
+
+    def purge(self):
+        """Delete every seeded listing; messages go with them through ON DELETE CASCADE"""
+        response = self.session.delete(
+            f"{self.rest_url}/dog_listings",
+            params={'contactEmail': f"like.*@{SEED_EMAIL_DOMAIN}"},
+            timeout=300
+        )
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"Purge failed: HTTP {response.status_code}: {response.text}")
+        print("🧹 Removed seeded dog listings and their messages")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Seed adoptaunpana.es with synthetic listings and messages")
+    parser.add_argument('--dogs', type=int, default=50000, help="Number of dog listings to insert")
+    parser.add_argument('--messages', type=int, default=100000, help="Number of messages to insert")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed; the same seed yields the same rows")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Rows per insert statement")
+    parser.add_argument('--workers', type=int, default=8, help="Parallel insert workers")
+    parser.add_argument('--purge', action='store_true', help="Delete previously seeded rows instead of inserting")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    load_env()
+    api_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY') or os.environ.get('NEXT_PUBLIC_SUPABASE_ANON_KEY')
+    seeder = SyntheticDataSeeder(os.environ['NEXT_PUBLIC_SUPABASE_URL'], api_key,
+                                 seed=args.seed, batch_size=args.batch_size, workers=args.workers)
+    if args.purge:
+        seeder.purge()
+    else:
+        seeder.seed(args.dogs, args.messages)